@@ -3,6 +3,7 @@
 
 import click
 import logging
+import pathlib
 
 from regress_stack.cli import plan as plan_module
 from regress_stack.cli import setup as setup_module
@@ -10,15 +11,36 @@ from regress_stack.cli import test as test_module
 from regress_stack.cli import list_modules as list_modules_module
 from regress_stack.cli import packages as packages_module
 from regress_stack.cli import playground as playground_module
+from regress_stack.cli import reset as reset_module
+from regress_stack.cli import profile as profile_module
+from regress_stack.core import trace
 
 
 @click.group(
     name="openstack-deb-tester",
     help="A CLI tool for testing OpenStack Debian packages.",
 )
-def main():
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="Record a timeline of the command, module setups, setup steps, API calls and subprocesses to this file, in the Chrome trace format viewable in Perfetto.",
+)
+@click.pass_context
+def main(ctx, trace_path):
     """OpenStack Debian package testing tool."""
     logging.basicConfig(level=logging.DEBUG)
+    if trace_path:
+        trace.start()
+        ctx.call_on_close(lambda: _write_trace(trace_path))
+
+
+def _write_trace(path: pathlib.Path):
+    spans = trace.stop()
+    trace.export(spans, path)
+    print(f"Trace written to {path}")
+    for line in trace.summary(spans):
+        print(line)
 
 
 # Register all commands
@@ -28,6 +50,8 @@ main.add_command(test_module.test)
 main.add_command(list_modules_module.list_modules)
 main.add_command(packages_module.packages)
 main.add_command(playground_module.playground)
+main.add_command(reset_module.reset)
+main.add_command(profile_module.profile)
 
 
 if __name__ == "__main__":
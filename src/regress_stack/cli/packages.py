@@ -2,8 +2,11 @@
 # SPDX-License-Identifier: GPL-3.0-only
 
 import click
+import json
 
 import regress_stack.modules
+from regress_stack.core import apt as core_apt
+from regress_stack.core import profile as core_profile
 from regress_stack.core.modules import get_execution_order
 
 
@@ -13,35 +16,52 @@ from regress_stack.core.modules import get_execution_order
     is_flag=True,
     help="Do not include tempest related packages, this is useful when using the tempest snap.",
 )
-@click.argument("target", required=False)
-def packages(target=None, no_tempest=False):
+@click.option(
+    "--exclude",
+    "-x",
+    multiple=True,
+    help="Module to leave out, along with the modules requiring it. Can be repeated.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    help="Report the installed and candidate version of each package as JSON.",
+)
+@click.option(
+    "--install",
+    is_flag=True,
+    help="Install the packages, in a single transaction, and report the time spent on each.",
+)
+@click.argument("targets", nargs=-1)
+@core_profile.candidates()
+def packages(targets=(), no_tempest=False, exclude=(), as_json=False, install=False):
     """List packages needed to reach the specified target.
 
     If no target is specified, lists packages for all modules.
-    The output can be fed directly to 'apt install' command.
+    The output can be fed directly to 'apt install' command. Packages gated
+    on the version of another are chosen by its candidate version.
 
     Examples:
         regress-stack packages nova
         regress-stack packages --no-tempest nova
+        regress-stack packages heat glance --exclude magnum
+        regress-stack packages --json nova
+        regress-stack packages --install nova
         apt install $(regress-stack packages nova)
     """
     try:
         # Get execution order without filtering for missing dependencies
         execution_order = get_execution_order(
-            regress_stack.modules, target, filter_missing=False
+            regress_stack.modules, targets, filter_missing=False, exclude=exclude
         )
 
         # Collect all packages
         all_packages = regress_stack.modules.determine_packages(no_tempest=no_tempest)
         for module_comp in execution_order:
-            if hasattr(module_comp.module, "determine_packages"):
-                packages_list = module_comp.module.determine_packages(
-                    no_tempest=no_tempest
-                )
-            else:
-                packages_list = getattr(module_comp.module, "PACKAGES", [])
-
-            all_packages.extend(packages_list)
+            all_packages.extend(
+                module_comp.metadata.determine_packages(no_tempest=no_tempest)
+            )
 
         # Remove duplicates while preserving order
         seen = set()
@@ -51,9 +71,22 @@ def packages(target=None, no_tempest=False):
                 seen.add(pkg)
                 unique_packages.append(pkg)
 
+        if install:
+            timings = core_apt.install_packages(unique_packages)
+            for line in timings.report():
+                print(line)
+            return
+
+        if as_json:
+            states = core_apt.package_states(unique_packages)
+            print(
+                json.dumps([states[pkg]._asdict() for pkg in unique_packages], indent=2)
+            )
+            return
+
         # Output packages space-separated for apt install
         print(" ".join(unique_packages))
 
-    except RuntimeError as e:
+    except (RuntimeError, ValueError) as e:
         click.echo(f"Error: {e}", err=True)
         raise click.Abort()
@@ -4,14 +4,65 @@
 import click
 from pprint import pprint
 
+import networkx as nx
+
 import regress_stack.modules
-from regress_stack.core.modules import get_execution_order
+from regress_stack.core import profile as core_profile
+from regress_stack.core import timings as core_timings
+from regress_stack.core.modules import get_execution_graph, get_execution_order
+
+
+def _print_timings(targets, exclude):
+    graph = get_execution_graph(regress_stack.modules, targets, exclude=exclude)
+    history = core_timings.load()
+    durations = {}
+    print("Setup timings (median of the last runs):")
+    for mod in nx.lexicographical_topological_sort(graph):
+        duration = core_timings.estimate(history, mod.name)
+        if duration is None:
+            print(f"  {mod.name:<40} unknown")
+            continue
+        durations[mod] = duration
+        print(f"  {mod.name:<40} {duration:8.2f}s")
+
+    serial = sum(durations.values())
+    path, parallel = core_timings.critical_path(graph, durations)
+    print(f"Expected serial wall time: {serial:.2f}s")
+    print(f"Critical path ({parallel:.2f}s):")
+    for mod in path:
+        print(f"  {mod.name:<40} {durations.get(mod, 0.0):8.2f}s")
+    print(f"Expected parallel wall time: {parallel:.2f}s")
+    print(f"Parallel run would save: {serial - parallel:.2f}s")
+    if missing := len(graph) - len(durations):
+        print(f"WARNING: {missing} module(s) without recorded timings")
 
 
 @click.command()
-@click.argument("target", required=False)
-def plan(target):
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Show expected setup durations and the critical path, based on previous runs.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Show the version gates of the platform, selecting the code paths of the setup.",
+)
+@click.option(
+    "--exclude",
+    "-x",
+    multiple=True,
+    help="Module to leave out, along with the modules requiring it. Can be repeated.",
+)
+@click.argument("targets", nargs=-1)
+def plan(targets, timings, profile, exclude):
     """Plan the test execution order for modules."""
-    order = get_execution_order(regress_stack.modules, target)
+    order = get_execution_order(regress_stack.modules, targets, exclude=exclude)
     print("Execution Order:")
     pprint(order)
+    if timings:
+        _print_timings(targets, exclude)
+    if profile:
+        print("Platform profile:")
+        for line in core_profile.report():
+            print("  " + line)
@@ -0,0 +1,30 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import click
+
+from regress_stack.core import accounting
+
+
+@click.command()
+@click.option(
+    "--all",
+    "all_sessions",
+    is_flag=True,
+    help="Aggregate the subprocesses of every kept invocation, not only the last one.",
+)
+@click.option(
+    "--limit",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Number of entries shown per section.",
+)
+def profile(all_sessions, limit):
+    """Report the cost of the subprocesses run by regress-stack.
+
+    Subprocess runs are aggregated by command, by module and the slowest
+    ones are listed.
+    """
+    for line in accounting.report(accounting.load(all_sessions), limit):
+        print(line)
@@ -0,0 +1,65 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import click
+import logging
+
+import networkx as nx
+
+import regress_stack.modules
+from regress_stack.core import checkpoint, locks, trace, utils
+from regress_stack.core import fingerprint as core_fingerprint
+from regress_stack.core.executor import execute_graph
+from regress_stack.core.modules import ModuleComp, get_reset_graph
+from regress_stack.cli.utils import concurrency_option
+
+LOG = logging.getLogger(__name__)
+
+
+def _reset_module(mod: ModuleComp):
+    was_setup = utils.is_setup_done(mod.name)
+    # Forget the setup first, a module failing to reset is set up again.
+    utils.unmark_setup(mod.name)
+    core_fingerprint.forget(mod.name)
+    checkpoint.Journal(mod.name).clear()
+    if not was_setup:
+        # Its backends, e.g. the ceph cluster or keystone API, may not exist.
+        LOG.info("Skipping reset of %s, it was not set up", mod.name)
+        return
+    if reset_func := getattr(mod.module, "reset", None):
+        timeouts = getattr(mod.module, "TIMEOUTS", {})
+        with utils.measure("reset " + mod.name, trace.MODULE), locks.owner(mod.name):
+            with utils.command_timeouts(timeouts):
+                reset_func()
+
+
+@click.command()
+@click.option(
+    "--jobs",
+    "-j",
+    type=str,
+    default="1",
+    callback=concurrency_option,
+    help="The number of modules to reset concurrently, defaults to 1. The value 'auto' sets jobs to number of cpus / 3.",
+)
+@click.argument("targets", nargs=-1)
+@utils.measure_time
+def reset(targets, jobs):
+    """Undo the setup of modules, so the node can be set up again.
+
+    Modules drop what their setup created: databases, message queue users,
+    keystone entities, ceph pools and OSDs, OVS bridges. Modules requiring a
+    target are reset along with it, before it, and independent modules are
+    reset concurrently. Modules that were not set up are only forgotten.
+    Packages stay installed.
+    """
+    try:
+        graph = get_reset_graph(regress_stack.modules, targets)
+        if jobs > 1:
+            execute_graph(graph, _reset_module, jobs)
+        else:
+            for mod in nx.lexicographical_topological_sort(graph):
+                _reset_module(mod)
+    except Exception as e:
+        LOG.error("Failed to reset %s: %s", " ".join(targets) or "all", e)
+        raise
@@ -2,28 +2,224 @@
 # SPDX-License-Identifier: GPL-3.0-only
 
 import click
+import contextlib
 import logging
+import time
+import typing
+
+import networkx as nx
 
 import regress_stack.modules
-from regress_stack.core import utils
-from regress_stack.core.modules import get_execution_order
-from regress_stack.cli.utils import collect_logs
+from regress_stack.core import apt as core_apt
+from regress_stack.core import (
+    checkpoint,
+    dryrun,
+    locks,
+    pipeline,
+    timings,
+    trace,
+    utils,
+)
+from regress_stack.core import fingerprint as core_fingerprint
+from regress_stack.core.executor import execute_graph
+from regress_stack.core.modules import (
+    ModuleComp,
+    get_execution_graph,
+)
+from regress_stack.cli.utils import collect_logs, concurrency_option
 
 LOG = logging.getLogger(__name__)
 
 
+def _timeouts(mod: ModuleComp):
+    return utils.command_timeouts(getattr(mod.module, "TIMEOUTS", {}))
+
+
+def _setup_module(mod: ModuleComp, fingerprint: str):
+    if setup_func := pipeline.setup_func(mod.module):
+        with utils.measure("setup " + mod.name, trace.MODULE) as measurement:
+            with locks.owner(mod.name), checkpoint.journal(mod.name):
+                with core_fingerprint.recording() as config, _timeouts(mod):
+                    setup_func()
+            utils.mark_setup(mod.name)
+        timings.record(mod.name, measurement.duration)
+    else:
+        config = {}
+    core_fingerprint.record(
+        mod.name, fingerprint, config, core_fingerprint.package_versions(mod)
+    )
+
+
+def _setup_pipeline(
+    graph: nx.DiGraph,
+    fingerprints: typing.Dict[ModuleComp, str],
+    unchanged: typing.Set[ModuleComp],
+    jobs: int,
+):
+    pending = [mod for mod in graph if mod not in unchanged]
+    journals = {mod: checkpoint.Journal(mod.name) for mod in pending}
+    configs: typing.Dict[ModuleComp, core_fingerprint.Config] = {
+        mod: {} for mod in pending
+    }
+    durations = {mod: 0.0 for mod in pending}
+
+    @contextlib.contextmanager
+    def context(mod: ModuleComp):
+        start = time.time()
+        try:
+            with locks.owner(mod.name), checkpoint.using(journals[mod]):
+                with core_fingerprint.recording(configs[mod]), _timeouts(mod):
+                    yield
+        finally:
+            durations[mod] += time.time() - start
+
+    def on_done(mod: ModuleComp):
+        journals[mod].clear()
+        utils.mark_setup(mod.name)
+        timings.record(mod.name, durations[mod])
+        core_fingerprint.record(
+            mod.name,
+            fingerprints[mod],
+            configs[mod],
+            core_fingerprint.package_versions(mod),
+        )
+
+    pipeline.execute(graph, jobs, skip=unchanged, context=context, on_done=on_done)
+
+
+def _dry_run(graph: nx.DiGraph, unchanged: typing.Set[ModuleComp]):
+    recorder = dryrun.Recorder()
+    history = timings.load()
+    durations = {}
+    for mod in nx.lexicographical_topological_sort(graph):
+        if mod in unchanged:
+            print(f"{mod.name}: unchanged, skipped")
+            durations[mod] = 0.0
+            continue
+        duration = timings.estimate(history, mod.name)
+        if duration is None:
+            print(f"{mod.name}: predicted cost unknown")
+        else:
+            durations[mod] = duration
+            print(f"{mod.name}: predicted cost {duration:.2f}s")
+        if setup_func := pipeline.setup_func(mod.module):
+            recorder.run_setup(mod.name, setup_func)
+        for actions, count in recorder.module_actions(mod.name):
+            indent = "  "
+            if count > 1:
+                print(f"  repeated {count} times:")
+                indent = "    "
+            for action in actions:
+                print(f"{indent}{action.kind:<8} {action.detail}")
+
+    serial = sum(durations.values())
+    _, parallel = timings.critical_path(graph, durations)
+    print(f"Predicted serial wall time: {serial:.2f}s")
+    print(f"Predicted parallel wall time: {parallel:.2f}s")
+    if missing := len(graph) - len(durations):
+        print(f"WARNING: {missing} module(s) without recorded timings")
+
+
 @click.command()
-@click.argument("target", required=False)
+@click.option(
+    "--jobs",
+    "-j",
+    type=str,
+    default="1",
+    callback=concurrency_option,
+    help="The number of modules to set up concurrently, defaults to 1. The value 'auto' sets jobs to number of cpus / 3.",
+)
+@click.option(
+    "--exclude",
+    "-x",
+    multiple=True,
+    help="Module to leave out, along with the modules requiring it. Can be repeated.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Set up modules even when their inputs did not change since their last setup.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Show the commands, restarts and API calls the setup would perform, with their predicted cost, without performing them.",
+)
+@click.option(
+    "--pipeline",
+    "use_pipeline",
+    is_flag=True,
+    help="Set up modules phase by phase: provisioning, configuration and migrations batched across modules, service restarts coalesced.",
+)
+@click.option(
+    "--upgraded",
+    is_flag=True,
+    help="Only set up again the modules whose packages changed since their last setup, along with the modules requiring them, ignoring changes of their source, host facts and configuration. Modules without recorded package versions are checked as without this flag.",
+)
+@click.argument("targets", nargs=-1)
 @utils.measure_time
-def setup(target):
-    """Execute the setup phase for modules."""
+def setup(targets, jobs, exclude, force, dry_run, use_pipeline, upgraded):
+    """Execute the setup phase for modules.
+
+    Several targets can be given, the union of their dependencies is set up
+    once. Modules whose packages, host facts, dependencies and written
+    configuration did not change since their last setup are skipped.
+
+    Package upgrades alone already only set up again the modules whose
+    packages changed and the modules requiring them. --upgraded narrows the
+    setup to those modules even when the host facts, module sources or
+    written configuration drifted, e.g. to test an upgrade after flipping to
+    -proposed without reconfiguring anything else.
+    """
     try:
-        for mod in get_execution_order(regress_stack.modules, target):
-            if setup_func := getattr(mod.module, "setup", None):
-                with utils.measure("setup " + mod.name):
-                    setup_func()
-                    utils.mark_setup(mod.name)
+        graph = get_execution_graph(regress_stack.modules, targets, exclude=exclude)
+        fingerprints = core_fingerprint.compute(graph)
+        records = {} if force else core_fingerprint.load()
+        unchanged = {
+            mod
+            for mod in graph
+            if core_fingerprint.unchanged(mod.name, fingerprints[mod], records)
+        }
+        if upgraded:
+            unrecorded = core_fingerprint.unrecorded(graph, records)
+            if unrecorded:
+                LOG.warning(
+                    "No package versions recorded for %s, checking their "
+                    "fingerprints instead",
+                    ", ".join(sorted(mod.name for mod in unrecorded)),
+                )
+            changed = core_fingerprint.upgraded(graph, records)
+            unchanged = {
+                mod
+                for mod in graph
+                if mod not in changed and (mod not in unrecorded or mod in unchanged)
+            }
+        if dry_run:
+            _dry_run(graph, unchanged)
+            return
+
+        if use_pipeline:
+            _setup_pipeline(graph, fingerprints, unchanged, jobs)
+            return
+
+        def _setup(mod: ModuleComp):
+            if mod in unchanged:
+                LOG.info("Skipping %s, its inputs did not change", mod.name)
+                return
+            _setup_module(mod, fingerprints[mod])
+
+        if jobs > 1:
+            execute_graph(graph, _setup, jobs)
+        else:
+            for mod in nx.lexicographical_topological_sort(graph):
+                _setup(mod)
     except Exception as e:
-        LOG.error("Failed to setup %s: %s", target, e)
+        LOG.error("Failed to setup %s: %s", " ".join(targets) or "all", e)
         collect_logs()
         raise
+    finally:
+        LOG.info("Opened the apt cache %d time(s)", core_apt.CACHE_OPENS)
+        if contention := locks.report():
+            print("Shared resource contention:")
+            for line in contention:
+                print("  " + line)
@@ -10,11 +10,11 @@ import subprocess
 
 import regress_stack.modules
 from regress_stack.core import apt as core_apt
-from regress_stack.core import utils
+from regress_stack.core import profile, utils
 from regress_stack.core.modules import get_execution_order
 from regress_stack.modules import keystone
 from regress_stack.modules import utils as module_utils
-from regress_stack.cli.utils import collect_logs
+from regress_stack.cli.utils import collect_logs, concurrency_option
 
 LOG = logging.getLogger(__name__)
 
@@ -24,9 +24,7 @@ LOG = logging.getLogger(__name__)
     "--concurrency",
     type=str,
     default="1",
-    callback=lambda ctx, param, value: utils.concurrency_cb(value)
-    if value != "1"
-    else 1,
+    callback=concurrency_option,
     help="The number of workers to use, defaults to 1. The value 'auto' sets concurrency to number of cpus / 3.",
 )
 @click.option(
@@ -40,9 +38,9 @@ def test(concurrency, retry_failed):
     """Run the regression tests using Tempest."""
 
     # NOTE(freyes): use PPA to fix http://pad.lv/2141604 if needed.
-    if core_apt.PkgVersionCompare("python3-tempestconf") < "3.5.1-1ubuntu1~cloud0":
+    if not profile.current().tempestconf_fixed:
         core_apt.add_ppa("ppa:freyes/lp2141604")
-        utils.run("apt", ["install", "-yq", "--only-upgrade", "python3-tempestconf"])
+        core_apt.install(["python3-tempestconf"], only_upgrade=True)
     env = os.environ.copy()
     env.update(keystone.auth_env())
     dir_name = "mycloud01"
@@ -3,11 +3,23 @@
 
 import pathlib
 
+import click
+
 import regress_stack.modules
-from regress_stack.core import utils
+from regress_stack.core import profile, utils
 from regress_stack.core.modules import get_execution_order
 
 
+def concurrency_option(ctx: click.Context, param: click.Parameter, value: str) -> int:
+    """Click callback parsing a concurrency option, see utils.concurrency_cb."""
+    try:
+        return utils.concurrency_cb(value)
+    except ValueError:
+        raise click.BadParameter(
+            f"{value!r} is neither 'auto' nor a positive integer"
+        ) from None
+
+
 def _output_log_file(path: pathlib.Path):
     """Output the contents of a log file to stdout."""
     with path.open(encoding="utf-8", errors="replace") as log_file:
@@ -17,11 +29,14 @@ def _output_log_file(path: pathlib.Path):
 
 def collect_logs():
     """Collect and output logs from all modules and the system journal."""
+    with utils.banner("Platform profile"):
+        for line in profile.report():
+            print(line)
     for mod in get_execution_order(regress_stack.modules, None):
-        logs = getattr(mod.module, "LOGS", None)
+        logs = mod.metadata.logs
         if not logs:
             continue
-        with utils.banner(f"Collecting logs for {mod.module.__name__}"):
+        with utils.banner(f"Collecting logs for {mod.name}"):
             for log in logs:
                 log_path = pathlib.Path(log)
                 if not log_path.exists():
@@ -32,5 +47,11 @@ def collect_logs():
                 else:
                     _output_log_file(log_path)
     utils.print_ascii_banner("Collecting journal logs")
-    utils.run("journalctl", ["-o", "short-precise", "--no-pager"])
+    # The journal can be large, stream it instead of buffering it whole.
+    utils.stream(
+        "journalctl",
+        ["-o", "short-precise", "--no-pager"],
+        on_line=lambda line: print(line, end=""),
+        tee=utils.REGRESS_STACK_DIR / "logs" / "journal.log",
+    )
     utils.print_ascii_banner("Collected journal logs")
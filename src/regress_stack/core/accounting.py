@@ -0,0 +1,170 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Accounting of the subprocesses run by regress-stack.
+
+Every command run through utils.run, utils.sudo and utils.system is appended
+to a JSON lines log with its argv, duration, exit code, output sizes and the
+module it ran for. Each regress-stack invocation logs to its own session
+file, only the last SESSIONS_KEPT are kept, and they are aggregated by the
+profile command.
+"""
+
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from regress_stack.core import locks, utils
+
+LOG = logging.getLogger(__name__)
+
+ACCOUNTING_DIR = "subprocesses"
+SESSIONS_KEPT = 10
+
+SESSION = f"{int(time.time())}-{os.getpid()}"
+
+Entry = typing.Dict[str, typing.Any]
+
+_LOCK = threading.Lock()
+
+
+def _accounting_dir() -> pathlib.Path:
+    return utils.REGRESS_STACK_DIR / ACCOUNTING_DIR
+
+
+def _session_order(path: pathlib.Path) -> typing.Tuple[int, int, str]:
+    started, _, pid = path.stem.partition("-")
+    try:
+        return int(started), int(pid), path.stem
+    except ValueError:
+        return 0, 0, path.stem
+
+
+def _sessions() -> typing.List[pathlib.Path]:
+    """Session logs, the oldest first."""
+    return sorted(_accounting_dir().glob("*.jsonl"), key=_session_order)
+
+
+def _prune() -> None:
+    """Remove the oldest session logs so a new one fits in SESSIONS_KEPT."""
+    sessions = _sessions()
+    for path in sessions[: max(len(sessions) - SESSIONS_KEPT + 1, 0)]:
+        path.unlink()
+
+
+def record(
+    argv: typing.Sequence[str],
+    duration: float,
+    exit_code: int,
+    stdout_bytes: typing.Optional[int] = None,
+    stderr_bytes: typing.Optional[int] = None,
+) -> None:
+    """Append a subprocess run to the log, output sizes are unknown when the
+    output was not captured."""
+    entry = {
+        "session": SESSION,
+        "module": locks.current_owner(),
+        "argv": list(argv),
+        "duration": round(duration, 6),
+        "exit_code": exit_code,
+        "stdout_bytes": stdout_bytes,
+        "stderr_bytes": stderr_bytes,
+    }
+    line = json.dumps(entry) + "\n"
+    path = _accounting_dir() / f"{SESSION}.jsonl"
+    with _LOCK:
+        try:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _prune()
+            with path.open("a") as f:
+                f.write(line)
+        except OSError as e:
+            LOG.debug("Failed to account subprocess %r: %s", argv[0], e)
+
+
+def size(output: typing.Optional[str]) -> typing.Optional[int]:
+    """Size in bytes of captured output."""
+    return None if output is None else len(output.encode())
+
+
+def load(all_sessions: bool = False) -> typing.List[Entry]:
+    """Return the logged subprocess runs of the last session, or of all."""
+    sessions = _sessions()
+    if not all_sessions:
+        sessions = sessions[-1:]
+    entries = []
+    for path in sessions:
+        try:
+            lines = path.read_text().splitlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                LOG.debug("Ignoring unreadable accounting entry: %r", line)
+    return entries
+
+
+def command(argv: typing.Sequence[str]) -> str:
+    """Name of the command run, looking through sudo and its options."""
+    args = list(argv)
+    if args and os.path.basename(args[0]) == "sudo":
+        args = args[1:]
+        while args and args[0].startswith("-"):
+            option = args.pop(0)
+            if option in ("-u", "--user", "-g", "--group") and args:
+                args.pop(0)
+    if not args:
+        return "sudo"
+    return os.path.basename(args[0].split(" ", 1)[0])
+
+
+class Aggregate(typing.NamedTuple):
+    name: str
+    runs: int
+    total: float
+    failures: int
+
+
+def aggregate(
+    entries: typing.Iterable[Entry], key: typing.Callable[[Entry], str]
+) -> typing.List[Aggregate]:
+    """Aggregate entries by key, the most expensive first."""
+    totals: typing.Dict[str, typing.List[typing.Any]] = {}
+    for entry in entries:
+        total = totals.setdefault(key(entry), [0, 0.0, 0])
+        total[0] += 1
+        total[1] += entry["duration"]
+        total[2] += entry["exit_code"] != 0
+    aggregates = [Aggregate(name, *total) for name, total in totals.items()]
+    return sorted(aggregates, key=lambda a: (-a.total, a.name))
+
+
+def report(entries: typing.Sequence[Entry], limit: int = 20) -> typing.List[str]:
+    """Describe where subprocess time went, by command and by module."""
+    if not entries:
+        return ["No subprocess recorded"]
+    total = sum(entry["duration"] for entry in entries)
+    lines = [f"{len(entries)} subprocess(es), {total:.2f}s in total"]
+    for title, key in (
+        ("By command:", lambda entry: command(entry["argv"])),
+        ("By module:", lambda entry: entry["module"] or "main"),
+    ):
+        lines.append(title)
+        for a in aggregate(entries, key)[:limit]:
+            failed = f", {a.failures} failed" if a.failures else ""
+            lines.append(
+                f"  {a.name:<30} {a.runs:6d} run(s) {a.total:9.2f}s "
+                f"{a.total / a.runs:7.3f}s avg{failed}"
+            )
+    lines.append("Slowest:")
+    for entry in sorted(entries, key=lambda entry: -entry["duration"])[:limit]:
+        argv = " ".join(entry["argv"])
+        lines.append(f"  {entry['duration']:9.2f}s {argv[:100]}")
+    return lines
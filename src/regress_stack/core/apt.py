@@ -1,58 +1,240 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+"""Package states and versions.
+
+Installed versions are read from the dpkg status database, python-apt is
+only imported, and its cache opened, when candidate versions are needed.
+"""
+
+import logging
+import os
+import threading
+import time
 import typing
 
-import apt
-import apt_pkg
+from regress_stack.core import dpkg, locks, utils
+
+if typing.TYPE_CHECKING:
+    import apt as python_apt
+
+LOG = logging.getLogger(__name__)
+
+# python-apt, imported on first use
+apt: typing.Any = None
+APT_CACHE: typing.Optional["python_apt.Cache"] = None
+# Number of times the package lists were parsed into a cache
+CACHE_OPENS = 0
+_CACHE_LOCK = threading.Lock()
+
+
+def _python_apt():
+    global apt
 
-from regress_stack.core import utils
+    if apt is None:
+        import apt as python_apt
 
-APT_CACHE: typing.Optional[apt.Cache] = None
+        apt = python_apt
+    return apt
 
-# Initialize the apt_pkg module, otherwise some functions will not return the
-# expected value.
-apt_pkg.init()
 
+def get_cache() -> "python_apt.Cache":
+    global APT_CACHE, CACHE_OPENS
 
-def get_cache() -> apt.Cache:
+    with _CACHE_LOCK:
+        if APT_CACHE is None:
+            APT_CACHE = _python_apt().Cache()
+            CACHE_OPENS += 1
+            LOG.debug("Opened apt cache, %d open(s) so far", CACHE_OPENS)
+        return APT_CACHE
+
+
+def invalidate_cache() -> None:
+    """Drop the shared cache, reopened on next use.
+
+    Must be called after changing the package sources or installed packages.
+    """
     global APT_CACHE
 
-    if APT_CACHE is None:
-        APT_CACHE = apt.Cache()
+    with _CACHE_LOCK:
+        APT_CACHE = None
 
-    return APT_CACHE
 
+class PackageState(typing.NamedTuple):
+    """Installed and candidate versions of a package, None when missing."""
+
+    name: str
+    installed: typing.Optional[str]
+    candidate: typing.Optional[str]
+
+
+def package_states(
+    pkgs: typing.Iterable[str], candidate: bool = True
+) -> typing.Dict[str, PackageState]:
+    """Resolve the state of packages in a single pass over the shared cache.
+
+    Unknown packages have neither an installed nor a candidate version. When
+    candidate is False, only the installed versions are resolved, from the
+    dpkg status database.
+    """
+    states: typing.Dict[str, PackageState] = {}
+    if not candidate:
+        installed_versions = dpkg.installed_versions()
+        for pkg in pkgs:
+            states[pkg] = PackageState(pkg, installed_versions.get(pkg), None)
+        return states
 
-def pkgs_installed(pkgs: typing.List[str]) -> bool:
     apt_cache = get_cache()
+    for pkg in pkgs:
+        if pkg in states:
+            continue
+        try:
+            package = apt_cache[pkg]
+        except KeyError:
+            states[pkg] = PackageState(pkg, None, None)
+            continue
+        installed_version = package.installed
+        candidate_version = package.candidate
+        states[pkg] = PackageState(
+            pkg,
+            installed_version.version if installed_version is not None else None,
+            candidate_version.version if candidate_version is not None else None,
+        )
+    return states
 
-    try:
-        return all([apt_cache[pkg].is_installed for pkg in pkgs])
-    except KeyError:
-        return False
+
+def pkgs_installed(pkgs: typing.List[str]) -> bool:
+    installed_versions = dpkg.installed_versions()
+    return all(pkg in installed_versions for pkg in pkgs)
 
 
 def get_pkg_version(pkg: str) -> typing.Optional[str]:
-    apt_cache = get_cache()
+    return dpkg.installed_version(pkg)
 
-    try:
-        pkg_version = apt_cache[pkg].installed
-    except KeyError:
-        return None
-    if pkg_version is None:
-        return None
-    return pkg_version.version
+
+upstream_version = dpkg.upstream_version
+version_compare = dpkg.version_compare
 
 
 def add_ppa(ppa: str) -> None:
     """Add a PPA to the system."""
-    utils.run("add-apt-repository", ["-y", ppa])
+    with locks.hold(locks.APT):
+        utils.run("add-apt-repository", ["-y", ppa])
+        invalidate_cache()
 
 
 def remove_ppa(ppa: str) -> None:
     """Remove a PPA from the system."""
-    utils.run("add-apt-repository", ["-y", "--remove", ppa])
+    with locks.hold(locks.APT):
+        utils.run("add-apt-repository", ["-y", "--remove", ppa])
+        invalidate_cache()
+
+
+def install(pkgs: typing.List[str], only_upgrade: bool = False) -> None:
+    """Install packages, or only upgrade those already installed."""
+    args = ["install", "-yq"]
+    if only_upgrade:
+        args.append("--only-upgrade")
+    with locks.hold(locks.APT):
+        try:
+            utils.run("apt", [*args, *pkgs])
+        finally:
+            invalidate_cache()
+
+
+class InstallTimings:
+    """Durations of an installation, by package and by step."""
+
+    def __init__(self):
+        self.download: typing.Dict[str, float] = {}
+        # dpkg steps: "unpack" and "configure"
+        self.dpkg: typing.Dict[str, typing.Dict[str, float]] = {}
+        self.total = 0.0
+
+    def add_dpkg(self, pkg: str, step: str, duration: float) -> None:
+        steps = self.dpkg.setdefault(pkg, {})
+        steps[step] = steps.get(step, 0.0) + duration
+
+    def report(self) -> typing.List[str]:
+        """Describe the timings, slowest packages first."""
+        pkgs = set(self.download) | set(self.dpkg)
+
+        def total(pkg: str) -> float:
+            return self.download.get(pkg, 0.0) + sum(self.dpkg.get(pkg, {}).values())
+
+        lines = []
+        for pkg in sorted(pkgs, key=lambda pkg: (-total(pkg), pkg)):
+            steps = self.dpkg.get(pkg, {})
+            lines.append(
+                f"{pkg}: download {self.download.get(pkg, 0.0):.2f}s, "
+                f"unpack {steps.get('unpack', 0.0):.2f}s, "
+                f"configure {steps.get('configure', 0.0):.2f}s"
+            )
+        lines.append(f"Installed {len(pkgs)} package(s) in {self.total:.2f}s")
+        return lines
+
+
+def _progress(timings: InstallTimings):
+    import apt.progress.base
+
+    class FetchProgress(apt.progress.base.AcquireProgress):
+        def __init__(self):
+            super().__init__()
+            self._started: typing.Dict[str, float] = {}
+
+        def fetch(self, item):
+            self._started[item.uri] = time.monotonic()
+
+        def done(self, item):
+            if (start := self._started.pop(item.uri, None)) is not None:
+                timings.download[item.shortdesc] = time.monotonic() - start
+
+    class InstallProgress(apt.progress.base.InstallProgress):
+        _current: typing.Optional[typing.Tuple[str, str, float]] = None
+
+        def _step_done(self):
+            if self._current is not None:
+                pkg, step, start = self._current
+                timings.add_dpkg(pkg, step, time.monotonic() - start)
+                self._current = None
+
+        def processing(self, pkg, stage):
+            self._step_done()
+            step = "configure" if stage == "configure" else "unpack"
+            self._current = pkg.split(":")[0], step, time.monotonic()
+
+        def finish_update(self):
+            self._step_done()
+
+    return FetchProgress(), InstallProgress()
+
+
+def install_packages(pkgs: typing.Iterable[str]) -> InstallTimings:
+    """Install packages from the shared cache in a single transaction.
+
+    The packages are downloaded concurrently by the apt acquire system
+    before being unpacked and configured.
+
+    :raises: ValueError if a package is unknown.
+    """
+    timings = InstallTimings()
+    os.environ.setdefault("DEBIAN_FRONTEND", "noninteractive")
+    start = time.monotonic()
+    with locks.hold(locks.APT):
+        try:
+            apt_cache = get_cache()
+            with apt_cache.actiongroup():
+                for pkg in pkgs:
+                    try:
+                        apt_cache[pkg].mark_install()
+                    except KeyError:
+                        raise ValueError(f"Package {pkg} not found")
+            if apt_cache.get_changes():
+                apt_cache.commit(*_progress(timings))
+        finally:
+            invalidate_cache()
+    timings.total = time.monotonic() - start
+    return timings
 
 
 def get_upstream_pkg_version(
@@ -71,7 +253,7 @@ def get_upstream_pkg_version(
         version = pkg_version.version
     if version is None:
         return None
-    return apt_pkg.upstream_version(version)
+    return upstream_version(version)
 
 
 class PkgVersionCompare:
@@ -87,36 +269,28 @@ class PkgVersionCompare:
                           If False, compare with the installed version.
         :param upstream: If True, compare only the upstream package version.
         """
-        apt_cache = apt.Cache()
-        apt_cache.open()
-        try:
-            if candidate:
-                pkg_version = apt_cache[name].candidate
-            else:
-                pkg_version = apt_cache[name].installed
-        except KeyError:
-            if candidate:
+        if candidate:
+            version = package_states([name])[name].candidate
+            if version is None:
                 raise ValueError(f"Package {name} has no candidate version")
-            else:
+        else:
+            version = get_pkg_version(name)
+            if version is None:
                 raise ValueError(f"Package {name} is not installed")
-        if pkg_version is None:
-            if candidate:
-                raise ValueError(f"Package {name} has no candidate version")
-            raise ValueError(f"Package {name} is not installed")
-        self.version = pkg_version.version
+        self.version = version
         if upstream:
-            self.version = apt_pkg.upstream_version(self.version)
+            self.version = upstream_version(self.version)
 
     def __lt__(self, other: str) -> bool:
-        cmp = apt_pkg.version_compare(self.version, other)
+        cmp = version_compare(self.version, other)
         return cmp < 0
 
     def __eq__(self, other: str) -> bool:
-        cmp = apt_pkg.version_compare(self.version, other)
+        cmp = version_compare(self.version, other)
         return cmp == 0
 
     def __ge__(self, other: str) -> bool:
-        cmp = apt_pkg.version_compare(self.version, other)
+        cmp = version_compare(self.version, other)
         return cmp >= 0
 
     def __ne__(self, other: str) -> bool:
@@ -0,0 +1,141 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Step-level checkpoints for module setup.
+
+Modules split their setup in named steps with checkpoint.step(). Completed
+steps are journaled along with a hash of their inputs and the configuration
+they wrote, so that a setup interrupted halfway resumes at the first
+incomplete step. The journal holds the results of the steps, credentials
+included, it is only readable by its owner and discarded once the module
+setup completes.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import typing
+
+from regress_stack.core import fingerprint, trace, utils
+
+LOG = logging.getLogger(__name__)
+
+_JOURNAL: "contextvars.ContextVar[typing.Optional[Journal]]" = contextvars.ContextVar(
+    "journal", default=None
+)
+
+T = typing.TypeVar("T")
+
+
+def _inputs_hash(args: typing.Sequence, kwargs: typing.Mapping) -> str:
+    data = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _record_config(config: typing.Mapping[str, typing.Sequence]) -> None:
+    for config_file, values in config.items():
+        fingerprint.record_config(config_file, *(tuple(value) for value in values))
+
+
+class Journal:
+    """Journal of the completed setup steps of a module."""
+
+    name: str
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = utils.REGRESS_STACK_DIR / (name + ".steps.json")
+        self._steps: typing.List[typing.Dict[str, typing.Any]] = []
+        self._position = 0
+        self._resuming = True
+        try:
+            self._steps = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            LOG.warning("Ignoring corrupted journal %s", self.path)
+
+    def step(self, name: str, func: typing.Callable[..., T], *args, **kwargs) -> T:
+        """Run func, unless the step completed in a previous run.
+
+        A step is skipped when the previous run completed it with the same
+        inputs and all the steps before it were skipped as well. Its recorded
+        result is returned instead, results must be JSON serializable, and
+        the configuration it wrote is recorded again for its fingerprint.
+        """
+        inputs = _inputs_hash(args, kwargs)
+        if self._resuming and self._position < len(self._steps):
+            entry = self._steps[self._position]
+            if entry["name"] == name and entry["inputs"] == inputs:
+                self._position += 1
+                LOG.info("Skipping completed step %r of %s", name, self.name)
+                _record_config(entry.get("config", {}))
+                return entry["result"]
+        # Everything from the first incomplete step onward runs again.
+        self._resuming = False
+        del self._steps[self._position :]
+
+        with fingerprint.recording() as config:
+            result = func(*args, **kwargs)
+        _record_config(config)
+        try:
+            json.dumps(result)
+        except TypeError:
+            raise TypeError(
+                f"Result of step {name!r} of {self.name} is not JSON serializable"
+            )
+        self._steps.append(
+            {"name": name, "inputs": inputs, "result": result, "config": config}
+        )
+        self._position += 1
+        self._save()
+        return result
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.touch(mode=0o600)
+        tmp_path.chmod(0o600)
+        tmp_path.write_text(json.dumps(self._steps, indent=2))
+        tmp_path.replace(self.path)
+
+    def clear(self) -> None:
+        self._steps = []
+        self._position = 0
+        self.path.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def using(current: Journal):
+    """Journal the steps running in this context to current."""
+    token = _JOURNAL.set(current)
+    try:
+        yield current
+    finally:
+        _JOURNAL.reset(token)
+
+
+@contextlib.contextmanager
+def journal(name: str):
+    """Journal the steps of the module setup running in this context.
+
+    The journal is cleared when the context exits without error.
+    """
+    with using(Journal(name)) as current:
+        yield current
+        current.clear()
+
+
+def step(name: str, func: typing.Callable[..., T], *args, **kwargs) -> T:
+    """Run func as a named step of the current module setup.
+
+    Without a journal, e.g. when a module is set up outside of the setup
+    command, func is simply called.
+    """
+    current = _JOURNAL.get()
+    with trace.span(name, trace.CHECKPOINT):
+        if current is None:
+            return func(*args, **kwargs)
+        return current.step(name, func, *args, **kwargs)
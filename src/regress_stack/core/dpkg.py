@@ -0,0 +1,133 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Installed package versions, read from the dpkg status database.
+
+Reading the status file directly is much cheaper than opening an apt cache
+and does not require python-apt, it is enough whenever candidate versions
+are not needed. Versions are compared following the Debian policy.
+"""
+
+import logging
+import os
+import pathlib
+import threading
+import typing
+
+LOG = logging.getLogger(__name__)
+
+STATUS = pathlib.Path("/var/lib/dpkg/status")
+
+# Package states in which a version is present on the system
+_NOT_INSTALLED = ("not-installed", "config-files")
+
+_INSTALLED: typing.Optional[typing.Tuple[typing.Tuple, typing.Dict[str, str]]] = None
+_LOCK = threading.Lock()
+
+
+def _parse(data: str) -> typing.Dict[str, str]:
+    versions: typing.Dict[str, str] = {}
+    for paragraph in data.split("\n\n"):
+        fields = {}
+        for line in paragraph.splitlines():
+            if not line or line[0] in " \t":
+                continue
+            name, _, value = line.partition(":")
+            fields[name] = value.strip()
+        package = fields.get("Package")
+        version = fields.get("Version")
+        state = fields.get("Status", "").rsplit(" ", 1)[-1]
+        if not package or not version or state in _NOT_INSTALLED:
+            continue
+        # Multi-arch packages are listed once per architecture
+        versions.setdefault(package, version)
+    return versions
+
+
+def installed_versions() -> typing.Dict[str, str]:
+    """Return the installed version of every package, by package name.
+
+    The status database is parsed again only when it changed.
+    """
+    global _INSTALLED
+
+    try:
+        stat = os.stat(STATUS)
+    except FileNotFoundError:
+        LOG.debug("No dpkg status database at %s", STATUS)
+        return {}
+    key = (str(STATUS), stat.st_mtime_ns, stat.st_size)
+    with _LOCK:
+        if _INSTALLED is None or _INSTALLED[0] != key:
+            data = STATUS.read_text(encoding="utf-8", errors="replace")
+            _INSTALLED = key, _parse(data)
+        return _INSTALLED[1]
+
+
+def installed_version(pkg: str) -> typing.Optional[str]:
+    return installed_versions().get(pkg)
+
+
+def _split(version: str) -> typing.Tuple[int, str, str]:
+    epoch = 0
+    if ":" in version:
+        head, version = version.split(":", 1)
+        epoch = int(head)
+    upstream, sep, revision = version.rpartition("-")
+    if not sep:
+        return epoch, version, ""
+    return epoch, upstream, revision
+
+
+def upstream_version(version: str) -> str:
+    """Strip the epoch and Debian revision from a package version."""
+    return _split(version)[1]
+
+
+def _order(c: str) -> int:
+    if not c or c.isdigit():
+        return 0
+    if c.isalpha():
+        return ord(c)
+    if c == "~":
+        return -1
+    return ord(c) + 256
+
+
+def _compare_part(a: str, b: str) -> int:
+    i = j = 0
+    while i < len(a) or j < len(b):
+        # Non digit prefixes, letters sort before other characters, and ~
+        # before anything, even the end of the string.
+        while (i < len(a) and not a[i].isdigit()) or (
+            j < len(b) and not b[j].isdigit()
+        ):
+            ac = _order(a[i] if i < len(a) else "")
+            bc = _order(b[j] if j < len(b) else "")
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+        # Numerical parts
+        start = i
+        while i < len(a) and a[i].isdigit():
+            i += 1
+        a_num = int(a[start:i] or 0)
+        start = j
+        while j < len(b) and b[j].isdigit():
+            j += 1
+        b_num = int(b[start:j] or 0)
+        if a_num != b_num:
+            return a_num - b_num
+    return 0
+
+
+def version_compare(a: str, b: str) -> int:
+    """Compare package versions, negative if a is older than b."""
+    a_epoch, a_upstream, a_revision = _split(a)
+    b_epoch, b_upstream, b_revision = _split(b)
+    if a_epoch != b_epoch:
+        return a_epoch - b_epoch
+    return _compare_part(a_upstream, b_upstream) or _compare_part(
+        a_revision, b_revision
+    )
@@ -0,0 +1,227 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Run module setups against a recording backend.
+
+Commands, service restarts, OpenStack API calls and file writes are recorded
+instead of being performed. Commands get canned outputs, good enough for the
+setup code to follow its "nothing exists yet" path.
+"""
+
+import contextlib
+import json
+import logging
+import pathlib
+import shutil
+import subprocess
+import time
+import typing
+
+from regress_stack.core import utils
+
+LOG = logging.getLogger(__name__)
+
+# Longest sequence of actions collapsed when repeated
+MAX_REPEATED_SEQUENCE = 4
+
+
+class Action(typing.NamedTuple):
+    module: str
+    kind: str
+    detail: str
+
+
+def _canned_output(cmd: str, args: typing.Sequence[str]) -> str:
+    if cmd == "lscpu":
+        return json.dumps({"lscpu": []})
+    if any("json" in arg for arg in args):
+        return "[]"
+    return ""
+
+
+def _format_call(args: typing.Sequence, kwargs: typing.Mapping) -> str:
+    return ", ".join(
+        [repr(arg) for arg in args] + [f"{k}={v!r}" for k, v in kwargs.items()]
+    )
+
+
+class ApiProxy:
+    """Stand-in for an OpenStack connection, recording the calls made on it.
+
+    Lookups allowed to miss return None, the other calls return a proxy for
+    their result.
+    """
+
+    def __init__(self, recorder: "Recorder", path: str):
+        self._recorder = recorder
+        self._path = path
+
+    def __getattr__(self, name: str) -> "ApiProxy":
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return ApiProxy(self._recorder, f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs) -> typing.Optional["ApiProxy"]:
+        call = f"{self._path}({_format_call(args, kwargs)})"
+        self._recorder.record("api", call)
+        if kwargs.get("ignore_missing") and self._path.rsplit(".")[-1].startswith(
+            "find_"
+        ):
+            return None
+        return ApiProxy(self._recorder, call)
+
+    def __iter__(self):
+        return iter(())
+
+    def __repr__(self):
+        return f"<{self._path}>"
+
+    __str__ = __repr__
+
+
+class Recorder:
+    """Collect the actions performed by module setups."""
+
+    def __init__(self):
+        self.actions: typing.List[Action] = []
+        self.module = ""
+
+    def record(self, kind: str, detail: str) -> None:
+        self.actions.append(Action(self.module, kind, detail))
+
+    def run(
+        self,
+        cmd: str,
+        args: typing.Sequence[str] = (),
+        env: typing.Optional[typing.Dict[str, str]] = None,
+        cwd: typing.Optional[str] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> str:
+        self.record("run", " ".join([cmd, *args]))
+        return _canned_output(cmd, args)
+
+    def sudo(
+        self, cmd: str, args: typing.Sequence[str], user: typing.Optional[str] = None
+    ) -> str:
+        self.record("sudo", f"({user or 'root'}) " + " ".join([cmd, *args]))
+        return _canned_output(cmd, args)
+
+    async def arun(
+        self,
+        cmd: str,
+        args: typing.Sequence[str] = (),
+        env: typing.Optional[typing.Dict[str, str]] = None,
+        cwd: typing.Optional[str] = None,
+        check: bool = True,
+        timeout: typing.Optional[float] = None,
+    ) -> utils.CommandResult:
+        return utils.CommandResult(
+            [cmd, *args], 0, self.run(cmd, args, env, cwd), "", 0.0
+        )
+
+    async def asudo(
+        self, cmd: str, args: typing.Sequence[str], user: typing.Optional[str] = None
+    ) -> utils.CommandResult:
+        return utils.CommandResult([cmd, *args], 0, self.sudo(cmd, args, user), "", 0.0)
+
+    def system(self, cmd: str, env=None, cwd=None) -> int:
+        self.record("run", cmd)
+        return 0
+
+    def subprocess_run(self, args, *_, **kwargs) -> subprocess.CompletedProcess:
+        cmd = args if isinstance(args, str) else " ".join(args)
+        self.record("run", cmd)
+        output = "" if kwargs.get("text") else b""
+        return subprocess.CompletedProcess(args, 0, stdout=output, stderr=output)
+
+    def restart_service(self, service: str) -> None:
+        self.record("restart", service)
+
+    def connect(self, *args, **kwargs) -> ApiProxy:
+        return ApiProxy(self, "conn")
+
+    def _file_action(self, kind: str):
+        recorder = self
+
+        def action(path, *args, **kwargs):
+            recorder.record(kind, str(path))
+
+        return action
+
+    def write_resource(
+        self, package: str, resource: str, destination: pathlib.Path, *args, **kwargs
+    ) -> bool:
+        self.record("write", f"{destination} (from {package}:{resource})")
+        return True
+
+    def sleep(self, seconds: float) -> None:
+        self.record("sleep", f"{seconds}s")
+
+    @contextlib.contextmanager
+    def patched(self):
+        """Route the side effects of module setups to this recorder."""
+        import openstack
+
+        patches = [
+            (utils, "run", self.run),
+            (utils, "sudo", self.sudo),
+            (utils, "arun", self.arun),
+            (utils, "asudo", self.asudo),
+            (utils, "system", self.system),
+            (utils, "restart_service", self.restart_service),
+            (utils, "write_resource", self.write_resource),
+            (subprocess, "run", self.subprocess_run),
+            (openstack, "connect", self.connect),
+            (pathlib.Path, "write_text", self._file_action("write")),
+            (pathlib.Path, "write_bytes", self._file_action("write")),
+            (pathlib.Path, "touch", self._file_action("write")),
+            (pathlib.Path, "mkdir", self._file_action("mkdir")),
+            (pathlib.Path, "chmod", self._file_action("chmod")),
+            (pathlib.Path, "unlink", self._file_action("remove")),
+            (shutil, "chown", self._file_action("chown")),
+            (time, "sleep", self.sleep),
+        ]
+        saved = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+        try:
+            for obj, name, value in patches:
+                setattr(obj, name, value)
+            yield self
+        finally:
+            for obj, name, value in saved:
+                setattr(obj, name, value)
+
+    def run_setup(self, name: str, setup_func: typing.Callable[[], None]) -> None:
+        """Dry run a module setup, recording where it stops on error."""
+        self.module = name
+        try:
+            with self.patched():
+                setup_func()
+        except Exception as e:
+            LOG.debug("Dry run of %s failed", name, exc_info=True)
+            self.record("error", f"{type(e).__name__}: {e}")
+        finally:
+            self.module = ""
+
+    def module_actions(
+        self, name: str
+    ) -> typing.List[typing.Tuple[typing.List[Action], int]]:
+        """Actions of module name, repeated sequences collapsed with a count.
+
+        Polling loops show up once, along with the number of iterations.
+        """
+        actions = [action for action in self.actions if action.module == name]
+        collapsed = []
+        i = 0
+        while i < len(actions):
+            for size in range(1, MAX_REPEATED_SEQUENCE + 1):
+                block = actions[i : i + size]
+                count = 1
+                while actions[i + count * size : i + (count + 1) * size] == block:
+                    count += 1
+                if count > 1:
+                    break
+            else:
+                block, count = actions[i : i + 1], 1
+            collapsed.append((block, count))
+            i += len(block) * count
+        return collapsed
@@ -0,0 +1,86 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import concurrent.futures
+import logging
+import typing
+
+import networkx as nx
+
+LOG = logging.getLogger(__name__)
+
+Node = typing.TypeVar("Node")
+
+
+class GraphExecutionError(RuntimeError):
+    """Raised when one or more nodes of a graph failed to execute."""
+
+    def __init__(
+        self,
+        failed: typing.Mapping[typing.Any, BaseException],
+        cancelled: typing.Set[typing.Any],
+    ):
+        self.failed = dict(failed)
+        self.cancelled = set(cancelled)
+        names = ", ".join(sorted(str(node) for node in self.failed))
+        super().__init__(f"Failed to execute {names}")
+
+
+def execute_graph(
+    graph: nx.DiGraph,
+    func: typing.Callable[[Node], typing.Any],
+    jobs: int = 1,
+) -> None:
+    """Execute func on every node of a DAG, running ready nodes concurrently.
+
+    A node is ready once all of its predecessors executed successfully. When a
+    node fails, all of its descendants are cancelled while independent nodes
+    keep running.
+
+    :raises: GraphExecutionError if any node failed.
+    """
+    if not nx.is_directed_acyclic_graph(graph):
+        raise RuntimeError("Circular dependency detected!")
+
+    pending = {node: graph.in_degree(node) for node in graph.nodes}
+    failed: typing.Dict[typing.Any, BaseException] = {}
+    cancelled: typing.Set[typing.Any] = set()
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(jobs, 1), thread_name_prefix="regress-stack"
+    ) as executor:
+        running: typing.Dict[concurrent.futures.Future, typing.Any] = {}
+
+        def submit_ready(nodes):
+            for node in sorted(nodes):
+                LOG.debug("Scheduling %s", node)
+                running[executor.submit(func, node)] = node
+
+        submit_ready(node for node, count in pending.items() if count == 0)
+        while running:
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            ready = []
+            for future in done:
+                node = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    LOG.error("Failed to execute %s: %s", node, error)
+                    failed[node] = error
+                    dependents = nx.descendants(graph, node)
+                    if dependents:
+                        LOG.warning(
+                            "Cancelling %s",
+                            ", ".join(sorted(str(dep) for dep in dependents)),
+                        )
+                    cancelled.update(dependents)
+                    continue
+                for successor in graph.successors(node):
+                    pending[successor] -= 1
+                    if pending[successor] == 0 and successor not in cancelled:
+                        ready.append(successor)
+            submit_ready(ready)
+
+    if failed:
+        raise GraphExecutionError(failed, cancelled)
@@ -0,0 +1,227 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Fingerprints of module setup inputs.
+
+A module fingerprint covers its source, the installed versions of its
+packages, the host facts the modules configure services with and the
+fingerprints of the modules it depends on. The configuration a module writes
+is recorded along with the fingerprint of its last successful setup, setup is
+skipped while the fingerprint matches and the configuration is untouched.
+
+The package versions a module was set up with are recorded too, so that
+after an upgrade only the modules whose packages changed, and the modules
+depending on them, are set up again.
+"""
+
+import configparser
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+import typing
+
+import networkx as nx
+
+from regress_stack.core import apt as core_apt
+from regress_stack.core import utils
+
+LOG = logging.getLogger(__name__)
+
+FINGERPRINTS_FILE = "setup-fingerprints.json"
+
+ConfigTuple = typing.Tuple[str, str, str]
+Config = typing.Dict[str, typing.List[ConfigTuple]]
+
+_CONFIG: "contextvars.ContextVar[typing.Optional[Config]]" = contextvars.ContextVar(
+    "config", default=None
+)
+_LOCK = threading.Lock()
+
+
+def _fingerprints_path():
+    return utils.REGRESS_STACK_DIR / FINGERPRINTS_FILE
+
+
+def host_facts() -> typing.Dict[str, str]:
+    return {"my_ip": utils.my_ip(), "fqdn": utils.fqdn()}
+
+
+def package_versions(mod) -> typing.Dict[str, typing.Optional[str]]:
+    """Return the installed version of every package of a module."""
+    return {pkg: core_apt.get_pkg_version(pkg) for pkg in mod.metadata.packages}
+
+
+def compute(graph: nx.DiGraph) -> typing.Dict[typing.Any, str]:
+    """Return the fingerprint of every module of the execution graph."""
+    facts = host_facts()
+    fingerprints: typing.Dict[typing.Any, str] = {}
+    for mod in nx.lexicographical_topological_sort(graph):
+        inputs = {
+            "source": hashlib.sha256(pathlib.Path(mod.path).read_bytes()).hexdigest()
+            if mod.path
+            else None,
+            "packages": package_versions(mod),
+            "host": facts,
+            "dependencies": sorted(
+                fingerprints[pred] for pred in graph.predecessors(mod)
+            ),
+        }
+        data = json.dumps(inputs, sort_keys=True)
+        fingerprints[mod] = hashlib.sha256(data.encode()).hexdigest()
+    return fingerprints
+
+
+def load() -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """Return the fingerprints of the last successful setups, by module name."""
+    try:
+        return json.loads(_fingerprints_path().read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        LOG.warning("Ignoring unreadable setup fingerprints: %s", e)
+        return {}
+
+
+def record(
+    name: str,
+    fingerprint: str,
+    config: typing.Mapping[str, typing.List[ConfigTuple]],
+    packages: typing.Optional[typing.Mapping[str, typing.Optional[str]]] = None,
+) -> None:
+    """Record the fingerprint, written configuration and package versions of a
+    module setup."""
+    with _LOCK:
+        records = load()
+        records[name] = {
+            "fingerprint": fingerprint,
+            "config": dict(config),
+            "packages": dict(packages or {}),
+        }
+        path = _fingerprints_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(records, indent=2, sort_keys=True))
+
+
+def forget(name: str) -> None:
+    """Forget the last setup of a module, so its next setup runs."""
+    with _LOCK:
+        records = load()
+        if records.pop(name, None) is None:
+            return
+        _fingerprints_path().write_text(json.dumps(records, indent=2, sort_keys=True))
+
+
+@contextlib.contextmanager
+def recording(config: typing.Optional[Config] = None):
+    """Collect the configuration written by cfg_set, by configuration file.
+
+    The configuration is added to config when given, to carry a recording
+    over several contexts.
+    """
+    if config is None:
+        config = {}
+    token = _CONFIG.set(config)
+    try:
+        yield config
+    finally:
+        _CONFIG.reset(token)
+
+
+def record_config(config_file: str, *args: ConfigTuple) -> None:
+    """Add configuration written to config_file to the current recording."""
+    config = _CONFIG.get()
+    if config is not None:
+        config.setdefault(config_file, []).extend(args)
+
+
+def _config_matches(config_file: str, values: typing.List[ConfigTuple]) -> bool:
+    parser = configparser.RawConfigParser(strict=False)
+    parser.optionxform = str  # type: ignore[assignment]
+    try:
+        with open(config_file) as f:
+            parser.read_file(f)
+    except (OSError, configparser.Error) as e:
+        LOG.debug("Cannot read %s: %s", config_file, e)
+        return False
+    # Only the last value written for a key is expected in the file.
+    expected = {(section, key): value for section, key, value in values}
+    for (section, key), value in expected.items():
+        try:
+            if parser.get(section, key) != value:
+                return False
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return False
+    return True
+
+
+def unchanged(
+    name: str,
+    fingerprint: str,
+    records: typing.Mapping[str, typing.Dict[str, typing.Any]],
+) -> bool:
+    """Whether module name was set up with the same inputs and is untouched."""
+    if not utils.is_setup_done(name):
+        return False
+    previous = records.get(name)
+    if not previous or previous["fingerprint"] != fingerprint:
+        return False
+    for config_file, values in previous["config"].items():
+        if not _config_matches(config_file, [tuple(v) for v in values]):
+            LOG.info("Configuration of %s changed in %s", name, config_file)
+            return False
+    return True
+
+
+def changed_packages(
+    name: str,
+    packages: typing.Mapping[str, typing.Optional[str]],
+    records: typing.Mapping[str, typing.Dict[str, typing.Any]],
+) -> typing.Dict[str, typing.Tuple[typing.Optional[str], typing.Optional[str]]]:
+    """Return the packages of module name whose version changed since its last
+    setup, with their recorded and current versions.
+
+    Nothing changed for a module without recorded setup or package versions.
+    """
+    previous = records.get(name, {}).get("packages")
+    if not previous:
+        return {}
+    return {
+        pkg: (previous.get(pkg), version)
+        for pkg, version in packages.items()
+        if previous.get(pkg) != version
+    }
+
+
+def unrecorded(
+    graph: nx.DiGraph,
+    records: typing.Mapping[str, typing.Dict[str, typing.Any]],
+) -> typing.Set[typing.Any]:
+    """Return the modules of the graph without recorded package versions,
+    never set up or set up before package versions were recorded."""
+    return {mod for mod in graph if "packages" not in records.get(mod.name, {})}
+
+
+def upgraded(
+    graph: nx.DiGraph,
+    records: typing.Mapping[str, typing.Dict[str, typing.Any]],
+) -> typing.Set[typing.Any]:
+    """Return the modules whose packages changed since their last setup, along
+    with the modules depending on them."""
+    modules = set()
+    for mod in graph:
+        if changed := changed_packages(mod.name, package_versions(mod), records):
+            LOG.info(
+                "Packages of %s changed: %s",
+                mod.name,
+                ", ".join(
+                    f"{pkg} {old or 'missing'} -> {new or 'missing'}"
+                    for pkg, (old, new) in sorted(changed.items())
+                ),
+            )
+            modules.add(mod)
+            modules.update(nx.descendants(graph, mod))
+    return modules
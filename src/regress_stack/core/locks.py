@@ -0,0 +1,178 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Locks on the host resources shared by concurrent module setups.
+
+Resources are identified by name and held either exclusively or shared,
+e.g. a connection used by many threads but torn down by one. Holds are
+reentrant within a thread, and a thread holding a resource exclusively may
+also take it shared. Time spent waiting is accounted to the module setting
+up, see owner(), to report where modules serialize on each other.
+"""
+
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+import typing
+
+APT = "apt"
+
+_OWNER: "contextvars.ContextVar[str]" = contextvars.ContextVar("owner", default="")
+
+
+def service(name: str) -> str:
+    """Name of the resource guarding restarts of systemd service name."""
+    return "service:" + name
+
+
+class ResourceStats:
+    """Contention statistics of a resource."""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.waited = 0.0
+        # Wait time by (waiting module, holding module)
+        self.waits: typing.Dict[typing.Tuple[str, str], float] = {}
+
+
+class _Resource:
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = ResourceStats()
+        self._cond = threading.Condition()
+        self._exclusive: typing.Optional[int] = None
+        self._exclusive_depth = 0
+        self._shared: typing.Dict[int, int] = {}
+        self._owners: typing.Dict[int, str] = {}
+
+    def _available(self, thread: int, shared: bool) -> bool:
+        if self._exclusive is not None:
+            return self._exclusive == thread
+        return shared or not self._shared
+
+    def acquire(self, shared: bool) -> None:
+        thread = threading.get_ident()
+        owner = _OWNER.get()
+        with self._cond:
+            if not shared and thread in self._shared and self._exclusive != thread:
+                raise RuntimeError(
+                    f"Cannot take {self.name!r} exclusively while holding it shared"
+                )
+            self.stats.acquisitions += 1
+            if not self._available(thread, shared):
+                holders = set(self._owners.values())
+                start = time.monotonic()
+                while not self._available(thread, shared):
+                    self._cond.wait()
+                waited = time.monotonic() - start
+                self.stats.contended += 1
+                self.stats.waited += waited
+                for holder in holders:
+                    key = (owner, holder)
+                    self.stats.waits[key] = self.stats.waits.get(key, 0.0) + waited
+            if shared:
+                self._shared[thread] = self._shared.get(thread, 0) + 1
+            else:
+                self._exclusive = thread
+                self._exclusive_depth += 1
+            self._owners[thread] = owner
+
+    def release(self, shared: bool) -> None:
+        thread = threading.get_ident()
+        with self._cond:
+            if shared:
+                self._shared[thread] -= 1
+                if not self._shared[thread]:
+                    del self._shared[thread]
+            else:
+                self._exclusive_depth -= 1
+                if not self._exclusive_depth:
+                    self._exclusive = None
+            if thread not in self._shared and self._exclusive != thread:
+                del self._owners[thread]
+            self._cond.notify_all()
+
+
+_RESOURCES: typing.Dict[str, _Resource] = {}
+_RESOURCES_LOCK = threading.Lock()
+
+
+def _resource(name: str) -> _Resource:
+    with _RESOURCES_LOCK:
+        if name not in _RESOURCES:
+            _RESOURCES[name] = _Resource(name)
+        return _RESOURCES[name]
+
+
+@contextlib.contextmanager
+def hold(name: str, shared: bool = False):
+    """Hold resource name for the duration of the context."""
+    resource = _resource(name)
+    resource.acquire(shared)
+    try:
+        yield
+    finally:
+        resource.release(shared)
+
+
+def holds(name: str, shared: bool = False):
+    """Decorated function holds resource name while it runs."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with hold(name, shared):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def owner(name: str):
+    """Account the waits in this context to module name."""
+    token = _OWNER.set(name)
+    try:
+        yield
+    finally:
+        _OWNER.reset(token)
+
+
+def current_owner() -> str:
+    """Return the module the current context works for, empty in main."""
+    return _OWNER.get()
+
+
+def contention() -> typing.Dict[str, ResourceStats]:
+    """Return the statistics of the resources used so far, by name."""
+    with _RESOURCES_LOCK:
+        return {name: resource.stats for name, resource in _RESOURCES.items()}
+
+
+def report() -> typing.List[str]:
+    """Describe the resources modules waited on, longest waits first."""
+    lines = []
+    stats = sorted(contention().items(), key=lambda item: -item[1].waited)
+    for name, resource in stats:
+        if not resource.contended:
+            continue
+        lines.append(
+            f"{name}: {resource.acquisitions} acquisitions, "
+            f"{resource.contended} contended, {resource.waited:.2f}s waited"
+        )
+        waits = sorted(resource.waits.items(), key=lambda item: -item[1])
+        for (waiter, holder), waited in waits:
+            lines.append(
+                f"  {waiter or 'main'} waited {waited:.2f}s on {holder or 'main'}"
+            )
+    return lines
+
+
+def reset() -> None:
+    """Forget the resources and their statistics."""
+    with _RESOURCES_LOCK:
+        _RESOURCES.clear()
@@ -0,0 +1,272 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Static extraction of module metadata.
+
+Module bodies have import-time side effects (network discovery, subprocesses,
+heavy client libraries), reading DEPENDENCIES, OPTIONAL_DEPENDENCIES, PACKAGES
+and LOGS from the module AST avoids importing them just to plan.
+"""
+
+import ast
+import importlib.machinery
+import logging
+import pathlib
+import typing
+
+LOG = logging.getLogger(__name__)
+
+_METADATA_REGISTRY: typing.MutableMapping[str, "ModuleMetadata"] = {}
+
+
+class MetadataError(RuntimeError):
+    """Raised when module metadata cannot be extracted statically."""
+
+
+def _literal(node: ast.AST, constants: typing.Mapping[str, typing.Any]):
+    """Evaluate a constant expression, resolving names to known constants."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in constants:
+        return constants[node.id]
+    if isinstance(node, ast.List):
+        return [_literal(elt, constants) for elt in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_literal(elt, constants) for elt in node.elts)
+    if isinstance(node, ast.Set):
+        return {_literal(elt, constants) for elt in node.elts}
+    if isinstance(node, ast.Dict):
+        items = {}
+        for key, value in zip(node.keys, node.values):
+            if key is None:
+                # A ** unpacking, e.g. {**OTHER}
+                raise ValueError(f"Unsupported expression {ast.dump(node)}")
+            items[_literal(key, constants)] = _literal(value, constants)
+        return items
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return _literal(node.left, constants) + _literal(node.right, constants)
+    raise ValueError(f"Unsupported expression {ast.dump(node)}")
+
+
+def _imports(tree: ast.Module) -> typing.Dict[str, str]:
+    """Map names bound by top-level imports to the module they refer to."""
+    imports = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    imports[alias.asname] = alias.name
+                else:
+                    imports[alias.name.split(".")[0]] = alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return imports
+
+
+def _constants(tree: ast.Module) -> typing.Dict[str, typing.Any]:
+    """Collect top-level assignments whose value is a constant expression."""
+    constants: typing.Dict[str, typing.Any] = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        else:
+            continue
+        if node.value is None:
+            # A bare annotation, e.g. NAME: int
+            continue
+        try:
+            value = _literal(node.value, constants)
+        except (ValueError, TypeError):
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name):
+                constants[target.id] = value
+    return constants
+
+
+def _module_refs(
+    tree: ast.Module, attribute: str, imports: typing.Mapping[str, str]
+) -> typing.Set[str]:
+    """Resolve a top-level collection of imported modules to their names."""
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        if not any(
+            isinstance(target, ast.Name) and target.id == attribute
+            for target in node.targets
+        ):
+            continue
+        if not isinstance(node.value, (ast.Set, ast.List, ast.Tuple)):
+            raise MetadataError(f"{attribute} must be a set of modules")
+        refs = set()
+        for elt in node.value.elts:
+            if not isinstance(elt, ast.Name) or elt.id not in imports:
+                raise MetadataError(f"{attribute} must only reference imported modules")
+            refs.add(imports[elt.id])
+        return refs
+    return set()
+
+
+def _function(tree: ast.Module, name: str) -> typing.Optional[ast.FunctionDef]:
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            return node
+    return None
+
+
+def _isolate_function(
+    tree: ast.Module,
+    func: ast.FunctionDef,
+    constants: typing.Mapping[str, typing.Any],
+    path: str,
+) -> typing.Callable:
+    """Compile a top-level function without executing the module body.
+
+    The function is evaluated against the module constants and only the
+    imports it references.
+    """
+    used = {node.id for node in ast.walk(func) if isinstance(node, ast.Name)}
+    body: typing.List[ast.stmt] = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [
+                alias
+                for alias in node.names
+                if (alias.asname or alias.name.split(".")[0]) in used
+            ]
+            if not names:
+                continue
+            if isinstance(node, ast.Import):
+                body.append(ast.Import(names=names))
+            else:
+                body.append(
+                    ast.ImportFrom(module=node.module, names=names, level=node.level)
+                )
+    body.append(func)
+    module = ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+    namespace: typing.Dict[str, typing.Any] = {
+        k: v for k, v in constants.items() if k in used
+    }
+    exec(compile(module, path, "exec"), namespace)
+    return namespace[func.name]
+
+
+class ModuleMetadata:
+    name: str
+    path: str
+    dependencies: typing.Set[str]
+    optional_dependencies: typing.Set[str]
+    logs: typing.List[str]
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        dependencies: typing.Set[str],
+        optional_dependencies: typing.Set[str],
+        packages: typing.Union[
+            typing.List[str], typing.Callable[..., typing.List[str]]
+        ],
+        logs: typing.List[str],
+    ):
+        self.name = name
+        self.path = path
+        self.dependencies = dependencies
+        self.optional_dependencies = optional_dependencies
+        self.logs = logs
+        self._packages = packages
+
+    def determine_packages(self, no_tempest: bool = False) -> typing.List[str]:
+        if callable(self._packages):
+            return list(self._packages(no_tempest=no_tempest))
+        return list(self._packages)
+
+    @property
+    def packages(self) -> typing.List[str]:
+        return self.determine_packages()
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "dependencies": sorted(self.dependencies),
+            "optional_dependencies": sorted(self.optional_dependencies),
+            "packages": self.determine_packages(no_tempest=False),
+            "packages_no_tempest": self.determine_packages(no_tempest=True),
+            "logs": self.logs,
+        }
+
+    @classmethod
+    def from_dict(cls, data: typing.Mapping[str, typing.Any]) -> "ModuleMetadata":
+        packages = {
+            False: list(data["packages"]),
+            True: list(data["packages_no_tempest"]),
+        }
+
+        def determine_packages(no_tempest: bool = False) -> typing.List[str]:
+            return packages[bool(no_tempest)]
+
+        return cls(
+            data["name"],
+            data["path"],
+            set(data["dependencies"]),
+            set(data["optional_dependencies"]),
+            determine_packages,
+            list(data["logs"]),
+        )
+
+    def __repr__(self) -> str:
+        return f"ModuleMetadata(name={self.name}, path={self.path})"
+
+
+def parse_metadata(name: str, path: str) -> ModuleMetadata:
+    """Extract metadata from a module source file without importing it."""
+    source = pathlib.Path(path).read_text()
+    tree = ast.parse(source, filename=path)
+    imports = _imports(tree)
+    constants = _constants(tree)
+
+    packages: typing.Union[typing.List[str], typing.Callable[..., typing.List[str]]]
+    if func := _function(tree, "determine_packages"):
+        packages = _isolate_function(tree, func, constants, path)
+    else:
+        packages = list(constants.get("PACKAGES", []))
+
+    return ModuleMetadata(
+        name,
+        path,
+        _module_refs(tree, "DEPENDENCIES", imports),
+        _module_refs(tree, "OPTIONAL_DEPENDENCIES", imports),
+        packages,
+        list(constants.get("LOGS", [])),
+    )
+
+
+def find_module_file(name: str, path: str) -> str:
+    """Locate the source file of a module in the given directory."""
+    spec = importlib.machinery.PathFinder.find_spec(name.rsplit(".")[-1], [path])
+    if spec is None or spec.origin is None:
+        raise RuntimeError(f"Module {name} not found!")
+    return spec.origin
+
+
+def load_metadata(name: str, path: str) -> ModuleMetadata:
+    """Return the metadata of module name, located in directory path."""
+    if name in _METADATA_REGISTRY:
+        return _METADATA_REGISTRY[name]
+    metadata = parse_metadata(name, find_module_file(name, path))
+    _METADATA_REGISTRY[name] = metadata
+    LOG.debug("Loaded metadata of %r from %r", name, path)
+    return metadata
+
+
+def register_metadata(metadata: ModuleMetadata) -> None:
+    """Register metadata obtained elsewhere, e.g. from the plan cache."""
+    _METADATA_REGISTRY.setdefault(metadata.name, metadata)
+
+
+def metadata_registry() -> typing.Mapping[str, ModuleMetadata]:
+    return _METADATA_REGISTRY
@@ -1,7 +1,9 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import collections
 import importlib
+import importlib.metadata
 import importlib.util
 import logging
 import pathlib
@@ -12,58 +14,156 @@ import typing
 import networkx as nx
 
 import regress_stack.core.apt as apt
+from regress_stack.core import plan_cache, profile
+from regress_stack.core.metadata import (
+    ModuleMetadata,
+    load_metadata,
+    metadata_registry,
+    register_metadata,
+)
 
 LOG = logging.getLogger(__name__)
 _MOD_REGISTRY: typing.MutableMapping[str, types.ModuleType] = {}
 
+# Entry point group of the modules provided by other distributions, e.g.
+#   [project.entry-points."regress_stack.modules"]
+#   mymodule = "mypackage.regress.mymodule"
+ENTRY_POINT_GROUP = "regress_stack.modules"
+
 
 def load_module(name: str, path: str):
     if name in _MOD_REGISTRY:
         return _MOD_REGISTRY[name]
-    spec = importlib.util.find_spec(name, path)
-    if spec is None:
+    if importlib.util.find_spec(name) is None:
         raise RuntimeError(f"Module {name} not found!")
-    module_loaded = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module_loaded)
+    # Imported as usual, so that modules importing each other share state.
+    module_loaded = importlib.import_module(name)
     _MOD_REGISTRY[name] = module_loaded
     LOG.debug("Loaded module %r from %r", name, path)
     return module_loaded
 
 
+def _entry_points() -> typing.Iterable[importlib.metadata.EntryPoint]:
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    # Python < 3.10
+    return entry_points.get(ENTRY_POINT_GROUP, [])  # type: ignore[attr-defined]
+
+
+def plugin_modules() -> typing.Dict[str, str]:
+    """Locate the modules registered through entry points.
+
+    Returns the directory of each module by canonical name. Modules are
+    located without being imported, only their parent packages are. Modules
+    are known by the last component of their canonical name, the entry point
+    name must be that short name.
+    """
+    plugins = {}
+    for entry_point in _entry_points():
+        name = entry_point.value.split(":")[0].strip()
+        if entry_point.name != name.rsplit(".")[-1]:
+            raise RuntimeError(
+                f"Plugin {entry_point.name!r} must be named after its module {name}"
+            )
+        try:
+            spec = importlib.util.find_spec(name)
+        except ImportError as e:
+            raise RuntimeError(
+                f"Module {name} of plugin {entry_point.name!r} not found: {e}"
+            )
+        if spec is None or spec.origin is None:
+            raise RuntimeError(
+                f"Module {name} of plugin {entry_point.name!r} not found!"
+            )
+        plugins[name] = str(pathlib.Path(spec.origin).parent)
+    return plugins
+
+
+def discover_modules(modules_mod: types.ModuleType) -> typing.Dict[str, str]:
+    """Return the directory of every available module, by canonical name.
+
+    Modules are the ones of the modules package and the ones registered
+    through entry points. Their short names must be unique.
+    """
+    modules_dir = pathlib.Path(modules_mod.__path__[0])
+    package = str(modules_mod.__package__)
+    found = {
+        package + "." + module.name: str(module.module_finder.path)
+        for module in pkgutil.iter_modules([str(modules_dir)])
+    }
+    short_names = {name.rsplit(".")[-1]: name for name in found}
+    for name, path in plugin_modules().items():
+        short_name = name.rsplit(".")[-1]
+        if short_name in short_names and short_names[short_name] != name:
+            raise RuntimeError(
+                f"Module {short_name!r} is provided by both "
+                f"{short_names[short_name]} and {name}"
+            )
+        short_names[short_name] = name
+        found[name] = path
+    return found
+
+
 class ModuleInfo:
     name: str
     packages: typing.List[str]
 
-    def __init__(self, name: str, module: types.ModuleType):
+    def __init__(self, name: str, metadata: ModuleMetadata):
         self.name = name.rsplit(".")[-1]
-        if hasattr(module, "determine_packages"):
-            self.packages = module.determine_packages()
-        else:
-            self.packages = getattr(module, "PACKAGES")
+        self.packages = metadata.packages
 
     def __str__(self):
         return f"{self.name} ({' '.join(self.packages)})"
 
 
 def modules() -> typing.List[str]:
-    return list(ModuleInfo(name, module) for name, module in _MOD_REGISTRY.items())
+    return list(
+        ModuleInfo(name, metadata) for name, metadata in metadata_registry().items()
+    )
 
 
 class ModuleComp:
-    name: str
-    module: types.ModuleType
+    """A module of the dependency graph.
+
+    The module itself is only imported when accessed, planning only needs the
+    statically extracted metadata.
+    """
 
-    def __init__(self, name: str, module: types.ModuleType) -> None:
+    name: str
+    path: str
+
+    def __init__(
+        self,
+        name: str,
+        module: typing.Optional[types.ModuleType] = None,
+        path: typing.Optional[str] = None,
+    ) -> None:
         self.name = name
-        self.module = module
+        self._module = module
+        if path is None:
+            if module is None:
+                raise ValueError("Either module or path is required")
+            path = str(module.__file__)
+        self.path = path
+
+    @property
+    def module(self) -> types.ModuleType:
+        if self._module is None:
+            self._module = load_module(self.name, str(pathlib.Path(self.path).parent))
+        return self._module
+
+    @property
+    def metadata(self) -> ModuleMetadata:
+        return load_metadata(self.name, str(pathlib.Path(self.path).parent))
 
     def __hash__(self) -> int:
-        return hash(self.name) ^ hash(self.module.__file__)
+        return hash(self.name) ^ hash(self.path)
 
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, ModuleComp):
             return False
-        if self.name == value.name and self.module.__file__ == value.module.__file__:
+        if self.name == value.name and self.path == value.path:
             return True
         return False
 
@@ -74,91 +174,147 @@ class ModuleComp:
         return self.name < other.name
 
     def __repr__(self) -> str:
-        return f"ModuleComp(name={self.name}, file={self.module.__file__})"
+        return f"ModuleComp(name={self.name}, file={self.path})"
 
 
 def build_dependency_graph(modules_mod: types.ModuleType) -> nx.DiGraph:
-    """Build a directed graph of dependencies."""
-    modules_dir = pathlib.Path(modules_mod.__path__[0])
-    package = str(modules_mod.__package__)
-    modules = list(pkgutil.iter_modules([str(modules_dir)]))
+    """Build a directed graph of dependencies.
+
+    Modules are not imported, their metadata is read from their source.
+    """
+    modules_dir = str(modules_mod.__path__[0])
+    modules = discover_modules(modules_mod)
     graph: nx.DiGraph[ModuleComp] = nx.DiGraph()
 
-    for module in modules:
-        canonical_name = package + "." + module.name
-        module_loaded = load_module(canonical_name, module.module_finder.path)
-        mod = ModuleComp(
-            canonical_name,
-            module_loaded,
-        )
-        dependencies: set[types.ModuleType] = getattr(
-            module_loaded, "DEPENDENCIES", set()
-        )
-        optional_dependencies: set[types.ModuleType] = getattr(
-            module_loaded, "OPTIONAL_DEPENDENCIES", set()
+    def module_comp(name: str) -> ModuleComp:
+        return ModuleComp(
+            name, path=load_metadata(name, modules.get(name, modules_dir)).path
         )
+
+    metadatas = {name: load_metadata(name, path) for name, path in modules.items()}
+    packages = {name: metadata.packages for name, metadata in metadatas.items()}
+    states = apt.package_states(
+        (pkg for pkgs in packages.values() for pkg in pkgs), candidate=False
+    )
+
+    for canonical_name, metadata in metadatas.items():
+        mod = ModuleComp(canonical_name, path=metadata.path)
         # In case someone includes a dependency in both DEPENDENCIES and OPTIONAL_DEPENDENCIES
-        dependencies = dependencies - optional_dependencies
-        if hasattr(module_loaded, "determine_packages"):
-            packages = module_loaded.determine_packages()
-        else:
-            packages = getattr(module_loaded, "PACKAGES", [])
+        dependencies = metadata.dependencies - metadata.optional_dependencies
 
-        graph.add_node(mod, installed=apt.pkgs_installed(packages))
+        installed = all(
+            states[pkg].installed is not None for pkg in packages[canonical_name]
+        )
+        graph.add_node(mod, installed=installed)
         for dep in dependencies:
-            graph.add_edge(ModuleComp(dep.__name__, dep), mod, optional=False)
-        for dep in optional_dependencies:
-            graph.add_edge(ModuleComp(dep.__name__, dep), mod, optional=True)
+            graph.add_edge(module_comp(dep), mod, optional=False)
+        for dep in metadata.optional_dependencies:
+            graph.add_edge(module_comp(dep), mod, optional=True)
 
     return graph
 
 
-def filter_graph(G: nx.DiGraph) -> nx.DiGraph:
-    """Remove nodes with uninstalled packages."""
-    # Identify nodes with installed=False
-    nodes_to_remove = {
-        n for n, data in G.nodes(data=True) if not data.get("installed", False)
+def _graph_to_dict(graph: nx.DiGraph) -> typing.Dict[str, typing.Any]:
+    return {
+        "nodes": [
+            {
+                "metadata": mod.metadata.to_dict(),
+                "installed": data.get("installed", False),
+            }
+            for mod, data in graph.nodes(data=True)
+        ],
+        "edges": [
+            [pred.name, succ.name, data.get("optional", False)]
+            for pred, succ, data in graph.edges(data=True)
+        ],
     }
 
+
+def _graph_from_dict(data: typing.Mapping[str, typing.Any]) -> nx.DiGraph:
+    graph: nx.DiGraph[ModuleComp] = nx.DiGraph()
+    nodes = {}
+    for node in data["nodes"]:
+        metadata = ModuleMetadata.from_dict(node["metadata"])
+        register_metadata(metadata)
+        nodes[metadata.name] = ModuleComp(metadata.name, path=metadata.path)
+        graph.add_node(nodes[metadata.name], installed=node["installed"])
+    for pred, succ, optional in data["edges"]:
+        graph.add_edge(nodes[pred], nodes[succ], optional=optional)
+    return graph
+
+
+def load_dependency_graph(modules_mod: types.ModuleType) -> nx.DiGraph:
+    """Return the dependency graph, from the plan cache when it is still valid.
+
+    The cache is invalidated whenever the dpkg status, the apt package lists,
+    any module source or the set of plugin modules changes.
+    """
+    modules_dir = pathlib.Path(modules_mod.__path__[0])
+    plugin_dirs = {pathlib.Path(path) for path in plugin_modules().values()}
+    key = plan_cache.cache_key(
+        [
+            plan_cache.DPKG_STATUS,
+            plan_cache.APT_LISTS,
+            modules_dir,
+            *modules_dir.glob("*.py"),
+            *plugin_dirs,
+            *(path for plugin_dir in plugin_dirs for path in plugin_dir.glob("*.py")),
+        ]
+    )
+    if profile.uses_candidates():
+        # Packages gated on candidate versions may differ from planned ones.
+        key += "-candidates"
+    if (cached := plan_cache.load(key)) is not None:
+        return _graph_from_dict(cached)
+    graph = build_dependency_graph(modules_mod)
+    plan_cache.save(key, _graph_to_dict(graph))
+    return graph
+
+
+def _propagate_removal(G: nx.DiGraph, nodes: typing.Iterable) -> typing.Set:
+    """Extend nodes with every node requiring them, directly or not."""
+    removed = set(nodes)
+    queue = collections.deque(removed)
+    while queue:
+        node = queue.popleft()
+        for succ, data in G.succ[node].items():
+            if succ not in removed and not data.get("optional", False):
+                removed.add(succ)
+                queue.append(succ)
+    return removed
+
+
+def filter_graph(G: nx.DiGraph) -> nx.DiGraph:
+    """Remove nodes with uninstalled packages.
+
+    A node is removed when its packages are not installed, when all of its
+    dependencies are optional, or when any of its required dependencies is
+    removed. Removal is propagated once along required edges, which keeps
+    this linear in the size of the graph.
+    """
+
     # Identify nodes that are only connected via optional=True edges
     def is_only_optional(n):
         """If all predecessors are optional, then this node is optional.
 
         If there are no predecessors, then this node is not optional.
         """
-        predecessors = list(G.predecessors(n))
+        predecessors = G.pred[n]
         if not predecessors:
             return False
 
-        return all(
-            G.get_edge_data(pred, n).get("optional", False) for pred in predecessors
-        )
-
-    # Identity nodes missing required dependencies
-    def is_missing_required(n, to_remove: set):
-        """If predecessor is missing, then this node is missing."""
-        predecessors = set(G.predecessors(n))
-        if not predecessors:
-            return False
+        return all(data.get("optional", False) for data in predecessors.values())
 
-        # Only consider required predecessors
-        predecessors = {
-            pred
-            for pred in predecessors
-            if not G.get_edge_data(pred, n, {}).get("optional", False)
-        }
-        return bool(predecessors.intersection(to_remove))
-
-    # Collect nodes to remove
-    changed = True
-    while changed:
-        changed = False
-        for node in G.nodes:
-            if node not in nodes_to_remove and (
-                is_only_optional(node) or is_missing_required(node, nodes_to_remove)
-            ):
-                nodes_to_remove.add(node)
-                changed = True  # Ensure we check again after removals
+    # Identify nodes with installed=False or only optional dependencies, nodes
+    # missing a required dependency are removed as well.
+    nodes_to_remove = _propagate_removal(
+        G,
+        (
+            n
+            for n, data in G.nodes(data=True)
+            if not data.get("installed", False) or is_only_optional(n)
+        ),
+    )
 
     LOG.debug("Removing nodes %r", nodes_to_remove)
 
@@ -167,58 +323,146 @@ def filter_graph(G: nx.DiGraph) -> nx.DiGraph:
     return G
 
 
+def get_subgraph_to_targets(G: nx.DiGraph, targets: typing.Iterable) -> nx.DiGraph:
+    """Return the union of the subgraphs to each target.
+
+    Ancestors of all targets are collected in a single traversal.
+    """
+    nodes = set(targets)
+    queue = collections.deque(nodes)
+    while queue:
+        for pred in G.predecessors(queue.popleft()):
+            if pred not in nodes:
+                nodes.add(pred)
+                queue.append(pred)
+    return G.subgraph(nodes)
+
+
 def get_subgraph_to_path(G: nx.DiGraph, target: str) -> nx.DiGraph:
     """Return subgraph to target."""
-    subgraph = nx.ancestors(G, target)
-    subgraph.add(target)
-    return G.subgraph(subgraph)
+    return get_subgraph_to_targets(G, [target])
 
 
-def get_execution_order(
-    modules_mod: types.ModuleType, target=None, filter_missing=True
-) -> typing.List[ModuleComp]:
-    """Determine the execution order of modules based on dependencies.
+def _targets(
+    target: typing.Union[str, typing.Iterable[str], None],
+) -> typing.List[str]:
+    if not target:
+        return []
+    if isinstance(target, str):
+        return [target]
+    return list(target)
 
-    Always include the utils module as the first module.
+
+def get_execution_graph(
+    modules_mod: types.ModuleType,
+    target: typing.Union[str, typing.Iterable[str], None] = None,
+    filter_missing: bool = True,
+    exclude: typing.Iterable[str] = (),
+) -> nx.DiGraph:
+    """Build the graph of modules to execute based on dependencies.
+
+    The utils module is always included and every other module depends on it,
+    so that it is always executed first.
 
     Args:
         modules_mod: The modules package to analyze
-        target: Optional target module name to limit the scope
+        target: Optional target module name, or names, to limit the scope
         filter_missing: If True, filter out modules with missing dependencies
+        exclude: Module names to leave out, along with the modules requiring
+            them
     """
     LOG.debug("Building dependency graph from %r...", modules_mod.__name__)
 
-    # Load utils module using the same approach as build_dependency_graph
+    # Load utils metadata using the same approach as build_dependency_graph
     utils_canonical_name = str(modules_mod.__package__) + ".utils"
-    utils_mod = load_module(utils_canonical_name, modules_mod.__path__[0])
-    utils = ModuleComp(utils_canonical_name, utils_mod)
-
-    if target == "utils":
-        return [utils]
-
-    graph = build_dependency_graph(modules_mod)
+    utils_metadata = load_metadata(utils_canonical_name, modules_mod.__path__[0])
+    utils = ModuleComp(utils_canonical_name, path=utils_metadata.path)
+
+    execution_graph: nx.DiGraph[ModuleComp] = nx.DiGraph()
+    execution_graph.add_node(utils)
+    targets = [name for name in _targets(target) if name != "utils"]
+    if _targets(target) and not targets:
+        return execution_graph
+
+    graph = load_dependency_graph(modules_mod)
+    by_name = {mod.name.rsplit(".")[-1]: mod for mod in graph.nodes}
+    for name in exclude:
+        if name not in by_name:
+            raise RuntimeError(f"Excluded module {name!r} not found!")
     if filter_missing:
         graph = filter_graph(graph)
 
     if not nx.is_directed_acyclic_graph(graph):
         raise RuntimeError("Circular dependency detected!")
 
-    order = list(nx.lexicographical_topological_sort(graph))
-    if utils in order:
-        order.remove(utils)
-    if not target:
-        return [utils] + order
-
-    end_node = None
-    for mod in order:
-        if mod.name.rsplit(".")[-1] == target:
-            end_node = mod
-            break
-    else:
-        raise RuntimeError(f"Target {target!r} not found!")
-
-    sg = get_subgraph_to_path(graph, end_node)
-    order = list(nx.lexicographical_topological_sort(sg))
-    if utils in order:
-        order.remove(utils)
-    return [utils] + order
+    # Excluded modules are removed along with the modules requiring them
+    excluded = _propagate_removal(
+        graph, [by_name[name] for name in exclude if by_name[name] in graph]
+    )
+    LOG.debug("Excluding nodes %r", excluded)
+    graph.remove_nodes_from(excluded)
+
+    if targets:
+        for name in targets:
+            if by_name.get(name) in excluded:
+                raise RuntimeError(f"Target {name!r} requires an excluded module!")
+            if name not in by_name or by_name[name] not in graph:
+                raise RuntimeError(f"Target {name!r} not found!")
+        graph = get_subgraph_to_targets(graph, [by_name[name] for name in targets])
+
+    execution_graph.update(graph)
+    for mod in graph.nodes:
+        if mod != utils:
+            execution_graph.add_edge(utils, mod, optional=False)
+    return execution_graph
+
+
+def get_execution_order(
+    modules_mod: types.ModuleType,
+    target: typing.Union[str, typing.Iterable[str], None] = None,
+    filter_missing: bool = True,
+    exclude: typing.Iterable[str] = (),
+) -> typing.List[ModuleComp]:
+    """Determine the execution order of modules based on dependencies.
+
+    Always include the utils module as the first module.
+
+    Args:
+        modules_mod: The modules package to analyze
+        target: Optional target module name, or names, to limit the scope
+        filter_missing: If True, filter out modules with missing dependencies
+        exclude: Module names to leave out, along with the modules requiring
+            them
+    """
+    graph = get_execution_graph(modules_mod, target, filter_missing, exclude)
+    return list(nx.lexicographical_topological_sort(graph))
+
+
+def get_reset_graph(
+    modules_mod: types.ModuleType,
+    target: typing.Union[str, typing.Iterable[str], None] = None,
+    filter_missing: bool = True,
+) -> nx.DiGraph:
+    """Build the graph of modules to reset.
+
+    Resetting a module breaks the modules requiring it, so they are reset
+    along with the targets. The graph is the reverse of the execution graph:
+    a module is reset once every module requiring it is.
+
+    Args:
+        modules_mod: The modules package to analyze
+        target: Optional target module name, or names, to limit the scope
+        filter_missing: If True, filter out modules with missing dependencies
+    """
+    graph = get_execution_graph(modules_mod, filter_missing=filter_missing)
+    targets = _targets(target)
+    if targets:
+        by_name = {mod.name.rsplit(".")[-1]: mod for mod in graph.nodes}
+        nodes = set()
+        for name in targets:
+            if name not in by_name:
+                raise RuntimeError(f"Target {name!r} not found!")
+            nodes.add(by_name[name])
+            nodes.update(nx.descendants(graph, by_name[name]))
+        graph = graph.subgraph(nodes)
+    return graph.reverse(copy=True)
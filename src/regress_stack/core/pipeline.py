@@ -0,0 +1,135 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Phase-split module setup.
+
+Instead of a single setup() function, modules may declare their setup in
+phases, all optional:
+
+- provision(): create the accounts the module needs (database, message
+  queue, keystone), its return value is passed to configure and migrate.
+- configure(provisioned): write the configuration files.
+- migrate(provisioned): run the database migrations.
+- services(): return the services to restart once configured and migrated.
+- post(): anything requiring the services to run.
+
+The pipeline sets up the modules of the execution graph by generations, each
+generation holding the modules whose dependencies are all set up. Within a
+generation, the modules run each phase as a batch: provisioning, then
+configuration, then migrations concurrently, then the service restarts,
+coalesced so each service restarts once, then the post phases. Modules
+without phases run their setup() along with the provisioning batch.
+"""
+
+import contextlib
+import functools
+import logging
+import typing
+
+import networkx as nx
+
+from regress_stack.core import utils
+from regress_stack.core.executor import execute_graph
+
+LOG = logging.getLogger(__name__)
+
+PHASES = ("provision", "configure", "migrate", "services", "post")
+
+
+def has_phases(module) -> bool:
+    """Whether module declares its setup in phases."""
+    return any(hasattr(module, phase) for phase in PHASES)
+
+
+def services(module) -> typing.List[str]:
+    if services_func := getattr(module, "services", None):
+        return list(services_func())
+    return []
+
+
+def run_phases(module) -> None:
+    """Run the phases of module one after the other."""
+    provisioned = None
+    if provision := getattr(module, "provision", None):
+        provisioned = provision()
+    if configure := getattr(module, "configure", None):
+        configure(provisioned)
+    if migrate := getattr(module, "migrate", None):
+        migrate(provisioned)
+    for service in services(module):
+        utils.restart_service(service)
+    if post := getattr(module, "post", None):
+        post()
+
+
+def setup_func(module) -> typing.Optional[typing.Callable[[], None]]:
+    """Return the callable setting up module in one go, if any."""
+    if has_phases(module):
+        return functools.partial(run_phases, module)
+    return getattr(module, "setup", None)
+
+
+def _batch(
+    mods: typing.Iterable,
+    func: typing.Callable[[typing.Any], None],
+    jobs: int,
+) -> None:
+    graph: nx.DiGraph = nx.DiGraph()
+    graph.add_nodes_from(mods)
+    if graph:
+        execute_graph(graph, func, jobs)
+
+
+def execute(
+    graph: nx.DiGraph,
+    jobs: int = 1,
+    skip: typing.Container = (),
+    context: typing.Callable[[typing.Any], typing.ContextManager] = (
+        lambda mod: contextlib.nullcontext()
+    ),
+    on_done: typing.Callable[[typing.Any], None] = lambda mod: None,
+) -> None:
+    """Set up the modules of the execution graph, phase by phase.
+
+    Modules in skip are considered set up. Every phase of a module runs
+    within context(mod), and on_done(mod) is called once the module is set
+    up. A failing phase stops the pipeline once its batch completes.
+    """
+    for generation in nx.topological_generations(graph):
+        mods = sorted(mod for mod in generation if mod not in skip)
+        phased = [mod for mod in mods if has_phases(mod.module)]
+        provisioned: typing.Dict[typing.Any, typing.Any] = {}
+
+        def phase(name: str, mod) -> None:
+            func = getattr(mod.module, name, None)
+            if func is None:
+                return
+            with context(mod), utils.measure(f"{name} {mod.name}"):
+                if name == "provision":
+                    provisioned[mod] = func()
+                elif name in ("configure", "migrate"):
+                    func(provisioned.get(mod))
+                else:
+                    func()
+
+        def provision(mod) -> None:
+            if mod in phased:
+                phase("provision", mod)
+            else:
+                phase("setup", mod)
+
+        _batch(mods, provision, jobs)
+        _batch(phased, functools.partial(phase, "configure"), jobs)
+        _batch(phased, functools.partial(phase, "migrate"), jobs)
+
+        restarts: typing.Dict[str, typing.List[str]] = {}
+        for mod in phased:
+            for service in services(mod.module):
+                restarts.setdefault(service, []).append(mod.name)
+        for service, requesters in restarts.items():
+            LOG.info("Restarting %s for %s", service, ", ".join(requesters))
+            utils.restart_service(service)
+
+        _batch(phased, functools.partial(phase, "post"), jobs)
+        for mod in mods:
+            on_done(mod)
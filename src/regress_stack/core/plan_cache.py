@@ -0,0 +1,71 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Persistent cache of the resolved dependency graph.
+
+The cache is keyed on the state of the files the graph is derived from: the
+dpkg status database, the apt package lists (candidate versions) and the
+module sources.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import typing
+
+from regress_stack.core import utils
+
+LOG = logging.getLogger(__name__)
+
+# Bump whenever the layout of the cached graph changes.
+CACHE_VERSION = 2
+CACHE_FILE = "plan-cache.json"
+DPKG_STATUS = pathlib.Path("/var/lib/dpkg/status")
+APT_LISTS = pathlib.Path("/var/lib/apt/lists")
+
+
+def cache_path() -> pathlib.Path:
+    return utils.REGRESS_STACK_DIR / CACHE_FILE
+
+
+def cache_key(paths: typing.Iterable[typing.Union[str, pathlib.Path]]) -> str:
+    """Fingerprint the given files by mtime and size."""
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for path in sorted(str(path) for path in paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            digest.update(f"{path}:missing\n".encode())
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return digest.hexdigest()
+
+
+def load(key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """Return the cached data if it was stored under key."""
+    try:
+        cached = json.loads(cache_path().read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOG.debug("Ignoring unreadable plan cache: %s", e)
+        return None
+    if cached.get("key") != key:
+        LOG.debug("Plan cache is stale")
+        return None
+    LOG.debug("Using plan cache %s", cache_path())
+    return cached["data"]
+
+
+def save(key: str, data: typing.Dict[str, typing.Any]) -> None:
+    """Store data under key, silently skipped if the cache is not writable."""
+    path = cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"key": key, "data": data}))
+        tmp_path.replace(path)
+    except OSError as e:
+        LOG.debug("Failed to write plan cache: %s", e)
@@ -0,0 +1,212 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Version gates of the platform under test.
+
+Code paths depending on the version of a package are declared here as gates
+instead of comparing versions where they are used. All gates are evaluated
+together, from a single lookup of the installed versions and another of the
+candidate versions, into a Profile of flags. The evaluated profile is
+persisted, keyed on the dpkg status and the apt package lists, so that later
+commands reuse it until packages change.
+
+Candidate versions are only looked up within candidates(), when listing or
+installing packages. Elsewhere, and on hosts without python-apt, gates on
+candidate versions compare the installed version, read from the dpkg status
+database without opening the apt cache.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import typing
+
+from regress_stack.core import apt as core_apt
+from regress_stack.core import plan_cache, utils
+
+LOG = logging.getLogger(__name__)
+
+PROFILE_FILE = "platform-profile.json"
+CANDIDATES_PROFILE_FILE = "platform-profile-candidates.json"
+
+
+class Gate(typing.NamedTuple):
+    """A gate is open when package is at least version.
+
+    The candidate version is compared instead of the installed one when
+    candidate is set, only the upstream part when upstream is set. A gate on
+    a missing package takes the missing value.
+    """
+
+    package: str
+    version: str
+    candidate: bool = False
+    upstream: bool = True
+    missing: bool = False
+
+
+GATES: typing.Dict[str, Gate] = {
+    # OpenStack 2025.2 (Flamingo) introduced the neutron-rpc-server daemon and
+    # deprecated neutron-server.
+    "neutron_split_packages": Gate("python3-neutron", "26.0.0", candidate=True),
+    "neutron_split_services": Gate("python3-neutron", "26.0.0"),
+    "nova_api_under_apache": Gate("python3-nova", "32.0.0"),
+    "heat_api_under_apache": Gate("python3-heat", "25.0.0"),
+    "glance_strict_image_format": Gate("python3-glance", "31.0.0"),
+    # http://pad.lv/2141604
+    "tempestconf_fixed": Gate(
+        "python3-tempestconf", "3.5.1-1ubuntu1~cloud0", upstream=False, missing=True
+    ),
+    "magnum_coreos_35": Gate("magnum-conductor", "14", missing=True),
+    "magnum_coreos_38": Gate("magnum-conductor", "17", missing=True),
+}
+
+
+class Profile(typing.NamedTuple):
+    """Evaluated gates, see GATES."""
+
+    neutron_split_packages: bool = False
+    neutron_split_services: bool = False
+    nova_api_under_apache: bool = False
+    heat_api_under_apache: bool = False
+    glance_strict_image_format: bool = False
+    tempestconf_fixed: bool = True
+    magnum_coreos_35: bool = True
+    magnum_coreos_38: bool = True
+
+
+_PROFILES: typing.Dict[bool, typing.Tuple[str, Profile]] = {}
+_CANDIDATES: "contextvars.ContextVar[bool]" = contextvars.ContextVar(
+    "candidates", default=False
+)
+_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def candidates():
+    """Evaluate the gates on candidate versions within the block."""
+    token = _CANDIDATES.set(True)
+    try:
+        yield
+    finally:
+        _CANDIDATES.reset(token)
+
+
+def uses_candidates() -> bool:
+    """Whether gates on candidate versions currently look them up."""
+    return _CANDIDATES.get()
+
+
+def _profile_path(candidates: bool):
+    return utils.REGRESS_STACK_DIR / (
+        CANDIDATES_PROFILE_FILE if candidates else PROFILE_FILE
+    )
+
+
+def _key(candidates: bool) -> str:
+    gates = json.dumps(GATES, sort_keys=True).encode()
+    paths = [plan_cache.DPKG_STATUS]
+    if candidates:
+        paths.append(plan_cache.APT_LISTS)
+    state = plan_cache.cache_key(paths)
+    return hashlib.sha256(gates + state.encode()).hexdigest()
+
+
+def _version(version: typing.Optional[str], gate: Gate) -> typing.Optional[str]:
+    if version is not None and gate.upstream:
+        version = core_apt.upstream_version(version)
+    return version
+
+
+def evaluate(candidates: bool = False) -> Profile:
+    """Evaluate every gate against the current package states.
+
+    Gates on candidate versions compare the installed version unless
+    candidates is set and python-apt is available.
+    """
+    installed = {
+        pkg: state.installed
+        for pkg, state in core_apt.package_states(
+            (gate.package for gate in GATES.values()), candidate=False
+        ).items()
+    }
+    candidate = installed
+    if candidates:
+        # Only the gates on candidate versions need to open the apt cache.
+        try:
+            states = core_apt.package_states(
+                gate.package for gate in GATES.values() if gate.candidate
+            )
+        except ImportError as e:
+            LOG.warning("Gating on installed instead of candidate versions: %s", e)
+        else:
+            candidate = {pkg: state.candidate for pkg, state in states.items()}
+    flags = {}
+    for name, gate in GATES.items():
+        versions = candidate if gate.candidate else installed
+        version = _version(versions[gate.package], gate)
+        if version is None:
+            flags[name] = gate.missing
+        else:
+            flags[name] = core_apt.version_compare(version, gate.version) >= 0
+    return Profile(**flags)
+
+
+def _load(key: str, candidates: bool) -> typing.Optional[Profile]:
+    try:
+        data = json.loads(_profile_path(candidates).read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOG.debug("Ignoring unreadable platform profile: %s", e)
+        return None
+    if data.get("key") != key or set(data["gates"]) != set(Profile._fields):
+        return None
+    return Profile(**data["gates"])
+
+
+def _save(key: str, profile: Profile, candidates: bool) -> None:
+    path = _profile_path(candidates)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"key": key, "gates": profile._asdict()}))
+        tmp_path.replace(path)
+    except OSError as e:
+        LOG.debug("Failed to write platform profile: %s", e)
+
+
+def current() -> Profile:
+    """Return the profile of the platform, evaluated once per package state.
+
+    Gates on candidate versions only look them up within candidates().
+    """
+    candidates = uses_candidates()
+    key = _key(candidates)
+    with _LOCK:
+        cached = _PROFILES.get(candidates)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        profile = _load(key, candidates)
+        if profile is None:
+            profile = evaluate(candidates)
+            _save(key, profile, candidates)
+        _PROFILES[candidates] = key, profile
+        return profile
+
+
+def report() -> typing.List[str]:
+    """Describe the gates of the current profile."""
+    profile = current()
+    lines = []
+    for name, gate in GATES.items():
+        state = "yes" if getattr(profile, name) else "no"
+        if gate.candidate and uses_candidates():
+            source = "candidate"
+        else:
+            source = "installed"
+        lines.append(f"{name}: {state} ({source} {gate.package} >= {gate.version})")
+    return lines
@@ -0,0 +1,87 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""History of module setup durations and plan duration estimates."""
+
+import json
+import logging
+import statistics
+import threading
+import typing
+
+import networkx as nx
+
+from regress_stack.core import utils
+
+LOG = logging.getLogger(__name__)
+
+TIMINGS_FILE = "setup-timings.json"
+# Number of runs kept per module
+HISTORY_SIZE = 10
+
+_LOCK = threading.Lock()
+
+
+def _timings_path():
+    return utils.REGRESS_STACK_DIR / TIMINGS_FILE
+
+
+def load() -> typing.Dict[str, typing.List[float]]:
+    """Return the recorded setup durations, by module name."""
+    try:
+        return json.loads(_timings_path().read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        LOG.warning("Ignoring unreadable setup timings: %s", e)
+        return {}
+
+
+def record(name: str, duration: float) -> None:
+    """Append a setup duration to the history of module name."""
+    with _LOCK:
+        timings = load()
+        history = timings.setdefault(name, [])
+        history.append(round(duration, 3))
+        del history[:-HISTORY_SIZE]
+        path = _timings_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(timings, indent=2, sort_keys=True))
+
+
+def estimate(
+    timings: typing.Mapping[str, typing.List[float]], name: str
+) -> typing.Optional[float]:
+    """Expected setup duration of a module, the median of its history."""
+    history = timings.get(name)
+    if not history:
+        return None
+    return statistics.median(history)
+
+
+def critical_path(
+    graph: nx.DiGraph, durations: typing.Mapping[typing.Any, float]
+) -> typing.Tuple[typing.List[typing.Any], float]:
+    """Return the longest path through the DAG, weighted by node durations.
+
+    This is the wall time of a run with unlimited parallelism.
+    """
+    finish: typing.Dict[typing.Any, float] = {}
+    parent: typing.Dict[typing.Any, typing.Any] = {}
+    for node in nx.lexicographical_topological_sort(graph):
+        start = 0.0
+        for pred in graph.predecessors(node):
+            if node not in parent or finish[pred] > start:
+                start = finish[pred]
+                parent[node] = pred
+        finish[node] = start + durations.get(node, 0.0)
+
+    if not finish:
+        return [], 0.0
+    node = max(finish, key=lambda n: (finish[n], str(n)))
+    total = finish[node]
+    path = [node]
+    while node in parent:
+        node = parent[node]
+        path.append(node)
+    return list(reversed(path)), total
@@ -0,0 +1,143 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Timeline of nested spans, exported in the Chrome trace event format.
+
+Spans cover commands, module setups, setup phases, checkpointed steps, API
+calls and subprocesses, and are only recorded once tracing is started. The exported file opens in Perfetto
+or chrome://tracing, where spans of a thread nest by time.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+
+COMMAND = "command"
+MODULE = "module"
+STEP = "step"
+CHECKPOINT = "checkpoint"
+API = "api"
+SUBPROCESS = "subprocess"
+
+
+class Span(typing.NamedTuple):
+    name: str
+    category: str
+    # Microseconds since tracing started
+    start: float
+    duration: float
+    pid: int
+    tid: int
+    depth: int
+    args: typing.Dict[str, typing.Any]
+
+
+_SPANS: typing.Optional[typing.List[Span]] = None
+_ORIGIN = 0.0
+_DEPTH: "contextvars.ContextVar[int]" = contextvars.ContextVar("depth", default=0)
+_LOCK = threading.Lock()
+
+
+def start() -> None:
+    """Start recording spans, dropping those recorded so far."""
+    global _SPANS, _ORIGIN
+
+    with _LOCK:
+        _SPANS = []
+        _ORIGIN = time.perf_counter()
+
+
+def stop() -> typing.List[Span]:
+    """Stop recording spans and return the recorded spans."""
+    global _SPANS
+
+    with _LOCK:
+        spans, _SPANS = _SPANS or [], None
+    return spans
+
+
+def enabled() -> bool:
+    return _SPANS is not None
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = STEP, **args: typing.Any):
+    """Record the duration of the enclosed block as a span.
+
+    args are attached to the span, and can be updated from the block
+    through the yielded dict.
+    """
+    if _SPANS is None:
+        yield args
+        return
+    depth = _DEPTH.get()
+    token = _DEPTH.set(depth + 1)
+    begin = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        _DEPTH.reset(token)
+        recorded = Span(
+            name,
+            category,
+            (begin - _ORIGIN) * 1e6,
+            (end - begin) * 1e6,
+            os.getpid(),
+            threading.get_ident(),
+            depth,
+            args,
+        )
+        with _LOCK:
+            if _SPANS is not None:
+                _SPANS.append(recorded)
+
+
+def chrome_trace(spans: typing.Iterable[Span]) -> typing.Dict[str, typing.Any]:
+    """Return spans as a Chrome trace of complete events."""
+    events = []
+    for s in sorted(spans, key=lambda s: (s.start, -s.duration)):
+        events.append(
+            {
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round(s.start, 3),
+                "dur": round(s.duration, 3),
+                "pid": s.pid,
+                "tid": s.tid,
+                "args": {key: str(value) for key, value in s.args.items()},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export(spans: typing.Iterable[Span], path: pathlib.Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(chrome_trace(spans)))
+
+
+def summary(spans: typing.Sequence[Span], limit: int = 20) -> typing.List[str]:
+    """Describe the time spent by category and the longest spans."""
+    if not spans:
+        return ["No spans recorded"]
+    lines = []
+    wall = max(s.start + s.duration for s in spans) - min(s.start for s in spans)
+    lines.append(f"Wall time: {wall / 1e6:.2f}s")
+    totals: typing.Dict[str, typing.Tuple[int, float]] = {}
+    for s in spans:
+        count, total = totals.get(s.category, (0, 0.0))
+        totals[s.category] = count + 1, total + s.duration
+    for category, (count, total) in sorted(
+        totals.items(), key=lambda item: -item[1][1]
+    ):
+        lines.append(f"  {category}: {count} span(s), {total / 1e6:.2f}s")
+    lines.append("Longest spans:")
+    for s in sorted(spans, key=lambda s: -s.duration)[:limit]:
+        lines.append(f"  {s.duration / 1e6:8.2f}s {s.category:<10} {s.name}")
+    return lines
@@ -1,7 +1,11 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import asyncio
+import collections
 import contextlib
+import contextvars
+import fcntl
 import functools
 import importlib.resources
 import ipaddress
@@ -11,26 +15,79 @@ import multiprocessing
 import os
 import pathlib
 import platform
+import signal
 import socket
+import struct
 import subprocess
+import threading
 import time
 import typing
 
-import pyroute2
+from regress_stack.core import accounting, locks, trace
 
 LOG = logging.getLogger(__name__)
 
 REGRESS_STACK_DIR = pathlib.Path("/var/lib/regress-stack/")
+PROC_NET_ROUTE = pathlib.Path("/proc/net/route")
+# Number of output lines of a streamed command kept for error context
+STREAM_CONTEXT_LINES = 50
+# Deadline in seconds of a command run with run, by command name, a command
+# not listed gets DEFAULT_TIMEOUT. Modules override them with a TIMEOUTS dict.
+DEFAULT_TIMEOUT = 900.0
+COMMAND_TIMEOUTS: typing.Dict[str, typing.Optional[float]] = {
+    "crudini": 30.0,
+    "ceph": 180.0,
+    "ceph-authtool": 60.0,
+    "mysql": 120.0,
+    "ovs-vsctl": 60.0,
+    "rabbitmqctl": 120.0,
+    "systemctl": 300.0,
+    "virsh": 60.0,
+    "keystone-manage": 600.0,
+    "nova-manage": 1200.0,
+    "add-apt-repository": 600.0,
+    "apt-get": 3600.0,
+    "wget": 1800.0,
+    "tempest": 1800.0,
+    "discover-tempest-config": 1800.0,
+}
+# Seconds a timed out command is given to exit on SIGTERM before SIGKILL
+KILL_GRACE = 5.0
+# Default number of commands run_concurrently runs at once
+ASYNC_CONCURRENCY = 8
+
+T = typing.TypeVar("T")
+
+_TIMEOUTS: "contextvars.ContextVar[typing.Mapping[str, typing.Optional[float]]]" = (
+    contextvars.ContextVar("timeouts", default={})
+)
+_ASYNC_LIMIT: "contextvars.ContextVar[typing.Optional[asyncio.Semaphore]]" = (
+    contextvars.ContextVar("async_limit", default=None)
+)
+
+
+class Measurement:
+    """Duration of a measured section, set once the section exits."""
+
+    section: str
+    duration: typing.Optional[float]
+
+    def __init__(self, section: str):
+        self.section = section
+        self.duration = None
 
 
 @contextlib.contextmanager
-def measure(section: str):
+def measure(section: str, category: str = trace.STEP):
+    measurement = Measurement(section)
     start = time.time()
     try:
-        yield
+        with trace.span(section, category):
+            yield measurement
     finally:
         end = time.time()
-        LOG.info("%s: %.2fs", section, end - start)
+        measurement.duration = end - start
+        LOG.info("%s: %.2fs", section, measurement.duration)
 
 
 def warn_workaround(subject: str, detail: str) -> None:
@@ -56,43 +113,266 @@ def banner(msg: str):
 def measure_time(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        with measure("Function " + func.__name__):
+        with measure("Function " + func.__name__, trace.COMMAND):
             return func(*args, **kwargs)
 
     return wrapper
 
 
+class CommandTimeout(subprocess.TimeoutExpired):
+    """A command exceeded its deadline and was killed.
+
+    output holds its last output lines and snapshot the kernel stacks and
+    wait channels of its processes when it was killed.
+    """
+
+    def __init__(self, cmd, timeout, output=None, stderr=None, snapshot=""):
+        super().__init__(cmd, timeout, output, stderr)
+        self.snapshot = snapshot
+
+
+@contextlib.contextmanager
+def command_timeouts(timeouts: typing.Mapping[str, typing.Optional[float]]):
+    """Override the deadlines of commands run in this context, by command."""
+    token = _TIMEOUTS.set({**_TIMEOUTS.get(), **timeouts})
+    try:
+        yield
+    finally:
+        _TIMEOUTS.reset(token)
+
+
+def command_timeout(cmd_args: typing.Sequence[str]) -> typing.Optional[float]:
+    """Deadline of a command, None when it has none."""
+    name = accounting.command(cmd_args)
+    for timeouts in (_TIMEOUTS.get(), COMMAND_TIMEOUTS):
+        if name in timeouts:
+            return timeouts[name]
+    return DEFAULT_TIMEOUT
+
+
 def run(
     cmd: str,
     args: typing.Sequence[str] = (),
     env: typing.Optional[typing.Dict[str, str]] = None,
     cwd: typing.Optional[str] = None,
+    timeout: typing.Optional[float] = None,
 ) -> str:
+    """Run a command and return its output.
+
+    The command is killed, along with its process group, once it runs for
+    longer than timeout, by default its deadline from command_timeout.
+    """
     cmd_args = [cmd]
     cmd_args.extend(args)
+    if timeout is None:
+        timeout = command_timeout(cmd_args)
+    with trace.span(cmd, trace.SUBPROCESS, argv=" ".join(cmd_args)):
+        return _run(cmd_args, env, cwd, timeout)
+
+
+def _read_proc(path: str) -> str:
     try:
-        result = subprocess.run(
-            cmd_args,
-            shell=False,
-            check=True,
-            text=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env,
-            cwd=cwd,
+        with open(path, errors="replace") as f:
+            return f.read().strip()
+    except OSError as e:
+        return f"<{e.strerror}>"
+
+
+def _process_tree(pid: int) -> typing.List[int]:
+    pids = [pid]
+    for task in pathlib.Path(f"/proc/{pid}/task").glob("*/children"):
+        for child in _read_proc(str(task)).split():
+            if child.isdigit():
+                pids.extend(_process_tree(int(child)))
+    return pids
+
+
+def proc_snapshot(pid: int) -> str:
+    """Describe what the processes of the tree rooted at pid are blocked on."""
+    lines = []
+    for process in _process_tree(pid):
+        cmdline = _read_proc(f"/proc/{process}/cmdline").replace("\0", " ")
+        wchan = _read_proc(f"/proc/{process}/wchan")
+        lines.append(f"{process} {cmdline.strip()} (wchan: {wchan or '-'})")
+        for frame in _read_proc(f"/proc/{process}/stack").splitlines():
+            lines.append("    " + frame)
+    return "\n".join(lines)
+
+
+def _tail(output: typing.Optional[str]) -> str:
+    return "".join((output or "").splitlines(True)[-STREAM_CONTEXT_LINES:])
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    """Terminate the process group of process, killing it if it lingers."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(KILL_GRACE)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _timed_out(
+    cmd_args: typing.List[str],
+    timeout: typing.Optional[float],
+    stdout: typing.Optional[str],
+    stderr: typing.Optional[str],
+    snapshot: str,
+) -> CommandTimeout:
+    """Log a command killed on its deadline, return the error to raise."""
+    cmd = cmd_args[0]
+    stdout, stderr = _tail(stdout), _tail(stderr)
+    LOG.error("Command %r killed after %ss", " ".join(cmd_args), timeout)
+    LOG.error("Command %r last stdout lines: %s", cmd, stdout)
+    LOG.error("Command %r last stderr lines: %s", cmd, stderr)
+    LOG.error("Command %r processes when killed:\n%s", cmd, snapshot)
+    return CommandTimeout(cmd_args, timeout, stdout, stderr, snapshot)
+
+
+def _run(
+    cmd_args: typing.List[str],
+    env: typing.Optional[typing.Dict[str, str]],
+    cwd: typing.Optional[str],
+    timeout: typing.Optional[float] = None,
+) -> str:
+    cmd = cmd_args[0]
+    start = time.monotonic()
+    # A session of its own lets a timeout kill everything the command spawned.
+    with subprocess.Popen(
+        cmd_args,
+        shell=False,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        cwd=cwd,
+        start_new_session=True,
+    ) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            snapshot = proc_snapshot(process.pid)
+            _kill_group(process)
+            stdout, stderr = process.communicate()
+            accounting.record(
+                cmd_args,
+                time.monotonic() - start,
+                process.returncode,
+                accounting.size(stdout),
+                accounting.size(stderr),
+            )
+            raise _timed_out(cmd_args, timeout, stdout, stderr, snapshot)
+        except BaseException:
+            # In its own session the command does not get the Ctrl-C.
+            _kill_group(process)
+            raise
+    accounting.record(
+        cmd_args,
+        time.monotonic() - start,
+        process.returncode,
+        accounting.size(stdout),
+        accounting.size(stderr),
+    )
+    if process.returncode != 0:
+        LOG.error("Command %r failed with exit code %d", cmd, process.returncode)
+        LOG.error("Command %r stdout: %s", cmd, stdout)
+        LOG.error("Command %r stderr: %s", cmd, stderr)
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd_args, stdout, stderr
         )
-    except subprocess.CalledProcessError as e:
-        LOG.error("Command %r failed with exit code %d", cmd, e.returncode)
-        LOG.error("Command %r stdout: %s", cmd, e.stdout)
-        LOG.error("Command %r stderr: %s", cmd, e.stderr)
-        raise e
     LOG.debug(
         "Command %r stdout: %s, stderr: %s",
         " ".join(cmd_args),
-        result.stdout,
-        result.stderr,
+        stdout,
+        stderr,
     )
-    return result.stdout
+    return stdout
+
+
+def stream(
+    cmd: str,
+    args: typing.Sequence[str] = (),
+    env: typing.Optional[typing.Dict[str, str]] = None,
+    cwd: typing.Optional[str] = None,
+    on_line: typing.Optional[typing.Callable[[str], None]] = None,
+    tee: typing.Optional[pathlib.Path] = None,
+    timeout: typing.Optional[float] = None,
+) -> typing.List[str]:
+    """Run a command, processing its output line by line.
+
+    Unlike run, the output is not kept in memory: every line, stderr merged
+    into stdout, is passed to on_line and written to tee, only the last
+    STREAM_CONTEXT_LINES lines are kept and returned, or logged when the
+    command fails. The command is killed on its deadline, as with run.
+    """
+    cmd_args = [cmd]
+    cmd_args.extend(args)
+    if timeout is None:
+        timeout = command_timeout(cmd_args)
+    snapshot: typing.List[str] = []
+    context: typing.Deque[str] = collections.deque(maxlen=STREAM_CONTEXT_LINES)
+    size = 0
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(trace.span(cmd, trace.SUBPROCESS, argv=" ".join(cmd_args)))
+        tee_file = None
+        if tee is not None:
+            tee.parent.mkdir(parents=True, exist_ok=True)
+            tee_file = stack.enter_context(
+                tee.open("w", encoding="utf-8", errors="replace")
+            )
+        start = time.monotonic()
+        process = stack.enter_context(
+            subprocess.Popen(
+                cmd_args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+                env=env,
+                cwd=cwd,
+                start_new_session=True,
+            )
+        )
+
+        def expire():
+            snapshot.append(proc_snapshot(process.pid))
+            _kill_group(process)
+
+        watchdog = threading.Timer(timeout, expire) if timeout is not None else None
+        try:
+            if watchdog is not None:
+                watchdog.daemon = True
+                watchdog.start()
+            assert process.stdout is not None
+            for line in process.stdout:
+                size += len(line.encode())
+                context.append(line)
+                if tee_file is not None:
+                    tee_file.write(line)
+                if on_line is not None:
+                    on_line(line)
+            exit_code = process.wait()
+        except BaseException:
+            _kill_group(process)
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+                watchdog.join()
+        accounting.record(cmd_args, time.monotonic() - start, exit_code, size)
+    if snapshot:
+        raise _timed_out(cmd_args, timeout, "".join(context), None, snapshot[0])
+    if exit_code != 0:
+        output = "".join(context)
+        LOG.error("Command %r failed with exit code %d", cmd, exit_code)
+        LOG.error("Command %r last output lines: %s", cmd, output)
+        raise subprocess.CalledProcessError(exit_code, cmd_args, output=output)
+    return list(context)
 
 
 def system(
@@ -114,7 +394,10 @@ def system(
             os.environ.update(env)
         if cwd:
             os.chdir(cwd)
-        exit_code = os.waitstatus_to_exitcode(os.system(cmd))
+        start = time.monotonic()
+        with trace.span(cmd.split(" ", 1)[0], trace.SUBPROCESS, argv=cmd):
+            exit_code = os.waitstatus_to_exitcode(os.system(cmd))
+        accounting.record([cmd], time.monotonic() - start, exit_code)
     finally:
         if env:
             os.environ = saved_env
@@ -133,8 +416,159 @@ def sudo(
     return run("sudo", opts + [cmd, *args])
 
 
+class CommandResult(typing.NamedTuple):
+    """Outcome of a command run by arun."""
+
+    argv: typing.List[str]
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float
+
+
+def _killpg(pid: int, sig: int) -> None:
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _acommunicate(
+    process: "asyncio.subprocess.Process", timeout: typing.Optional[float]
+) -> typing.Tuple[bytes, bytes, typing.Optional[str]]:
+    """Read the output of process until it exits or its deadline expires.
+
+    On expiry the process group is terminated, then killed if it lingers,
+    and the snapshot of its processes taken beforehand is returned.
+    """
+    assert process.stdout is not None and process.stderr is not None
+    reads = [
+        asyncio.ensure_future(process.stdout.read()),
+        asyncio.ensure_future(process.stderr.read()),
+    ]
+    exited = asyncio.ensure_future(process.wait())
+    snapshot = None
+    try:
+        _, pending = await asyncio.wait([*reads, exited], timeout=timeout)
+        if pending:
+            snapshot = proc_snapshot(process.pid)
+            for sig in (signal.SIGTERM, signal.SIGKILL):
+                _killpg(process.pid, sig)
+                try:
+                    await asyncio.wait_for(asyncio.shield(exited), KILL_GRACE)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+        out, err = await asyncio.gather(*reads)
+        await exited
+    finally:
+        for task in (*reads, exited):
+            task.cancel()
+    return out, err, snapshot
+
+
+async def arun(
+    cmd: str,
+    args: typing.Sequence[str] = (),
+    env: typing.Optional[typing.Dict[str, str]] = None,
+    cwd: typing.Optional[str] = None,
+    check: bool = True,
+    timeout: typing.Optional[float] = None,
+) -> CommandResult:
+    """Asynchronous counterpart of run.
+
+    Within run_concurrently, at most its limit of commands run at once. The
+    command is killed on its deadline, as with run.
+    """
+    cmd_args = [cmd]
+    cmd_args.extend(args)
+    if timeout is None:
+        timeout = command_timeout(cmd_args)
+    limit = _ASYNC_LIMIT.get()
+    async with limit if limit is not None else contextlib.AsyncExitStack():
+        with trace.span(cmd, trace.SUBPROCESS, argv=" ".join(cmd_args)):
+            start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *cmd_args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                cwd=cwd,
+                start_new_session=True,
+            )
+            try:
+                out, err, expired = await _acommunicate(process, timeout)
+            except BaseException:
+                _killpg(process.pid, signal.SIGKILL)
+                raise
+            duration = time.monotonic() - start
+    assert process.returncode is not None
+    if expired is not None:
+        accounting.record(cmd_args, duration, process.returncode, len(out), len(err))
+        raise _timed_out(
+            cmd_args,
+            timeout,
+            out.decode(errors="replace"),
+            err.decode(errors="replace"),
+            expired,
+        )
+    result = CommandResult(
+        cmd_args,
+        process.returncode,
+        out.decode(errors="replace"),
+        err.decode(errors="replace"),
+        duration,
+    )
+    accounting.record(cmd_args, duration, result.exit_code, len(out), len(err))
+    if check and result.exit_code != 0:
+        LOG.error("Command %r failed with exit code %d", cmd, result.exit_code)
+        LOG.error("Command %r stdout: %s", cmd, result.stdout)
+        LOG.error("Command %r stderr: %s", cmd, result.stderr)
+        raise subprocess.CalledProcessError(
+            result.exit_code, cmd_args, result.stdout, result.stderr
+        )
+    LOG.debug(
+        "Command %r stdout: %s, stderr: %s",
+        " ".join(cmd_args),
+        result.stdout,
+        result.stderr,
+    )
+    return result
+
+
+async def asudo(
+    cmd: str, args: typing.Sequence[str], user: typing.Optional[str] = None
+) -> CommandResult:
+    """Asynchronous counterpart of sudo."""
+    opts = []
+    if user:
+        opts = ["--user", user]
+    return await arun("sudo", opts + [cmd, *args])
+
+
+def run_concurrently(
+    *aws: typing.Awaitable[T], limit: typing.Optional[int] = None
+) -> typing.List[T]:
+    """Run coroutines concurrently from synchronous code, return their results.
+
+    The commands they run with arun are limited to limit at once, by default
+    ASYNC_CONCURRENCY. The first failure is raised once all are done.
+    """
+
+    async def gather() -> typing.List[T]:
+        _ASYNC_LIMIT.set(asyncio.Semaphore(limit or ASYNC_CONCURRENCY))
+        results = await asyncio.gather(*aws, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return typing.cast(typing.List[T], results)
+
+    return asyncio.run(gather())
+
+
 def restart_service(service: str):
-    run("systemctl", ["restart", service])
+    with locks.hold(locks.service(service)):
+        run("systemctl", ["restart", service])
 
 
 def restart_apache():
@@ -155,14 +589,43 @@ def fqdn() -> str:
     return run("hostname", ["-f"]).strip()
 
 
+# ioctl requests reading the IPv4 address and netmask of an interface
+_SIOCGIFADDR = 0x8915
+_SIOCGIFNETMASK = 0x891B
+_RTF_UP = 0x1
+
+
+def _default_route_interface() -> str:
+    """Name of the interface of the IPv4 default route, read from /proc."""
+    routes = []
+    with PROC_NET_ROUTE.open() as f:
+        next(f, None)
+        for line in f:
+            # Iface Destination Gateway Flags RefCnt Use Metric Mask ...
+            fields = line.split()
+            if len(fields) < 8 or not int(fields[3], 16) & _RTF_UP:
+                continue
+            if fields[1] == "00000000" and fields[7] == "00000000":
+                routes.append((int(fields[6]), fields[0]))
+    if not routes:
+        raise RuntimeError("No IPv4 default route")
+    return min(routes)[1]
+
+
+def _interface_address(ifname: str) -> typing.Tuple[str, int]:
+    """Primary IPv4 address and prefix length of an interface."""
+    request = struct.pack("256s", ifname.encode()[:15])
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        address = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, request)[20:24]
+        netmask = fcntl.ioctl(sock.fileno(), _SIOCGIFNETMASK, request)[20:24]
+    prefixlen = ipaddress.IPv4Network(f"0.0.0.0/{socket.inet_ntoa(netmask)}").prefixlen
+    return socket.inet_ntoa(address), prefixlen
+
+
 @functools.lru_cache()
 def _get_local_ip_by_default_route() -> typing.Tuple[str, int]:
     """Get host IP from default route interface."""
-    with pyroute2.NDB() as ndb:
-        default_route_ifindex = ndb.routes["default"]["oif"]
-        iface = ndb.interfaces[default_route_ifindex]
-        ipaddr = iface.ipaddr[socket.AF_INET]
-        return ipaddr["address"], ipaddr["prefixlen"]
+    return _interface_address(_default_route_interface())
 
 
 @functools.lru_cache()
@@ -184,14 +647,20 @@ def my_network() -> str:
         return "127.0.0.1/8"
 
 
-def exists_cache(path: pathlib.Path):
-    """Wrapped function is not executed if resulting file exists."""
+def exists_cache(
+    path: typing.Union[pathlib.Path, typing.Callable[[], pathlib.Path]],
+):
+    """Wrapped function is not executed if resulting file exists.
+
+    path can be given as a function, called when the wrapped function is.
+    """
 
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            if path.exists():
-                return path
+            result_path = path() if callable(path) else path
+            if result_path.exists():
+                return result_path
             result = func(*args, **kwargs)
             return result
 
@@ -200,6 +669,25 @@ def exists_cache(path: pathlib.Path):
     return decorator
 
 
+def lazy_constants(
+    **factories: typing.Callable[[], typing.Any],
+) -> typing.Callable[[str], typing.Any]:
+    """Return a module __getattr__ computing constants on first access.
+
+    Constants depending on host facts, such as URLs embedding my_ip(), are
+    exposed this way so importing a module does not discover them.
+    """
+
+    def __getattr__(name: str) -> typing.Any:
+        try:
+            factory = factories[name]
+        except KeyError:
+            raise AttributeError(f"module has no attribute {name!r}") from None
+        return factory()
+
+    return __getattr__
+
+
 def machine() -> str:
     """Return machine type."""
     machine_name = platform.machine().lower()
@@ -229,6 +717,12 @@ def mark_setup(name: str):
     return done_file
 
 
+def unmark_setup(name: str):
+    """Mark task as not done."""
+    done_file = REGRESS_STACK_DIR / (name + ".setup")
+    done_file.unlink(missing_ok=True)
+
+
 def is_setup_done(name: str) -> bool:
     """Check if task is done."""
     done_file = REGRESS_STACK_DIR / (name + ".setup")
@@ -255,8 +749,11 @@ def write_resource(
 def concurrency_cb(arg: str) -> int:
     """Handle concurrency argument, for use with ArgumentParser.
 
-    :raises: ValueError.
+    :raises: ValueError when arg is neither 'auto' nor a positive integer.
     """
     if arg == "auto":
         return math.ceil(multiprocessing.cpu_count() / 3)
-    return int(arg)
+    value = int(arg)
+    if value < 1:
+        raise ValueError(f"concurrency must be at least 1, got {value}")
+    return value
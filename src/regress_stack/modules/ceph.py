@@ -25,16 +25,43 @@ MON_KEYRING = Path("/etc/ceph/ceph.mon.keyring")
 ADMIN_KEYRING = Path("/etc/ceph/ceph.client.admin.keyring")
 OSD_KEYRING = Path("/var/lib/ceph/bootstrap-osd/ceph.keyring")
 MONMAP = Path("/etc/ceph/ceph.monmap")
-MON_DATA_FOLDER = Path(f"/var/lib/ceph/mon/{CLUSTER}-{core_utils.fqdn()}")
-MON_SETUP_DONE = MON_DATA_FOLDER / "done"
-MGR_DATA_FOLDER = Path(f"/var/lib/ceph/mgr/{CLUSTER}-{core_utils.fqdn()}")
-MGR_KEYRING = MGR_DATA_FOLDER / "keyring"
-MGR_SETUP_DONE = MGR_DATA_FOLDER / "done"
 OSD_DATA_PATH = Path("/var/lib/ceph/osd")
 RBD_UUID = Path("/etc/ceph/rbd_secret_uuid")
 
 OSD_SIZE_GB = 2
 
+# The ceph CLI waits forever for a monitor without quorum, fail fast instead.
+TIMEOUTS = {"ceph": 120.0}
+
+
+def mon_data_folder() -> Path:
+    return Path(f"/var/lib/ceph/mon/{CLUSTER}-{core_utils.fqdn()}")
+
+
+def mon_setup_done() -> Path:
+    return mon_data_folder() / "done"
+
+
+def mgr_data_folder() -> Path:
+    return Path(f"/var/lib/ceph/mgr/{CLUSTER}-{core_utils.fqdn()}")
+
+
+def mgr_keyring() -> Path:
+    return mgr_data_folder() / "keyring"
+
+
+def mgr_setup_done() -> Path:
+    return mgr_data_folder() / "done"
+
+
+__getattr__ = core_utils.lazy_constants(
+    MON_DATA_FOLDER=mon_data_folder,
+    MON_SETUP_DONE=mon_setup_done,
+    MGR_DATA_FOLDER=mgr_data_folder,
+    MGR_KEYRING=mgr_keyring,
+    MGR_SETUP_DONE=mgr_setup_done,
+)
+
 
 def installed() -> bool:
     return core_apt.pkgs_installed(PACKAGES)
@@ -75,6 +102,25 @@ def setup():
         core_utils.exists_cache(OSD_DATA_PATH / f"ceph-{i}" / "done")(setup_osd)(i)
 
 
+def reset():
+    """Tear down the OSDs, then the mon and mgr along with their data.
+
+    The fsid, keyrings and monmap are kept, the next setup creates a new
+    cluster from them.
+    """
+    if not installed():
+        return
+    for osd_id in core_utils.run("ceph", ["osd", "ls"]).split():
+        core_utils.run("systemctl", ["disable", "--now", f"ceph-osd@{osd_id}"])
+        core_utils.run("ceph", ["osd", "purge", osd_id, "--yes-i-really-mean-it"])
+    for osd_dir in OSD_DATA_PATH.glob("ceph-*"):
+        shutil.rmtree(osd_dir)
+    for unit in (f"ceph-mgr@{core_utils.fqdn()}", f"ceph-mon@{core_utils.fqdn()}"):
+        core_utils.run("systemctl", ["disable", "--now", unit])
+    shutil.rmtree(mgr_data_folder(), ignore_errors=True)
+    shutil.rmtree(mon_data_folder(), ignore_errors=True)
+
+
 @functools.lru_cache
 def ceph_uuid() -> str:
     if UUID_PATH.exists():
@@ -107,13 +153,13 @@ def setup_mon_keyring() -> Path:
     return MON_KEYRING
 
 
-@core_utils.exists_cache(MGR_KEYRING)
+@core_utils.exists_cache(mgr_keyring)
 def setup_mgr_keyring() -> Path:
     core_utils.run(
         "ceph-authtool",
         [
             "--create-keyring",
-            str(MGR_KEYRING),
+            str(mgr_keyring()),
             "--gen-key",
             "-n",
             "mgr." + core_utils.fqdn(),
@@ -128,8 +174,8 @@ def setup_mgr_keyring() -> Path:
             "allow *",
         ],
     )
-    shutil.chown(MGR_KEYRING, user="ceph", group="ceph")
-    return MGR_KEYRING
+    shutil.chown(mgr_keyring(), user="ceph", group="ceph")
+    return mgr_keyring()
 
 
 @core_utils.exists_cache(ADMIN_KEYRING)
@@ -233,13 +279,13 @@ def monmap() -> Path:
 
 
 def ensure_ceph_folders():
-    MON_DATA_FOLDER.mkdir(parents=True, exist_ok=True)
-    shutil.chown(MON_DATA_FOLDER, user="ceph", group="ceph")
-    MGR_DATA_FOLDER.mkdir(parents=True, exist_ok=True)
-    shutil.chown(MGR_DATA_FOLDER, user="ceph", group="ceph")
+    mon_data_folder().mkdir(parents=True, exist_ok=True)
+    shutil.chown(mon_data_folder(), user="ceph", group="ceph")
+    mgr_data_folder().mkdir(parents=True, exist_ok=True)
+    shutil.chown(mgr_data_folder(), user="ceph", group="ceph")
 
 
-@core_utils.exists_cache(MON_SETUP_DONE)
+@core_utils.exists_cache(mon_setup_done)
 def setup_mon():
     core_utils.sudo(
         "ceph-mon",
@@ -256,20 +302,20 @@ def setup_mon():
         ],
         "ceph",
     )
-    MON_SETUP_DONE.touch()
+    mon_setup_done().touch()
     unit = f"ceph-mon@{core_utils.fqdn()}"
     core_utils.restart_service(unit)
     core_utils.enable_service(unit)
-    return MON_SETUP_DONE
+    return mon_setup_done()
 
 
-@core_utils.exists_cache(MGR_SETUP_DONE)
+@core_utils.exists_cache(mgr_setup_done)
 def setup_mgr():
     unit = f"ceph-mgr@{core_utils.fqdn()}"
     core_utils.restart_service(unit)
     core_utils.enable_service(unit)
-    MGR_SETUP_DONE.touch()
-    return MGR_SETUP_DONE
+    mgr_setup_done().touch()
+    return mgr_setup_done()
 
 
 def setup_osd(i: int) -> Path:
@@ -337,6 +383,17 @@ def ensure_pool(name: str) -> str:
     return name
 
 
+def drop_pool(name: str):
+    pools = core_utils.run("ceph", ["osd", "pool", "ls"]).splitlines()
+    if name not in (pool.strip() for pool in pools):
+        return
+    core_utils.run("ceph", ["config", "set", "mon", "mon_allow_pool_delete", "true"])
+    core_utils.run(
+        "ceph",
+        ["osd", "pool", "delete", name, name, "--yes-i-really-really-mean-it"],
+    )
+
+
 def ensure_authenticate(pool: str, user: typing.Optional[str] = None) -> Path:
     keyring = Path(f"/etc/ceph/ceph.client.{pool}.keyring")
     if keyring.exists():
@@ -367,6 +424,11 @@ def ensure_authenticate(pool: str, user: typing.Optional[str] = None) -> Path:
     return keyring
 
 
+def drop_authenticate(pool: str):
+    core_utils.run("ceph", ["auth", "rm", f"client.{pool}"])
+    Path(f"/etc/ceph/ceph.client.{pool}.keyring").unlink(missing_ok=True)
+
+
 def get_key(user: str) -> str:
     return core_utils.run("ceph", ["auth", "get-key", f"client.{user}"]).strip()
 
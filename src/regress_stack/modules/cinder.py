@@ -1,6 +1,7 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import pathlib
 import subprocess
 
@@ -14,7 +15,6 @@ PACKAGES = ["cinder-api", "cinder-scheduler", "cinder-volume"]
 LOGS = ["/var/log/cinder/"]
 
 CONF = "/etc/cinder/cinder.conf"
-URL = f"http://{core_utils.my_ip()}:8776/v3/%(project_id)s"
 SERVICE = "cinder"
 SERVICE_TYPE = "volumev3"
 VOLUME_POOL = "volumes"
@@ -26,16 +26,40 @@ CINDER_PRIVSEP_HELPER = (
 )
 
 
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:8776/v3/%(project_id)s"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
+
+
 def installed() -> bool:
     return core_apt.pkgs_installed(PACKAGES)
 
 
-def setup():
+def provision() -> dict[str, str]:
     db_user, db_pass = mysql.ensure_service(SERVICE)
     rabbit_user, rabbit_pass = rabbitmq.ensure_service(SERVICE)
-    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, URL)
+    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, url())
     pool = ceph.ensure_pool(VOLUME_POOL)
     ceph.ensure_authenticate(VOLUME_POOL, SERVICE)
+    return {
+        "db_user": db_user,
+        "db_pass": db_pass,
+        "rabbit_user": rabbit_user,
+        "rabbit_pass": rabbit_pass,
+        "username": username,
+        "password": password,
+        "pool": pool,
+    }
+
+
+def configure(provisioned: dict[str, str]):
+    db_user, db_pass = provisioned["db_user"], provisioned["db_pass"]
+    rabbit_user, rabbit_pass = provisioned["rabbit_user"], provisioned["rabbit_pass"]
+    username, password = provisioned["username"], provisioned["password"]
+    pool = provisioned["pool"]
     core_utils.run(
         "sed",
         [
@@ -79,10 +103,22 @@ def setup():
         ),
     )
     _ensure_questing_compat()
+
+
+def migrate(provisioned: dict[str, str]):
     core_utils.sudo("cinder-manage", ["db", "sync"], SERVICE)
-    core_utils.restart_apache()
-    core_utils.restart_service("cinder-scheduler")
-    core_utils.restart_service("cinder-volume")
+
+
+def services() -> list[str]:
+    return ["apache2", "cinder-scheduler", "cinder-volume"]
+
+
+def reset():
+    ceph.drop_authenticate(VOLUME_POOL)
+    ceph.drop_pool(VOLUME_POOL)
+    keystone.drop_service_account(SERVICE)
+    rabbitmq.drop_service(SERVICE)
+    mysql.drop_service(SERVICE)
 
 
 def _ensure_questing_compat() -> None:
@@ -1,9 +1,10 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import pathlib
 
-from regress_stack.core import apt as core_apt
+from regress_stack.core import profile
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import keystone, mysql
 from regress_stack.modules import utils as module_utils
@@ -13,16 +14,20 @@ PACKAGES = ["glance-api"]
 LOGS = ["/var/log/glance/"]
 
 CONF = "/etc/glance/glance-api.conf"
-URL = f"http://{core_utils.my_ip()}:9292/"
 SERVICE = "glance"
 SERVICE_TYPE = "image"
-GLANCE_STRICT_IMAGE_FORMAT_VERSION = "31.0.0"
+
+
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:9292/"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
 
 
 def _disable_strict_image_format_validation():
-    if core_apt.PkgVersionCompare("python3-glance", upstream=True) < (
-        GLANCE_STRICT_IMAGE_FORMAT_VERSION
-    ):
+    if not profile.current().glance_strict_image_format:
         return
     core_utils.warn_workaround(
         "glance image upload validation",
@@ -33,9 +38,14 @@ def _disable_strict_image_format_validation():
     module_utils.cfg_set(CONF, ("image_format", "require_image_format_match", "false"))
 
 
-def setup():
+def provision() -> tuple[str, str, str, str]:
     db_user, db_pass = mysql.ensure_service(SERVICE)
-    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, URL)
+    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, url())
+    return db_user, db_pass, username, password
+
+
+def configure(provisioned: tuple[str, str, str, str]):
+    db_user, db_pass, username, password = provisioned
     module_utils.cfg_set(
         CONF,
         (
@@ -54,10 +64,22 @@ def setup():
         ("fs", "filesystem_store_datadir", "/var/lib/glance/images/"),
     )
     _disable_strict_image_format_validation()
+
+
+def migrate(provisioned: tuple[str, str, str, str]):
     core_utils.sudo("glance-manage", ["db_sync"], user=SERVICE)
-    core_utils.restart_service("glance-api")
 
 
+def services() -> list[str]:
+    return ["glance-api"]
+
+
+def reset():
+    keystone.drop_service_account(SERVICE)
+    mysql.drop_service(SERVICE)
+
+
+@keystone.api()
 def ensure_image(name: str, filepath: pathlib.Path, **kwargs):
     conn = keystone.o7k()
 
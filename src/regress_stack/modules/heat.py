@@ -1,10 +1,11 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import logging
 import pathlib
 
-from regress_stack.core import apt as core_apt
+from regress_stack.core import profile
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import keystone, mysql, neutron, nova, rabbitmq
 from regress_stack.modules import utils as module_utils
@@ -16,23 +17,16 @@ PACKAGES = ["heat-api", "heat-api-cfn", "heat-engine"]
 LOGS = ["/var/log/heat/"]
 
 CONF = "/etc/heat/heat.conf"
-URL = f"http://{core_utils.my_ip()}:8004"
-URL_CFN = URL + "/v1"
-URL_ORCHESTRATION = URL_CFN + "/%(tenant_id)s"
 SERVICE = "heat"
 SERVICE_CFN = "heat-cfn"
 SERVICE_TYPE = "orchestration"
 SERVICE_TYPE_CFN = "cloudformation"
-HEAT_APACHE_API_VERSION = "25.0.0"
 HEAT_STACK_ADMIN = "heat_admin"
 HEAT_STACK_ADMIN_PASSWORD = "changeme"
 
 HEAT_STACK_OWNER = "heat_stack_owner"
 HEAT_STACK_USER = "heat_stack_user"
 
-URL_HEAT_METADATA = f"http://{core_utils.my_ip()}:8000"
-URL_HEAT_METADATA_WAIT = URL_HEAT_METADATA + "/v1/waitcondition"
-
 
 # tempest run --list --regex heat_tempest_plugin.tests.functional.test_nova_server_networks --regex '^(.(?!(test_create_update_server_add_subnet)))*$' --regex '^(.(?!(test_create_stack_with_multi_signal_waitcondition)))*$' --regex '^(.(?!(aodh)))*$ --regex ^(.(?!(test_extra_route_set)))*$'
 TEST_INCLUDE_REGEXES = [
@@ -47,14 +41,45 @@ TEST_EXCLUDE_REGEXES = [
 ]
 
 
-def setup():
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:8004"
+
+
+def url_cfn() -> str:
+    return url() + "/v1"
+
+
+def url_orchestration() -> str:
+    return url_cfn() + "/%(tenant_id)s"
+
+
+@functools.lru_cache()
+def url_heat_metadata() -> str:
+    return f"http://{core_utils.my_ip()}:8000"
+
+
+def url_heat_metadata_wait() -> str:
+    return url_heat_metadata() + "/v1/waitcondition"
+
+
+__getattr__ = core_utils.lazy_constants(
+    URL=url,
+    URL_CFN=url_cfn,
+    URL_ORCHESTRATION=url_orchestration,
+    URL_HEAT_METADATA=url_heat_metadata,
+    URL_HEAT_METADATA_WAIT=url_heat_metadata_wait,
+)
+
+
+def provision() -> dict[str, str]:
     db_user, db_pass = mysql.ensure_service(SERVICE)
     rabbit_user, rabbit_pass = rabbitmq.ensure_service(SERVICE)
     username, password = keystone.ensure_service_account(
-        SERVICE, SERVICE_TYPE, URL_ORCHESTRATION
+        SERVICE, SERVICE_TYPE, url_orchestration()
     )
     service_cfn = keystone.ensure_service(SERVICE_CFN, SERVICE_TYPE_CFN)
-    keystone.ensure_endpoint(service_cfn, URL_CFN)
+    keystone.ensure_endpoint(service_cfn, url_cfn())
     domain = keystone.ensure_domain(SERVICE)
     heat_stack_admin = keystone.ensure_user(
         HEAT_STACK_ADMIN, HEAT_STACK_ADMIN_PASSWORD, domain.id
@@ -62,6 +87,21 @@ def setup():
     keystone.grant_domain_role(heat_stack_admin, keystone.admin_role(), domain)
     keystone.ensure_role(HEAT_STACK_OWNER)
     keystone.ensure_role(HEAT_STACK_USER)
+    return {
+        "db_user": db_user,
+        "db_pass": db_pass,
+        "rabbit_user": rabbit_user,
+        "rabbit_pass": rabbit_pass,
+        "username": username,
+        "password": password,
+        "domain_id": domain.id,
+    }
+
+
+def configure(provisioned: dict[str, str]):
+    db_user, db_pass = provisioned["db_user"], provisioned["db_pass"]
+    rabbit_user, rabbit_pass = provisioned["rabbit_user"], provisioned["rabbit_pass"]
+    username, password = provisioned["username"], provisioned["password"]
     module_utils.cfg_set(
         CONF,
         (
@@ -77,7 +117,7 @@ def setup():
             "trustee",
             {
                 "auth_type": "password",
-                "auth_url": keystone.OS_AUTH_URL,
+                "auth_url": keystone.os_auth_url(),
                 "username": username,
                 "password": password,
                 "user_domain_id": keystone.service_domain(),
@@ -87,31 +127,42 @@ def setup():
         ("heat_api", "workers", "1"),
         ("heat_api_cfn", "workers", "1"),
         ("DEFAULT", "transport_url", rabbitmq.transport_url(rabbit_user, rabbit_pass)),
-        ("DEFAULT", "heat_metadata_server_url", URL_HEAT_METADATA),
-        ("DEFAULT", "heat_waitcondition_server_url", URL_HEAT_METADATA_WAIT),
+        ("DEFAULT", "heat_metadata_server_url", url_heat_metadata()),
+        ("DEFAULT", "heat_waitcondition_server_url", url_heat_metadata_wait()),
         ("DEFAULT", "instance_driver", "heat.engine.nova"),
         *module_utils.dict_to_cfg_set_args(
             "DEFAULT",
             {
-                "stack_user_domain_id": domain.id,
+                "stack_user_domain_id": provisioned["domain_id"],
                 "stack_domain_admin": HEAT_STACK_ADMIN,
                 "stack_domain_admin_password": HEAT_STACK_ADMIN_PASSWORD,
             },
         ),
     )
+
+
+def migrate(provisioned: dict[str, str]):
     core_utils.sudo("heat-manage", ["db_sync"], user=SERVICE)
+
+
+def services() -> list[str]:
     heat_daemons = ["heat-api", "heat-api-cfn", "heat-engine"]
-    if (
-        core_apt.PkgVersionCompare("python3-heat", upstream=True)
-        >= HEAT_APACHE_API_VERSION
-    ):
+    if profile.current().heat_api_under_apache:
         heat_daemons.remove("heat-api")
         heat_daemons.remove("heat-api-cfn")
         # heat-api and heat-api-cfn run as WSGI apps under apache2.
         heat_daemons.insert(0, "apache2")
+    return heat_daemons
+
 
-    for _daemon in heat_daemons:
-        core_utils.restart_service(_daemon)
+def reset():
+    keystone.drop_role(HEAT_STACK_USER)
+    keystone.drop_role(HEAT_STACK_OWNER)
+    keystone.drop_domain(SERVICE)
+    keystone.drop_service(SERVICE_CFN)
+    keystone.drop_service_account(SERVICE)
+    rabbitmq.drop_service(SERVICE)
+    mysql.drop_service(SERVICE)
 
 
 def configure_tempest(tempest_conf: pathlib.Path):
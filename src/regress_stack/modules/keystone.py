@@ -7,8 +7,7 @@ import os
 import pathlib
 import typing
 
-import openstack
-
+from regress_stack.core import locks, trace
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import mysql, utils
 from regress_stack.modules import utils as module_utils
@@ -23,14 +22,23 @@ LOGS = ["/var/log/keystone/"]
 
 CONF = "/etc/keystone/keystone.conf"
 ADMIN_PASSWORD = "changeme"
-OS_AUTH_URL = f"http://{core_utils.my_ip()}:5000/v3/"
 SERVICE_DOMAIN = "service"
 SERVICE_PROJECT = "service"
+# Shared by the API calls, held exclusively to tear the connection down
+CONNECTION = "keystone-connection"
 RESOURCE_PKG = "regress_stack.resources"
 PUBLIC_WSGI = pathlib.Path("/usr/bin/keystone-wsgi-public")
 ADMIN_WSGI = pathlib.Path("/usr/bin/keystone-wsgi-admin")
 
 
+@functools.lru_cache()
+def os_auth_url() -> str:
+    return f"http://{core_utils.my_ip()}:5000/v3/"
+
+
+__getattr__ = core_utils.lazy_constants(OS_AUTH_URL=os_auth_url)
+
+
 def _ensure_wsgi_scripts() -> None:
     for resource, destination in (
         ("keystone-wsgi-public", PUBLIC_WSGI),
@@ -50,8 +58,12 @@ def _ensure_wsgi_scripts() -> None:
         )
 
 
-def setup():
-    username, password = mysql.ensure_service("keystone")
+def provision() -> typing.Tuple[str, str]:
+    return mysql.ensure_service("keystone")
+
+
+def configure(provisioned: typing.Tuple[str, str]):
+    username, password = provisioned
     _ensure_wsgi_scripts()
     core_utils.run(
         "sed",
@@ -71,6 +83,9 @@ def setup():
         ("database", "max_pool_size", "1"),
         ("token", "provider", "fernet"),
     )
+
+
+def migrate(provisioned: typing.Tuple[str, str]):
     LOG.debug("Running keystone-manage db_sync...")
     core_utils.sudo(
         "keystone-manage",
@@ -88,16 +103,22 @@ def setup():
             "--bootstrap-password",
             ADMIN_PASSWORD,
             "--bootstrap-admin-url",
-            OS_AUTH_URL,
+            os_auth_url(),
             "--bootstrap-internal-url",
-            OS_AUTH_URL,
+            os_auth_url(),
             "--bootstrap-public-url",
-            OS_AUTH_URL,
+            os_auth_url(),
             "--bootstrap-region-id",
             utils.REGION,
         ],
     )
-    core_utils.restart_apache()
+
+
+def services() -> typing.List[str]:
+    return ["apache2"]
+
+
+def post():
     authrc = auth_rc()
     print(authrc)
     pathlib.Path("~/auth.rc").expanduser().write_text(authrc)
@@ -106,6 +127,16 @@ def setup():
     ensure_role("_member_")
 
 
+def reset():
+    mysql.drop_service("keystone")
+    pathlib.Path("~/auth.rc").expanduser().unlink(missing_ok=True)
+    # Identifiers cached from the dropped database are stale
+    for cached in (o7k, region, service_domain, default_domain, admin_user):
+        cached.cache_clear()
+    service_project.cache_clear()
+    admin_role.cache_clear()
+
+
 def auth_env() -> typing.Dict[str, str]:
     return {
         "OS_USERNAME": "admin",
@@ -113,7 +144,7 @@ def auth_env() -> typing.Dict[str, str]:
         "OS_PROJECT_NAME": "admin",
         "OS_USER_DOMAIN_NAME": "Default",
         "OS_PROJECT_DOMAIN_NAME": "Default",
-        "OS_AUTH_URL": OS_AUTH_URL,
+        "OS_AUTH_URL": os_auth_url(),
         "OS_IDENTITY_API_VERSION": "3",
         "OS_REGION_NAME": utils.REGION,
     }
@@ -121,7 +152,7 @@ def auth_env() -> typing.Dict[str, str]:
 
 def account_dict(service: str, password: str) -> typing.Dict[str, str]:
     return {
-        "auth_url": OS_AUTH_URL,
+        "auth_url": os_auth_url(),
         "auth_type": "password",
         "project_domain_name": SERVICE_DOMAIN,
         "user_domain_name": SERVICE_DOMAIN,
@@ -135,7 +166,7 @@ def account_dict(service: str, password: str) -> typing.Dict[str, str]:
 def authtoken_service(service: str, password: str) -> typing.Dict[str, str]:
     return {
         **account_dict(service, password),
-        "www_authenticate_uri": OS_AUTH_URL,
+        "www_authenticate_uri": os_auth_url(),
         "service_token_roles": "admin",
         "service_token_roles_required": "true",
     }
@@ -147,17 +178,43 @@ def auth_rc():
 
 @functools.lru_cache()
 def o7k():
+    # openstacksdk is slow to import and only needed to talk to the cloud
+    import openstack
+
     os.environ.update(auth_env())
     conn = openstack.connect(load_envvars=True)
     return conn
 
 
+def api(shared: bool = True):
+    """Decorated function calls the cloud APIs through the connection.
+
+    The connection is held shared unless the function tears it down, and the
+    call is traced as an API span.
+    """
+
+    def decorator(func):
+        name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        @locks.holds(CONNECTION, shared)
+        def wrapper(*args, **kwargs):
+            with trace.span(name, trace.API):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 @functools.lru_cache()
+@api()
 def region() -> str:
     conn = o7k()
     return conn.identity.find_region(utils.REGION).id
 
 
+@api()
 def ensure_domain(name: str):
     conn = o7k()
     LOG.debug("Ensuring domain %r exists...", name)
@@ -169,23 +226,27 @@ def ensure_domain(name: str):
 
 
 @functools.lru_cache()
+@api()
 def service_domain() -> str:
     conn = o7k()
     return conn.identity.find_domain(SERVICE_DOMAIN).id
 
 
 @functools.lru_cache()
+@api()
 def default_domain() -> str:
     conn = o7k()
     return conn.identity.find_domain("Default").id
 
 
 @functools.lru_cache()
+@api()
 def admin_user():
     conn = o7k()
     return conn.identity.find_user("admin", domain_id=default_domain())
 
 
+@api()
 def ensure_project(name: str, domain: str):
     conn = o7k()
     LOG.debug("Ensuring project %r exists...", name)
@@ -198,6 +259,7 @@ def ensure_project(name: str, domain: str):
 
 
 @functools.lru_cache()
+@api()
 def service_project() -> str:
     conn = o7k()
     return conn.identity.find_project(SERVICE_PROJECT, service_domain()).id
@@ -222,6 +284,7 @@ def ensure_service_account(name: str, type: str, url: str) -> typing.Tuple[str,
     return name, password
 
 
+@api()
 def ensure_user(name, password, domain):
     conn = o7k()
     LOG.debug("Ensuring user %r exists...", name)
@@ -234,11 +297,13 @@ def ensure_user(name, password, domain):
 
 
 @functools.lru_cache()
+@api()
 def admin_role():
     conn = o7k()
     return conn.identity.find_role("admin")
 
 
+@api()
 def ensure_role(name: str):
     conn = o7k()
     LOG.debug("Ensuring role %r exists...", name)
@@ -249,6 +314,7 @@ def ensure_role(name: str):
     return conn.identity.create_role(name=name)
 
 
+@api()
 def ensure_admin(user, project):
     conn = o7k()
     LOG.debug("Ensuring user %r is admin of project %r...", user.name, project)
@@ -256,6 +322,7 @@ def ensure_admin(user, project):
     conn.identity.assign_project_role_to_user(project, user, admin_role().id)
 
 
+@api()
 def ensure_service(name: str, type: str):
     conn = o7k()
     LOG.debug("Ensuring service %r exists...", name)
@@ -279,6 +346,7 @@ def _ensure_endpoint_interface(
     )
 
 
+@api(shared=False)
 def ensure_endpoint(service, url: str):
     conn = o7k()
     LOG.debug("Ensuring endpoints %r exists...", service.name)
@@ -290,6 +358,7 @@ def ensure_endpoint(service, url: str):
     o7k.cache_clear()
 
 
+@api()
 def grant_domain_role(user, role, domain):
     conn = o7k()
     LOG.debug("Granting role %r to user %r...", role, user)
@@ -303,6 +372,7 @@ def grant_domain_role(user, role, domain):
             raise e
 
 
+@api()
 def grant_project_role(user, role, project):
     conn = o7k()
     LOG.debug("Granting role %r to user %r...", role, user)
@@ -314,3 +384,55 @@ def grant_project_role(user, role, project):
             project.assign_role_to_user(conn.identity, user, role)
         else:
             raise e
+
+
+def drop_service_account(name: str):
+    """Drop the service account created by ensure_service_account, if any."""
+    drop_service(name)
+    drop_user(name, service_domain())
+
+
+@api(shared=False)
+def drop_service(name: str):
+    conn = o7k()
+    LOG.debug("Dropping service %r...", name)
+    service = conn.identity.find_service(name, ignore_missing=True)
+    if not service:
+        return
+    for endpoint in conn.identity.endpoints(service_id=service.id):
+        conn.identity.delete_endpoint(endpoint)
+    conn.identity.delete_service(service)
+    # Clear connection after updating endpoints
+    conn.close()
+    o7k.cache_clear()
+
+
+@api()
+def drop_user(name: str, domain: str):
+    conn = o7k()
+    LOG.debug("Dropping user %r...", name)
+    user = conn.identity.find_user(name, domain_id=domain, ignore_missing=True)
+    if user:
+        conn.identity.delete_user(user)
+
+
+@api()
+def drop_domain(name: str):
+    """Drop a domain along with its users and projects."""
+    conn = o7k()
+    LOG.debug("Dropping domain %r...", name)
+    domain = conn.identity.find_domain(name, ignore_missing=True)
+    if not domain:
+        return
+    # Only disabled domains can be deleted
+    conn.identity.update_domain(domain, enabled=False)
+    conn.identity.delete_domain(domain)
+
+
+@api()
+def drop_role(name: str):
+    conn = o7k()
+    LOG.debug("Dropping role %r...", name)
+    role = conn.identity.find_role(name, ignore_missing=True)
+    if role:
+        conn.identity.delete_role(role)
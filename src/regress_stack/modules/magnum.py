@@ -1,9 +1,10 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
+import functools
 import pathlib
 import platform
 
-from regress_stack.core import apt
+from regress_stack.core import profile
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import (
     cinder,
@@ -25,7 +26,6 @@ LOGS = ["/var/log/magnum/"]
 CONF = "/etc/magnum/magnum.conf"
 AUTH_POLICY = "/etc/magnum/keystone_auth_default_policy.json"
 # Containers inside the coreos VM don't have DNS resolution necessarily working right
-URL = f"http://{core_utils.my_ip()}:9511/v1"
 SERVICE = "magnum"
 SERVICE_TYPE = "container-infra"
 MAGNUM_DOMAIN_ADMIN = "magnum_admin"
@@ -122,15 +122,37 @@ AUTH_POLICY_TPL = """
 """
 
 
-def setup():
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:9511/v1"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
+
+
+def provision() -> dict[str, str]:
     db_user, db_pass = mysql.ensure_service(SERVICE)
     rabbit_user, rabbit_pass = rabbitmq.ensure_service(SERVICE)
-    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, URL)
+    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, url())
     domain = keystone.ensure_domain(SERVICE)
     magnum_domain_admin = keystone.ensure_user(
         MAGNUM_DOMAIN_ADMIN, MAGNUM_ADMIN_DOMAIN_PASSWORD, domain.id
     )
     keystone.grant_domain_role(magnum_domain_admin, keystone.admin_role(), domain)
+    return {
+        "db_user": db_user,
+        "db_pass": db_pass,
+        "rabbit_user": rabbit_user,
+        "rabbit_pass": rabbit_pass,
+        "username": username,
+        "password": password,
+    }
+
+
+def configure(provisioned: dict[str, str]):
+    db_user, db_pass = provisioned["db_user"], provisioned["db_pass"]
+    rabbit_user, rabbit_pass = provisioned["rabbit_user"], provisioned["rabbit_pass"]
+    username, password = provisioned["username"], provisioned["password"]
     module_utils.cfg_set(
         CONF,
         (
@@ -162,9 +184,21 @@ def setup():
         ),
     )
     pathlib.Path(AUTH_POLICY).write_text(AUTH_POLICY_TPL)
+
+
+def migrate(provisioned: dict[str, str]):
     core_utils.sudo("magnum-db-manage", ["upgrade"], user=SERVICE)
-    core_utils.restart_service("magnum-api")
-    core_utils.restart_service("magnum-conductor")
+
+
+def services() -> list[str]:
+    return ["magnum-api", "magnum-conductor"]
+
+
+def reset():
+    keystone.drop_domain(SERVICE)
+    keystone.drop_service_account(SERVICE)
+    rabbitmq.drop_service(SERVICE)
+    mysql.drop_service(SERVICE)
 
 
 COREOS_38 = "38.20230806.3.0"
@@ -178,13 +212,10 @@ def configure_tempest(tempest_conf: pathlib.Path):
 
     tempest_conf_dir = tempest_conf.parent
 
-    version = apt.get_pkg_version(CONDUCTOR)
-
-    coreos_version = None
-
-    if version is None or version >= "17":
+    gates = profile.current()
+    if gates.magnum_coreos_38:
         coreos_version = COREOS_38
-    elif "17" > version >= "14":
+    elif gates.magnum_coreos_35:
         coreos_version = COREOS_35
     else:
         coreos_version = COREOS_31
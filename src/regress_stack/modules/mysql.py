@@ -24,6 +24,10 @@ GRANT_USER = """ GRANT ALL PRIVILEGES ON {name}.* TO '{database}'@'localhost';
 GRANT ALL PRIVILEGES ON {name}.* TO '{database}'@'%';
 """
 
+DROP_USER = """DROP USER IF EXISTS '{name}'@'localhost';
+DROP USER IF EXISTS '{name}'@'%';
+"""
+
 
 def get_host():
     return "localhost"
@@ -44,44 +48,78 @@ def ensure_service(name: str) -> typing.Tuple[str, str]:
     Returns:
         Tuple of (username, password).
     """
+    return core_utils.run_concurrently(aensure_service(name))[0]
+
+
+def ensure_services(*names: str) -> list[typing.Tuple[str, str]]:
+    """Ensure service accounts exist for several services, concurrently.
+
+    Returns:
+        List of (username, password) tuples, in the order of names.
+    """
+    return core_utils.run_concurrently(*(aensure_service(name) for name in names))
+
+
+async def aensure_service(name: str) -> typing.Tuple[str, str]:
     password = "changeme"
 
-    ensure_database(name)
-    ensure_user(name, password)
-    grant_user(name, name)
+    await aensure_database(name)
+    await aensure_user(name, password)
+    await agrant_user(name, name)
     return name, password
 
 
+async def _mysql(query: str) -> str:
+    return (await core_utils.arun("mysql", ["-u", "root", "-e", query])).stdout
+
+
 def ensure_database(name: str):
     """Ensure that a database exists."""
+    core_utils.run_concurrently(aensure_database(name))
+
+
+async def aensure_database(name: str):
     # check if exists
     LOG.debug("Checking if database %r exists...", name)
     tpl = """SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = '{database}';"""
-    databases = core_utils.run("mysql", ["-u", "root", "-e", tpl.format(database=name)])
+    databases = await _mysql(tpl.format(database=name))
     if databases:
         LOG.debug("Database %r already exists.", name)
         return
     LOG.debug("Database %r does not exist. Creating...", name)
-    core_utils.run("mysql", ["-u", "root", "-e", "CREATE DATABASE {};".format(name)])
+    await _mysql("CREATE DATABASE {};".format(name))
 
 
 def ensure_user(name, password):
     """Ensure that a user exists."""
+    core_utils.run_concurrently(aensure_user(name, password))
+
+
+async def aensure_user(name, password):
     LOG.debug("Checking if user %r exists...", name)
     tpl = """SELECT User FROM mysql.user WHERE User = '{name}';"""
-    users = core_utils.run("mysql", ["-u", "root", "-e", tpl.format(name=name)])
+    users = await _mysql(tpl.format(name=name))
     if users:
         LOG.debug("User %r already exists.", name)
         return
     LOG.debug("User %r does not exist. Creating...", name)
-    core_utils.run(
-        "mysql", ["-u", "root", "-e", CREATE_USER.format(name=name, password=password)]
-    )
+    await _mysql(CREATE_USER.format(name=name, password=password))
 
 
 def grant_user(name, database):
     """Grant user access to a database."""
+    core_utils.run_concurrently(agrant_user(name, database))
+
+
+async def agrant_user(name, database):
     LOG.debug("Granting user %r access to database %r...", name, database)
+    await _mysql(GRANT_USER.format(name=name, database=database))
+
+
+def drop_service(name: str):
+    """Drop the database and user of a service account, if they exist."""
+    LOG.debug("Dropping database and user %r...", name)
     core_utils.run(
-        "mysql", ["-u", "root", "-e", GRANT_USER.format(name=name, database=database)]
+        "mysql", ["-u", "root", "-e", "DROP DATABASE IF EXISTS {};".format(name)]
     )
+    core_utils.run("mysql", ["-u", "root", "-e", DROP_USER.format(name=name)])
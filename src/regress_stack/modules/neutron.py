@@ -7,7 +7,7 @@ import ipaddress
 import logging
 import time
 
-from regress_stack.core import apt as core_apt
+from regress_stack.core import profile
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import keystone, mysql, ovn, rabbitmq
 from regress_stack.modules import utils as module_utils
@@ -22,23 +22,25 @@ LOGS = ["/var/log/neutron/"]
 CONF = "/etc/neutron/neutron.conf"
 METADATA_AGENT_CONF = "/etc/neutron/neutron_ovn_metadata_agent.ini"
 ML2_CONF = "/etc/neutron/plugins/ml2/ml2_conf.ini"
-URL = f"http://{core_utils.my_ip()}:9696/"
 
 METADATA_SECRET = "bonjour"
 
 EXTERNAL_NETWORK = "external-network"
 
-NEUTRON_SPLIT_SERVICES_VERSION = "26.0.0"
+
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:9696/"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
 
 
 def determine_packages(no_tempest: bool = False) -> list[str]:
     """Determine the packages to install for this module."""
 
     packages = copy.deepcopy(_BASE_PACKAGES)
-    if (
-        core_apt.PkgVersionCompare("python3-neutron", candidate=True, upstream=True)
-        >= NEUTRON_SPLIT_SERVICES_VERSION
-    ):
+    if profile.current().neutron_split_packages:
         packages += ["neutron-rpc-server", "neutron-api", "neutron-periodic-workers"]
     else:
         packages += ["neutron-server"]
@@ -46,17 +48,28 @@ def determine_packages(no_tempest: bool = False) -> list[str]:
     return packages
 
 
-def setup():
+def provision() -> dict[str, str]:
+    db_user, db_pass = mysql.ensure_service("neutron")
+    rabbit_user, rabbit_pass = rabbitmq.ensure_service("neutron")
+    username, password = keystone.ensure_service_account("neutron", "network", url())
+    return {
+        "db_user": db_user,
+        "db_pass": db_pass,
+        "rabbit_user": rabbit_user,
+        "rabbit_pass": rabbit_pass,
+        "username": username,
+        "password": password,
+    }
+
+
+def configure(provisioned: dict[str, str]):
     # mask neutron-server if running flamingo.
-    if (
-        core_apt.PkgVersionCompare("python3-neutron", upstream=True)
-        >= NEUTRON_SPLIT_SERVICES_VERSION
-    ):
+    if profile.current().neutron_split_services:
         core_utils.mask_server("neutron-server")
 
-    db_user, db_pass = mysql.ensure_service("neutron")
-    rabbit_user, rabbit_pass = rabbitmq.ensure_service("neutron")
-    username, password = keystone.ensure_service_account("neutron", "network", URL)
+    db_user, db_pass = provisioned["db_user"], provisioned["db_pass"]
+    rabbit_user, rabbit_pass = provisioned["rabbit_user"], provisioned["rabbit_pass"]
+    username, password = provisioned["username"], provisioned["password"]
     module_utils.cfg_set(
         CONF,
         (
@@ -118,8 +131,8 @@ def setup():
         *module_utils.dict_to_cfg_set_args(
             "ovn",
             {
-                "ovn_nb_connection": ovn.OVNNB_CONNECTION,
-                "ovn_sb_connection": ovn.OVNSB_CONNECTION,
+                "ovn_nb_connection": ovn.ovnnb_connection(),
+                "ovn_sb_connection": ovn.ovnsb_connection(),
                 "ovn_l3_scheduler": "leastloaded",
                 "ovn_metadata_enabled": "true",
                 "enable_distributed_floating_ip": "true",
@@ -131,21 +144,23 @@ def setup():
         METADATA_AGENT_CONF,
         ("DEFAULT", "nova_metadata_host", core_utils.fqdn()),
         ("DEFAULT", "metadata_proxy_shared_secret", METADATA_SECRET),
-        ("ovs", "ovsdb_connection", ovn.OVSDB_CONNECTION),
-        ("ovn", "ovn_sb_connection", ovn.OVNSB_CONNECTION),
+        ("ovs", "ovsdb_connection", ovn.ovsdb_connection()),
+        ("ovn", "ovn_sb_connection", ovn.ovnsb_connection()),
     )
+
+
+def migrate(provisioned: dict[str, str]):
     core_utils.sudo(
         "neutron-db-manage",
         ["--config-file", CONF, "--config-file", ML2_CONF, "upgrade", "head"],
         user="neutron",
     )
 
+
+def services() -> list[str]:
     # OpenStack 2025.2 (Flamingo) introduced the neutron-rpc-server daemon and
     # deprecated neutron-server.
-    if (
-        core_apt.PkgVersionCompare("python3-neutron", upstream=True)
-        >= NEUTRON_SPLIT_SERVICES_VERSION
-    ):
+    if profile.current().neutron_split_services:
         neutron_daemons = [
             "apache2",  # neutron-api runs under apache2 as a WSGI application
             "neutron-rpc-server",
@@ -155,11 +170,10 @@ def setup():
         neutron_daemons = [
             "neutron-server",
         ]
+    return [*neutron_daemons, "neutron-ovn-metadata-agent"]
 
-    for _daemon in neutron_daemons:
-        core_utils.restart_service(_daemon)
-    core_utils.restart_service("neutron-ovn-metadata-agent")
 
+def post():
     # wait for neutron-server to accept http connections
     for _ in range(10):
         try:
@@ -173,6 +187,13 @@ def setup():
             raise e
 
 
+def reset():
+    keystone.drop_service_account("neutron")
+    rabbitmq.drop_service("neutron")
+    mysql.drop_service("neutron")
+
+
+@keystone.api()
 def ensure_public_network():
     """"""
     conn = keystone.o7k()
@@ -208,11 +229,13 @@ def ensure_public_network():
 
 
 @functools.lru_cache()
+@keystone.api()
 def public_network():
     conn = keystone.o7k()
     return conn.network.find_network(EXTERNAL_NETWORK)
 
 
+@keystone.api()
 def ensure_network(name: str, project: str):
     conn = keystone.o7k()
     LOG.debug("Ensuring network %r exists...", name)
@@ -223,6 +246,7 @@ def ensure_network(name: str, project: str):
     return conn.network.create_network(name=name, project_id=project)
 
 
+@keystone.api()
 def ensure_subnet(name: str, network, cidr: str):
     conn = keystone.o7k()
     LOG.debug("Ensuring subnet %r exists...", name)
@@ -238,6 +262,7 @@ def ensure_subnet(name: str, network, cidr: str):
     )
 
 
+@keystone.api()
 def ensure_router(name: str, project):
     conn = keystone.o7k()
     LOG.debug("Ensuring router %r exists...", name)
@@ -252,6 +277,7 @@ def ensure_router(name: str, project):
     )
 
 
+@keystone.api()
 def ensure_subnet_router(subnet, router):
     conn = keystone.o7k()
     LOG.debug("Ensuring subnet %r is attached to router %r...", subnet.name, router)
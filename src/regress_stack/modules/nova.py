@@ -1,6 +1,7 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import json
 import logging
 import os
@@ -9,7 +10,8 @@ import stat
 import subprocess
 import time
 
-from regress_stack.core import apt as core_apt
+from regress_stack.core import checkpoint
+from regress_stack.core import profile
 from regress_stack.core import utils as core_utils
 from regress_stack.modules import (
     ceph,
@@ -46,12 +48,10 @@ BASE_PACKAGES = [
 LOG = logging.getLogger(__name__)
 
 CONF = "/etc/nova/nova.conf"
-URL = f"http://{core_utils.my_ip()}:8774/v2.1"
 NOVA_CEPH_UUID = pathlib.Path("/etc/nova/ceph_uuid")
 SERVICE = "nova"
 SERVICE_TYPE = "compute"
 
-NOVA_APACHE_API_VERSION = "32.0.0"
 NOVA_METADATA_SITE = pathlib.Path(
     "/etc/apache2/sites-available/regress-stack-nova-metadata.conf"
 )
@@ -65,17 +65,59 @@ NOVA_PRIVSEP_HELPER = (
 )
 
 
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:8774/v2.1"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
+
+
 def determine_packages(no_tempest: bool = False) -> list[str]:
     return list(BASE_PACKAGES)
 
 
-def setup():
-    db_user, db_pass = mysql.ensure_service(SERVICE)
-    db_api_user, db_api_pass = mysql.ensure_service("nova_api")
-    db_cell0_user, db_cell0_pass = mysql.ensure_service("nova_cell0")
-    rabbit_user, rabbit_pass = rabbitmq.ensure_service(SERVICE)
-    username, password = keystone.ensure_service_account(SERVICE, SERVICE_TYPE, URL)
-    module_utils.cfg_set(
+def provision() -> dict[str, str]:
+    # The three databases are independent, provision them concurrently.
+    (
+        (db_user, db_pass),
+        (db_api_user, db_api_pass),
+        (db_cell0_user, db_cell0_pass),
+    ) = checkpoint.step(
+        "databases", mysql.ensure_services, SERVICE, "nova_api", "nova_cell0"
+    )
+    rabbit_user, rabbit_pass = checkpoint.step(
+        "rabbitmq", rabbitmq.ensure_service, SERVICE
+    )
+    username, password = checkpoint.step(
+        "service account",
+        keystone.ensure_service_account,
+        SERVICE,
+        SERVICE_TYPE,
+        url(),
+    )
+    return {
+        "db_user": db_user,
+        "db_pass": db_pass,
+        "db_api_user": db_api_user,
+        "db_api_pass": db_api_pass,
+        "db_cell0_user": db_cell0_user,
+        "db_cell0_pass": db_cell0_pass,
+        "rabbit_user": rabbit_user,
+        "rabbit_pass": rabbit_pass,
+        "username": username,
+        "password": password,
+    }
+
+
+def configure(provisioned: dict[str, str]):
+    db_user, db_pass = provisioned["db_user"], provisioned["db_pass"]
+    db_api_user, db_api_pass = provisioned["db_api_user"], provisioned["db_api_pass"]
+    rabbit_user, rabbit_pass = provisioned["rabbit_user"], provisioned["rabbit_pass"]
+    username, password = provisioned["username"], provisioned["password"]
+    checkpoint.step(
+        "config",
+        module_utils.cfg_set,
         CONF,
         (
             "database",
@@ -140,62 +182,87 @@ def setup():
                 "virt_type": virt_type(),
             },
         ),
-        ("os_vif_ovs", "ovsdb_connection", ovn.OVSDB_CONNECTION),
+        ("os_vif_ovs", "ovsdb_connection", ovn.ovsdb_connection()),
     )
-    _ensure_questing_compat()
+    checkpoint.step("questing compat", _ensure_questing_compat)
 
     if ceph.installed() and cinder.installed():
-        pool = ceph.ensure_pool(cinder.VOLUME_POOL)
-        module_utils.cfg_set(
-            CONF,
-            *module_utils.dict_to_cfg_set_args(
-                "libvirt",
-                {
-                    "virt_type": virt_type(),
-                    "rbd_user": pool,
-                    "rbd_secret_uuid": ensure_libvirt_ceph_secret(),
-                    "images_rbd_pool": pool,
-                },
-            ),
-            *module_utils.dict_to_cfg_set_args(
-                "cinder",
-                {
-                    "service_type": cinder.SERVICE_TYPE,
-                    "service_name": cinder.SERVICE,
-                    "region_name": utils.REGION,
-                    "volume_api_version": "3",
-                },
-            ),
-        )
-
-    core_utils.sudo("nova-manage", ["api_db", "sync"], user="nova")
-    core_utils.sudo(
-        "nova-manage",
-        [
-            "cell_v2",
-            "map_cell0",
-            "--database_connection",
-            mysql.connection_string("nova_cell0", db_cell0_user, db_cell0_pass),
-        ],
-        user="nova",
+        checkpoint.step("ceph", _configure_ceph)
+
+
+def migrate(provisioned: dict[str, str]):
+    checkpoint.step("api_db sync", _nova_manage, "api_db", "sync")
+    checkpoint.step(
+        "map_cell0",
+        _nova_manage,
+        "cell_v2",
+        "map_cell0",
+        "--database_connection",
+        mysql.connection_string(
+            "nova_cell0", provisioned["db_cell0_user"], provisioned["db_cell0_pass"]
+        ),
     )
-    list_cells = core_utils.sudo("nova-manage", ["cell_v2", "list_cells"], user="nova")
-    if " cell1 " not in list_cells:
-        core_utils.sudo(
-            "nova-manage", ["cell_v2", "create_cell", "--name=cell1"], user="nova"
-        )
-    core_utils.sudo("nova-manage", ["db", "sync"], user="nova")
+    checkpoint.step("create_cell", _ensure_cell1)
+    checkpoint.step("db sync", _nova_manage, "db", "sync")
 
+
+def services() -> list[str]:
     nova_daemons = ["nova-api", "nova-scheduler", "nova-conductor", "nova-compute"]
 
     if _api_runs_under_apache():
         nova_daemons.remove("nova-api")
         # nova-api runs under apache2 as a WSGI application
         nova_daemons.insert(0, "apache2")
+    return nova_daemons
+
+
+def post():
+    checkpoint.step("discover_hosts", _discover_hosts)
+
+
+def reset():
+    drop_libvirt_ceph_secret()
+    keystone.drop_service_account(SERVICE)
+    rabbitmq.drop_service(SERVICE)
+    for database in (SERVICE, "nova_api", "nova_cell0"):
+        mysql.drop_service(database)
+
+
+def _nova_manage(*args: str) -> str:
+    return core_utils.sudo("nova-manage", list(args), user="nova")
+
+
+def _ensure_cell1() -> None:
+    if " cell1 " not in _nova_manage("cell_v2", "list_cells"):
+        _nova_manage("cell_v2", "create_cell", "--name=cell1")
 
-    for _daemon in nova_daemons:
-        core_utils.restart_service(_daemon)
 
+def _configure_ceph() -> None:
+    pool = ceph.ensure_pool(cinder.VOLUME_POOL)
+    module_utils.cfg_set(
+        CONF,
+        *module_utils.dict_to_cfg_set_args(
+            "libvirt",
+            {
+                "virt_type": virt_type(),
+                "rbd_user": pool,
+                "rbd_secret_uuid": ensure_libvirt_ceph_secret(),
+                "images_rbd_pool": pool,
+            },
+        ),
+        *module_utils.dict_to_cfg_set_args(
+            "cinder",
+            {
+                "service_type": cinder.SERVICE_TYPE,
+                "service_name": cinder.SERVICE,
+                "region_name": utils.REGION,
+                "volume_api_version": "3",
+            },
+        ),
+    )
+
+
+def _discover_hosts() -> None:
     # Give some time for nova-compute to be up before discovering hosts
     for _ in range(25):
         output = core_utils.sudo(
@@ -210,10 +277,7 @@ def setup():
 
 
 def _api_runs_under_apache() -> bool:
-    return (
-        core_apt.PkgVersionCompare("python3-nova", upstream=True)
-        >= NOVA_APACHE_API_VERSION
-    )
+    return profile.current().nova_api_under_apache
 
 
 def _ensure_questing_compat() -> None:
@@ -423,6 +487,18 @@ def ensure_libvirt_ceph_secret() -> str:
     return secret_uuid
 
 
+def drop_libvirt_ceph_secret():
+    if not ceph.RBD_UUID.exists():
+        return
+    secret_uuid = ceph.rbd_uuid()
+    try:
+        core_utils.run("virsh", ["secret-get-value", secret_uuid])
+    except subprocess.CalledProcessError:
+        return
+    core_utils.run("virsh", ["secret-undefine", secret_uuid])
+
+
+@keystone.api()
 def ensure_flavor(name: str, ram: int, vcpus: int, disk: int):
     """Ensure a flavor exists."""
     conn = keystone.o7k()
@@ -1,14 +1,13 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import ipaddress
 import logging
 import pathlib
 import re
 import subprocess
 
-import pyroute2
-
 from regress_stack.core import utils as core_utils
 
 LOG = logging.getLogger(__name__)
@@ -23,36 +22,72 @@ PACKAGES = [
 EXTERNAL_BRIDGE = "br-ex"
 EXTERNAL_CIDR = "10.127.147.0/24"
 
-OVN_ENCAP_IP = core_utils.my_ip()
+SYSTEM_ID = "/etc/openvswitch/system-id.conf"
+
+
+def ovn_encap_ip() -> str:
+    return core_utils.my_ip()
+
+
 # OVSDB_CONNECTION = "unix:/var/run/openvswitch/db.sock"
-OVSDB_CONNECTION = f"tcp:{core_utils.my_ip()}:6640"
-OVNNB_CONNECTION = f"tcp:{core_utils.my_ip()}:6641"
-OVNSB_CONNECTION = f"tcp:{core_utils.my_ip()}:6642"
+@functools.lru_cache()
+def ovsdb_connection() -> str:
+    return f"tcp:{core_utils.my_ip()}:6640"
+
+
+@functools.lru_cache()
+def ovnnb_connection() -> str:
+    return f"tcp:{core_utils.my_ip()}:6641"
+
+
+@functools.lru_cache()
+def ovnsb_connection() -> str:
+    return f"tcp:{core_utils.my_ip()}:6642"
 
-SYSTEM_ID = "/etc/openvswitch/system-id.conf"
 
-OVS_CTL_OPTS = f"--ovsdb-server-options='--remote=ptcp:6640:{core_utils.my_ip()}'"
+def ovs_ctl_opts() -> str:
+    return f"--ovsdb-server-options='--remote=ptcp:6640:{core_utils.my_ip()}'"
 
-OVN_CTL_OPTS = f"""--db-nb-addr={core_utils.my_ip()} \
-  --db-sb-addr={core_utils.my_ip()} \
-  --db-nb-cluster-local-addr={core_utils.my_ip()} \
-  --db-sb-cluster-local-addr={core_utils.my_ip()} \
+
+def ovn_ctl_opts() -> str:
+    my_ip = core_utils.my_ip()
+    return f"""--db-nb-addr={my_ip} \
+  --db-sb-addr={my_ip} \
+  --db-nb-cluster-local-addr={my_ip} \
+  --db-sb-cluster-local-addr={my_ip} \
   --db-nb-create-insecure-remote=yes \
   --db-sb-create-insecure-remote=yes \
-  --ovn-northd-nb-db={OVNNB_CONNECTION} \
-  --ovn-northd-sb-db={OVNSB_CONNECTION} \
+  --ovn-northd-nb-db={ovnnb_connection()} \
+  --ovn-northd-sb-db={ovnsb_connection()} \
 """
 
 
-def setup():
-    system_id = core_utils.fqdn()
-    pathlib.Path(SYSTEM_ID).write_text(system_id)
+__getattr__ = core_utils.lazy_constants(
+    OVN_ENCAP_IP=ovn_encap_ip,
+    OVSDB_CONNECTION=ovsdb_connection,
+    OVNNB_CONNECTION=ovnnb_connection,
+    OVNSB_CONNECTION=ovnsb_connection,
+    OVS_CTL_OPTS=ovs_ctl_opts,
+    OVN_CTL_OPTS=ovn_ctl_opts,
+)
+
+
+def configure(provisioned: None):
+    pathlib.Path(SYSTEM_ID).write_text(core_utils.fqdn())
     pathlib.Path("/etc/default/openvswitch-switch").write_text(
-        f"OVS_CTL_OPTS={OVS_CTL_OPTS}"
+        f"OVS_CTL_OPTS={ovs_ctl_opts()}"
+    )
+    pathlib.Path("/etc/default/ovn-central").write_text(
+        f"OVN_CTL_OPTS={ovn_ctl_opts()}"
     )
-    pathlib.Path("/etc/default/ovn-central").write_text(f"OVN_CTL_OPTS={OVN_CTL_OPTS}")
-    core_utils.restart_service("ovn-central")
-    core_utils.restart_service("openvswitch-switch")
+
+
+def services() -> list[str]:
+    return ["ovn-central", "openvswitch-switch"]
+
+
+def post():
+    system_id = core_utils.fqdn()
     core_utils.run(
         "ovs-vsctl",
         [
@@ -65,7 +100,7 @@ def setup():
             "set",
             "open",
             ".",
-            f"external_ids:ovn-encap-ip={OVN_ENCAP_IP}",
+            f"external_ids:ovn-encap-ip={ovn_encap_ip()}",
             "--",
             "set",
             "open",
@@ -80,7 +115,7 @@ def setup():
             "set",
             "open",
             ".",
-            f"external_ids:ovn-remote={OVNSB_CONNECTION}",
+            f"external_ids:ovn-remote={ovnsb_connection()}",
         ],
     )
     core_utils.run(
@@ -117,10 +152,17 @@ def setup():
     _add_iptable_postrouting_rule(EXTERNAL_CIDR, "ovn-external-bridge")
 
 
+def reset():
+    core_utils.run("ovs-vsctl", ["--if-exists", "del-br", EXTERNAL_BRIDGE])
+    _delete_iptable_postrouting_rule(EXTERNAL_CIDR, "ovn-external-bridge")
+
+
 def configure_external_bridge():
     network = ipaddress.ip_network(EXTERNAL_CIDR)
     ip = str(next(network.hosts()))
     gw_ip = ip + "/" + str(network.prefixlen)
+    import pyroute2
+
     with pyroute2.NDB() as ndb:
         with ndb.interfaces[EXTERNAL_BRIDGE] as iface:
             try:
@@ -130,14 +172,8 @@ def configure_external_bridge():
                 iface.set(state="up")
 
 
-def _add_iptable_postrouting_rule(cidr: str, comment: str) -> None:
-    """Add postrouting iptable rule.
-
-    Add new postiprouting iptable rule, if it does not exist, to allow traffic
-    for cidr network.
-    """
-    executable = "iptables-legacy"
-    rule_def = [
+def _postrouting_rule(cidr: str, comment: str) -> list[str]:
+    return [
         "POSTROUTING",
         "-w",
         "-t",
@@ -151,6 +187,16 @@ def _add_iptable_postrouting_rule(cidr: str, comment: str) -> None:
         "--comment",
         comment,
     ]
+
+
+def _add_iptable_postrouting_rule(cidr: str, comment: str) -> None:
+    """Add postrouting iptable rule.
+
+    Add new postiprouting iptable rule, if it does not exist, to allow traffic
+    for cidr network.
+    """
+    executable = "iptables-legacy"
+    rule_def = _postrouting_rule(cidr, comment)
     found = False
     try:
         core_utils.run(executable, ["--check", *rule_def])
@@ -168,3 +214,16 @@ def _add_iptable_postrouting_rule(cidr: str, comment: str) -> None:
     if not found:
         LOG.debug(f"Adding postrouting iptable rule for {cidr}")
         core_utils.run(executable, ["--append", *rule_def])
+
+
+def _delete_iptable_postrouting_rule(cidr: str, comment: str) -> None:
+    """Delete postrouting iptable rule, if it exists."""
+    try:
+        core_utils.run(
+            "iptables-legacy", ["--delete", *_postrouting_rule(cidr, comment)]
+        )
+    except subprocess.CalledProcessError as e:
+        # --delete has an RC of 1 if the rule does not exist
+        if e.returncode != 1:
+            raise
+        LOG.debug(f"No postrouting iptable rule for {cidr}")
@@ -1,6 +1,7 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import functools
 import logging
 
 from regress_stack.core import utils as core_utils
@@ -17,12 +18,26 @@ LOGS = [
 ]
 
 CONF = "/etc/placement/placement.conf"
-URL = f"http://{core_utils.my_ip()}:8778/"
 
 
-def setup():
+@functools.lru_cache()
+def url() -> str:
+    return f"http://{core_utils.my_ip()}:8778/"
+
+
+__getattr__ = core_utils.lazy_constants(URL=url)
+
+
+def provision() -> tuple[str, str, str, str]:
     db_user, db_pass = mysql.ensure_service("placement")
-    username, password = keystone.ensure_service_account("placement", "placement", URL)
+    username, password = keystone.ensure_service_account(
+        "placement", "placement", url()
+    )
+    return db_user, db_pass, username, password
+
+
+def configure(provisioned: tuple[str, str, str, str]):
+    db_user, db_pass, username, password = provisioned
     core_utils.run(
         "sed",
         [
@@ -44,5 +59,16 @@ def setup():
             "keystone_authtoken", keystone.authtoken_service(username, password)
         ),
     )
+
+
+def migrate(provisioned: tuple[str, str, str, str]):
     core_utils.sudo("placement-manage", ["db", "sync"], user="placement")
-    core_utils.restart_apache()
+
+
+def services() -> list[str]:
+    return ["apache2"]
+
+
+def reset():
+    keystone.drop_service_account("placement")
+    mysql.drop_service("placement")
@@ -4,6 +4,7 @@
 import logging
 import typing
 
+from regress_stack.core import fingerprint
 from regress_stack.core import utils as core_utils
 
 LOG = logging.getLogger(__name__)
@@ -21,6 +22,7 @@ def setup():
 
 
 def cfg_set(config_file: str, *args: typing.Tuple[str, str, str]) -> None:
+    fingerprint.record_config(config_file, *args)
     for section, key, value in args:
         core_utils.run("crudini", ["--set", config_file, section, key, value])
 
@@ -1,7 +1,11 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import json
+
 from click.testing import CliRunner
+
+from regress_stack.core.apt import PackageState
 from regress_stack.cli.packages import packages
 
 
@@ -98,3 +102,39 @@ def test_packages_command_no_tempest():
     output_packages = result.output.strip().split()
     assert "python3-tempestconf" in output_packages
     assert "tempest" not in output_packages
+
+
+def test_packages_command_multiple_targets():
+    """Test that packages command accepts several targets and exclusions."""
+    runner = CliRunner()
+    result = runner.invoke(packages, ["glance", "placement", "--exclude", "ceph"])
+    assert result.exit_code == 0
+
+    output_packages = result.output.strip().split()
+    assert "glance-api" in output_packages
+    assert "placement-api" in output_packages
+    assert "keystone" in output_packages
+    assert "ceph-mon" not in output_packages
+    assert "nova-api" not in output_packages
+
+
+def test_packages_command_json(monkeypatch):
+    """Test that the JSON report resolves every package once."""
+    calls = []
+
+    def package_states(pkgs, candidate=True):
+        calls.append(list(pkgs))
+        return {pkg: PackageState(pkg, None, "1.0") for pkg in pkgs}
+
+    monkeypatch.setattr("regress_stack.core.apt.package_states", package_states)
+    runner = CliRunner()
+    result = runner.invoke(packages, ["--json", "utils"])
+    assert result.exit_code == 0
+    assert json.loads(result.output)[-1] == {
+        "name": "crudini",
+        "installed": None,
+        "candidate": "1.0",
+    }
+    assert calls == [
+        ["python3-openstackclient", "python3-tempestconf", "tempest", "crudini"]
+    ]
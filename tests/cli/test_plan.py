@@ -0,0 +1,38 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from regress_stack.cli.packages import packages
+from regress_stack.cli.plan import plan
+from regress_stack.core import apt, metadata, profile
+
+
+@pytest.fixture
+def without_python_apt(monkeypatch):
+    """Make python-apt unimportable, and drop what was planned before."""
+    monkeypatch.setitem(sys.modules, "apt", None)
+    monkeypatch.setattr(apt, "apt", None)
+    monkeypatch.setattr(apt, "APT_CACHE", None)
+    monkeypatch.setattr(apt, "CACHE_OPENS", 0)
+    monkeypatch.setattr(metadata, "_METADATA_REGISTRY", {})
+    monkeypatch.setattr(profile, "_PROFILES", {})
+
+
+def test_plan_without_python_apt(without_python_apt):
+    runner = CliRunner()
+    result = runner.invoke(plan, ["--profile"])
+    assert result.exit_code == 0, result.output
+    assert "Execution Order:" in result.output
+    assert "(installed python3-neutron >= 26.0.0)" in result.output
+    assert apt.CACHE_OPENS == 0
+
+
+def test_packages_without_python_apt(without_python_apt):
+    runner = CliRunner()
+    result = runner.invoke(packages, ["neutron"])
+    assert result.exit_code == 0, result.output
+    assert "neutron-server" in result.output.split()
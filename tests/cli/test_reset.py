@@ -0,0 +1,68 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import types
+
+import networkx as nx
+from click.testing import CliRunner
+
+from regress_stack.cli import reset as reset_cli
+from regress_stack.core import fingerprint, utils
+
+
+class FakeComp:
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+
+    def __lt__(self, other):
+        return self.name < other.name
+
+    def __repr__(self):
+        return self.name
+
+
+def test_reset_command(monkeypatch):
+    calls = []
+    utils_mod = FakeComp("utils", types.SimpleNamespace())
+    mysql = FakeComp(
+        "mysql", types.SimpleNamespace(reset=lambda: calls.append("mysql"))
+    )
+    glance = FakeComp(
+        "glance", types.SimpleNamespace(reset=lambda: calls.append("glance"))
+    )
+    graph = nx.DiGraph()
+    graph.add_edges_from([(glance, mysql), (mysql, utils_mod)])
+    monkeypatch.setattr(reset_cli, "get_reset_graph", lambda mod, targets: graph)
+    for mod in graph:
+        utils.mark_setup(mod.name)
+        fingerprint.record(mod.name, "abc", {})
+
+    result = CliRunner().invoke(reset_cli.reset, ["-j", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert calls == ["glance", "mysql"]
+    assert not any(utils.is_setup_done(mod.name) for mod in graph)
+    assert fingerprint.load() == {}
+
+
+def test_reset_skips_modules_not_set_up(monkeypatch):
+    calls = []
+    ceph = FakeComp("ceph", types.SimpleNamespace(reset=lambda: calls.append("ceph")))
+    graph = nx.DiGraph()
+    graph.add_node(ceph)
+    monkeypatch.setattr(reset_cli, "get_reset_graph", lambda mod, targets: graph)
+    fingerprint.record("ceph", "abc", {})
+
+    result = CliRunner().invoke(reset_cli.reset, [])
+
+    assert result.exit_code == 0, result.output
+    assert calls == []
+    assert fingerprint.load() == {}
+
+
+def test_reset_rejects_invalid_jobs():
+    for jobs in ("0", "-1", "many"):
+        result = CliRunner().invoke(reset_cli.reset, ["--jobs", jobs])
+        assert result.exit_code == 2
+        assert "neither 'auto' nor a positive integer" in result.output
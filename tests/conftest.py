@@ -0,0 +1,12 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def regress_stack_dir(tmp_path, monkeypatch):
+    """Keep state written by regress-stack out of the host."""
+    state_dir = tmp_path / "regress-stack"
+    monkeypatch.setattr("regress_stack.core.utils.REGRESS_STACK_DIR", state_dir)
+    yield state_dir
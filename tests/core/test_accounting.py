@@ -0,0 +1,69 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import subprocess
+
+import pytest
+
+from regress_stack.core import accounting, locks, utils
+
+
+def test_run_is_accounted():
+    with locks.owner("mod"):
+        assert utils.run("echo", ["hello"]) == "hello\n"
+    with pytest.raises(subprocess.CalledProcessError):
+        utils.run("sh", ["-c", "echo oops >&2; exit 3"])
+
+    ok, failed = accounting.load()
+    assert ok["argv"] == ["echo", "hello"]
+    assert ok["module"] == "mod"
+    assert (ok["exit_code"], ok["stdout_bytes"], ok["stderr_bytes"]) == (0, 6, 0)
+    assert failed["module"] == ""
+    assert (failed["exit_code"], failed["stderr_bytes"]) == (3, 5)
+
+
+def test_load_last_session(monkeypatch):
+    monkeypatch.setattr(accounting, "SESSION", "900-1")
+    accounting.record(["true"], 0.1, 0)
+    monkeypatch.setattr(accounting, "SESSION", "1000-1")
+    accounting.record(["false"], 0.2, 1)
+    assert [e["argv"] for e in accounting.load()] == [["false"]]
+    assert len(accounting.load(all_sessions=True)) == 2
+
+
+def test_old_sessions_are_pruned(monkeypatch):
+    monkeypatch.setattr(accounting, "SESSIONS_KEPT", 2)
+    for started in (98, 99, 100):
+        monkeypatch.setattr(accounting, "SESSION", f"{started}-1")
+        accounting.record(["true"], 0.1, 0)
+        accounting.record(["true"], 0.1, 0)
+    assert [e["session"] for e in accounting.load(all_sessions=True)] == (
+        ["99-1"] * 2 + ["100-1"] * 2
+    )
+
+
+def test_command():
+    assert accounting.command(["/usr/bin/crudini", "--set"]) == "crudini"
+    assert accounting.command(["sudo", "--user", "nova", "nova-manage"]) == (
+        "nova-manage"
+    )
+    assert accounting.command(["ceph osd pool create"]) == "ceph"
+
+
+def test_report():
+    with locks.owner("nova"):
+        accounting.record(["crudini", "--set"], 0.5, 0, 0, 0)
+        accounting.record(["crudini", "--set"], 0.5, 1, 0, 0)
+    accounting.record(["sudo", "mysql"], 2.0, 0, 0, 0)
+    entries = accounting.load()
+    by_command = accounting.aggregate(
+        entries, lambda entry: accounting.command(entry["argv"])
+    )
+    assert by_command == [
+        accounting.Aggregate("mysql", 1, 2.0, 0),
+        accounting.Aggregate("crudini", 2, 1.0, 1),
+    ]
+    lines = accounting.report(entries)
+    assert lines[0] == "3 subprocess(es), 3.00s in total"
+    assert "By module:" in lines
+    assert any(line.strip().startswith("nova") for line in lines)
@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-only
 
 from types import SimpleNamespace
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock
 
 import pytest
 
@@ -14,12 +14,30 @@ class FakeCache(dict):
         return None
 
 
+@pytest.fixture
+def dpkg_status(tmp_path, monkeypatch):
+    status = tmp_path / "status"
+    status.write_text(
+        "Package: pkg\n"
+        "Status: install ok installed\n"
+        "Version: 3:32.0.0-0ubuntu1.1\n"
+        "\n"
+        "Package: removed\n"
+        "Status: deinstall ok config-files\n"
+        "Version: 1.0\n"
+    )
+    monkeypatch.setattr("regress_stack.core.dpkg.STATUS", status)
+    yield status
+
+
 @pytest.fixture
 def mock_apt(monkeypatch):
     cache = FakeCache()
     apt = Mock(Cache=Mock(return_value=cache))
 
     monkeypatch.setattr("regress_stack.core.apt.apt", apt)
+    monkeypatch.setattr("regress_stack.core.apt.APT_CACHE", None)
+    monkeypatch.setattr("regress_stack.core.apt.CACHE_OPENS", 0)
     yield apt
 
 
@@ -29,19 +47,59 @@ def test_get_cache(mock_apt):
     assert regress_stack.core.apt.APT_CACHE == mock_apt.Cache()
 
 
-def test_pkgs_installed(mock_apt):
-    regress_stack.core.apt.APT_CACHE = None
-    assert regress_stack.core.apt.pkgs_installed(["pkg"]) is False
+def test_cache_is_shared_until_invalidated(mock_apt, monkeypatch):
+    core_apt = regress_stack.core.apt
+    runs = []
+    monkeypatch.setattr(core_apt.utils, "run", lambda cmd, args: runs.append(cmd))
+    mock_apt.Cache()["pkg"] = Mock(candidate=SimpleNamespace(version="1"))
 
-    regress_stack.core.apt.APT_CACHE = None
-    mock_apt.Cache()["pkg"] = Mock(is_installed=True)
+    core_apt.PkgVersionCompare("pkg", candidate=True)
+    core_apt.PkgVersionCompare("pkg", candidate=True)
+    core_apt.package_states(["pkg"])
+    assert core_apt.CACHE_OPENS == 1
+
+    core_apt.add_ppa("ppa:foo/bar")
+    core_apt.PkgVersionCompare("pkg", candidate=True)
+    assert core_apt.CACHE_OPENS == 2
+
+    core_apt.install(["pkg"], only_upgrade=True)
+    core_apt.package_states(["pkg"])
+    assert core_apt.CACHE_OPENS == 3
+    assert runs == ["add-apt-repository", "apt"]
+
+
+def test_package_states(mock_apt):
+    mock_apt.Cache()["pkg"] = Mock(
+        installed=SimpleNamespace(version="1"),
+        candidate=SimpleNamespace(version="2"),
+    )
+    mock_apt.Cache()["new"] = Mock(installed=None, candidate=None)
+    states = regress_stack.core.apt.package_states(["pkg", "new", "missing", "pkg"])
+    assert states == {
+        "pkg": ("pkg", "1", "2"),
+        "new": ("new", None, None),
+        "missing": ("missing", None, None),
+    }
+    assert regress_stack.core.apt.CACHE_OPENS == 1
+
+
+def test_package_states_installed_only(mock_apt, dpkg_status):
+    states = regress_stack.core.apt.package_states(["pkg", "missing"], False)
+    assert states == {
+        "pkg": ("pkg", "3:32.0.0-0ubuntu1.1", None),
+        "missing": ("missing", None, None),
+    }
+    assert regress_stack.core.apt.CACHE_OPENS == 0
+
+
+def test_pkgs_installed(dpkg_status):
     assert regress_stack.core.apt.pkgs_installed(["pkg"]) is True
+    assert regress_stack.core.apt.pkgs_installed(["pkg", "removed"]) is False
+    assert regress_stack.core.apt.pkgs_installed(["missing"]) is False
 
 
-def test_get_upstream_pkg_version(mock_apt):
-    regress_stack.core.apt.APT_CACHE = None
+def test_get_upstream_pkg_version(mock_apt, dpkg_status):
     mock_apt.Cache()["pkg"] = Mock(
-        installed=SimpleNamespace(version="3:32.0.0-0ubuntu1.1"),
         candidate=SimpleNamespace(version="3:33.0.0-0ubuntu1"),
     )
     assert regress_stack.core.apt.get_upstream_pkg_version("pkg") == "32.0.0"
@@ -51,9 +109,8 @@ def test_get_upstream_pkg_version(mock_apt):
     )
 
 
-def test_pkg_version_compare_upstream(mock_apt):
+def test_pkg_version_compare_upstream(mock_apt, dpkg_status):
     mock_apt.Cache()["pkg"] = Mock(
-        installed=SimpleNamespace(version="3:32.0.0-0ubuntu1.1"),
         candidate=SimpleNamespace(version="3:33.0.0-0ubuntu1"),
     )
     assert regress_stack.core.apt.PkgVersionCompare("pkg", upstream=True) >= "32.0.0"
@@ -61,14 +118,12 @@ def test_pkg_version_compare_upstream(mock_apt):
         regress_stack.core.apt.PkgVersionCompare("pkg", candidate=True, upstream=True)
         >= "33.0.0"
     )
+    assert regress_stack.core.apt.CACHE_OPENS == 1
 
 
-def test_pkg_version_compare_missing_installed_version(mock_apt):
-    mock_apt.Cache()["pkg"] = Mock(
-        installed=None, candidate=SimpleNamespace(version="1")
-    )
-    with pytest.raises(ValueError, match="Package pkg is not installed"):
-        regress_stack.core.apt.PkgVersionCompare("pkg")
+def test_pkg_version_compare_missing_installed_version(dpkg_status):
+    with pytest.raises(ValueError, match="Package removed is not installed"):
+        regress_stack.core.apt.PkgVersionCompare("removed")
 
 
 def test_pkg_version_compare_missing_candidate_version(mock_apt):
@@ -78,3 +133,31 @@ def test_pkg_version_compare_missing_candidate_version(mock_apt):
     )
     with pytest.raises(ValueError, match="Package pkg has no candidate version"):
         regress_stack.core.apt.PkgVersionCompare("pkg", candidate=True)
+
+
+def test_install_packages(mock_apt, monkeypatch):
+    core_apt = regress_stack.core.apt
+    cache = mock_apt.Cache()
+    cache["pkg"] = Mock()
+    cache.actiongroup = MagicMock()
+    cache.get_changes = Mock(return_value=[cache["pkg"]])
+
+    def commit(fetch, install):
+        fetch.timings.download["pkg"] = 1.0
+        fetch.timings.add_dpkg("pkg", "unpack", 2.0)
+        fetch.timings.add_dpkg("pkg", "configure", 0.5)
+
+    cache.commit = commit
+    monkeypatch.setattr(
+        core_apt, "_progress", lambda timings: (Mock(timings=timings), Mock())
+    )
+
+    timings = core_apt.install_packages(["pkg"])
+
+    cache["pkg"].mark_install.assert_called_once_with()
+    assert core_apt.APT_CACHE is None
+    assert timings.report()[0] == ("pkg: download 1.00s, unpack 2.00s, configure 0.50s")
+    assert timings.report()[1].startswith("Installed 1 package(s) in ")
+
+    with pytest.raises(ValueError, match="Package missing not found"):
+        core_apt.install_packages(["missing"])
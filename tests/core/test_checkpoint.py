@@ -0,0 +1,112 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+from unittest import mock
+
+import pytest
+
+from regress_stack.core import checkpoint, fingerprint, trace
+
+
+class Boom(Exception):
+    pass
+
+
+def _run(calls, fail_at=None, inputs=("a", "b", "c")):
+    def func(name, value):
+        if name == fail_at:
+            raise Boom(name)
+        calls.append(name)
+        return [name, value]
+
+    return [
+        checkpoint.step(name, func, name, value) for name, value in zip("xyz", inputs)
+    ]
+
+
+def test_step_without_journal():
+    func = mock.Mock(return_value=42)
+    assert checkpoint.step("step", func, 1, key="value") == 42
+    func.assert_called_once_with(1, key="value")
+
+
+def test_resume_at_first_incomplete_step():
+    calls = []
+    with pytest.raises(Boom):
+        with checkpoint.journal("mod"):
+            _run(calls, fail_at="z")
+    assert calls == ["x", "y"]
+
+    calls.clear()
+    with checkpoint.journal("mod"):
+        results = _run(calls)
+    assert calls == ["z"]
+    assert results == [["x", "a"], ["y", "b"], ["z", "c"]]
+
+
+def test_changed_inputs_rerun_following_steps():
+    calls = []
+    with pytest.raises(Boom):
+        with checkpoint.journal("mod"):
+            _run(calls, fail_at="z")
+
+    calls.clear()
+    with checkpoint.journal("mod"):
+        _run(calls, inputs=("a", "changed", "c"))
+    assert calls == ["y", "z"]
+
+
+def test_journal_cleared_on_success(regress_stack_dir):
+    calls = []
+    with checkpoint.journal("mod") as journal:
+        _run(calls)
+        assert journal.path.exists()
+    assert not journal.path.exists()
+
+    calls.clear()
+    with checkpoint.journal("mod"):
+        _run(calls)
+    assert calls == ["x", "y", "z"]
+
+
+def test_result_must_be_serializable():
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        with checkpoint.journal("mod"):
+            checkpoint.step("step", object)
+
+
+def test_skipped_steps_record_their_config():
+    def configure(fail):
+        fingerprint.record_config("/etc/mod.conf", ("DEFAULT", "key", "value"))
+        if fail:
+            raise Boom()
+
+    with pytest.raises(Boom):
+        with checkpoint.journal("mod"):
+            checkpoint.step("config", configure, False)
+            checkpoint.step("fail", configure, True)
+
+    with fingerprint.recording() as config:
+        with checkpoint.journal("mod"):
+            checkpoint.step("config", configure, False)
+    assert config == {"/etc/mod.conf": [("DEFAULT", "key", "value")]}
+
+
+def test_journal_only_readable_by_owner():
+    with checkpoint.using(checkpoint.Journal("mod")) as journal:
+        checkpoint.step("x", lambda: "secret")
+    assert journal.path.stat().st_mode & 0o777 == 0o600
+
+
+def test_steps_are_traced():
+    trace.start()
+    try:
+        with checkpoint.journal("mod"):
+            checkpoint.step("x", lambda: None)
+        checkpoint.step("y", lambda: None)
+    finally:
+        spans = trace.stop()
+    assert [(s.name, s.category) for s in spans] == [
+        ("x", trace.CHECKPOINT),
+        ("y", trace.CHECKPOINT),
+    ]
@@ -0,0 +1,81 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pytest
+
+from regress_stack.core import dpkg
+
+STATUS = """Package: libc6
+Status: install ok installed
+Architecture: amd64
+Version: 2.39-0ubuntu8
+Description: GNU C Library
+ multi-line description
+ Version: not a field
+
+Package: libc6
+Status: install ok installed
+Architecture: i386
+Version: 2.39-0ubuntu8
+
+Package: python3-nova
+Status: install ok half-configured
+Version: 3:32.0.0-0ubuntu1
+
+Package: old
+Status: deinstall ok config-files
+Version: 1.0
+"""
+
+
+def test_installed_versions(tmp_path, monkeypatch):
+    status = tmp_path / "status"
+    status.write_text(STATUS)
+    monkeypatch.setattr(dpkg, "STATUS", status)
+
+    assert dpkg.installed_versions() == {
+        "libc6": "2.39-0ubuntu8",
+        "python3-nova": "3:32.0.0-0ubuntu1",
+    }
+    assert dpkg.installed_version("old") is None
+
+    status.write_text(
+        STATUS + "\nPackage: new\nStatus: install ok installed\nVersion: 2\n"
+    )
+    assert dpkg.installed_version("new") == "2"
+
+
+def test_installed_versions_without_dpkg(tmp_path, monkeypatch):
+    monkeypatch.setattr(dpkg, "STATUS", tmp_path / "missing")
+    assert dpkg.installed_versions() == {}
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [
+        ("1.0", "1.0", 0),
+        ("1.0", "1.0-0", 0),
+        ("1.0", "1.1", -1),
+        ("1.10", "1.9", 1),
+        ("1.0~rc1", "1.0", -1),
+        ("1.0~rc1", "1.0~rc1~1", 1),
+        ("1.0a", "1.0", 1),
+        ("1.0a", "1.0+", -1),
+        ("1:1.0", "2.0", 1),
+        ("3.5.1-1ubuntu1", "3.5.1-1ubuntu1~cloud0", 1),
+        ("3.5.1-0ubuntu1~cloud0", "3.5.1-1ubuntu1~cloud0", -1),
+        ("26.0.0", "26.0.0", 0),
+        ("9.4.0", "17", -1),
+    ],
+)
+def test_version_compare(a, b, expected):
+    result = dpkg.version_compare(a, b)
+    assert (result > 0) - (result < 0) == expected
+    result = dpkg.version_compare(b, a)
+    assert (result > 0) - (result < 0) == -expected
+
+
+def test_upstream_version():
+    assert dpkg.upstream_version("3:32.0.0-0ubuntu1.1") == "32.0.0"
+    assert dpkg.upstream_version("1.2-3-4") == "1.2-3"
+    assert dpkg.upstream_version("17.0.0") == "17.0.0"
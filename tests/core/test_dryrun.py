@@ -0,0 +1,81 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import json
+import subprocess
+import time
+
+import openstack
+
+from regress_stack.core import dryrun
+from regress_stack.core import utils
+
+
+def _setup(path):
+    def setup():
+        cpus = json.loads(utils.run("lscpu", ["-J"]))["lscpu"]
+        utils.sudo("nova-manage", ["db", "sync"], user="nova")
+        conn = openstack.connect()
+        if not conn.identity.find_user("nova", ignore_missing=True):
+            user = conn.identity.create_user(name="nova")
+            conn.identity.assign_role(user.id)
+        path.write_text(str(cpus))
+        subprocess.run(["sudo", "-V"], text=True)
+        for _ in range(3):
+            utils.run("nova-manage", ["cell_v2", "list_hosts"])
+            time.sleep(5)
+        utils.restart_service("nova-api")
+
+    return setup
+
+
+def _details(recorder, name):
+    return [
+        (count, [f"{a.kind} {a.detail}" for a in actions])
+        for actions, count in recorder.module_actions(name)
+    ]
+
+
+def test_run_setup_records_actions(tmp_path):
+    recorder = dryrun.Recorder()
+    target = tmp_path / "written"
+    run = utils.run
+
+    recorder.run_setup("nova", _setup(target))
+
+    assert not target.exists()
+    assert utils.run is run
+    assert _details(recorder, "nova") == [
+        (1, ["run lscpu -J"]),
+        (1, ["sudo (nova) nova-manage db sync"]),
+        (1, ["api conn.identity.find_user('nova', ignore_missing=True)"]),
+        (1, ["api conn.identity.create_user(name='nova')"]),
+        (
+            1,
+            [
+                "api conn.identity.assign_role("
+                "<conn.identity.create_user(name='nova').id>)"
+            ],
+        ),
+        (1, [f"write {target}"]),
+        (1, ["run sudo -V"]),
+        (3, ["run nova-manage cell_v2 list_hosts", "sleep 5s"]),
+        (1, ["restart nova-api"]),
+    ]
+
+
+def test_run_setup_records_errors():
+    recorder = dryrun.Recorder()
+
+    def setup():
+        utils.run("true")
+        raise ValueError("boom")
+
+    recorder.run_setup("failing", setup)
+    recorder.run_setup("other", lambda: utils.run("false"))
+
+    assert _details(recorder, "failing") == [
+        (1, ["run true"]),
+        (1, ["error ValueError: boom"]),
+    ]
+    assert _details(recorder, "other") == [(1, ["run false"])]
@@ -0,0 +1,75 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import threading
+
+import networkx as nx
+import pytest
+
+from regress_stack.core.executor import GraphExecutionError, execute_graph
+
+
+@pytest.fixture
+def graph():
+    """Build the following graph:
+
+    mysql -> keystone -> glance
+    keystone -> placement
+    rabbitmq
+    """
+    graph = nx.DiGraph()
+    graph.add_nodes_from(["mysql", "keystone", "glance", "placement", "rabbitmq"])
+    graph.add_edge("mysql", "keystone")
+    graph.add_edge("keystone", "glance")
+    graph.add_edge("keystone", "placement")
+    return graph
+
+
+def test_execute_graph_respects_dependencies(graph):
+    executed = []
+    lock = threading.Lock()
+
+    def func(node):
+        with lock:
+            executed.append(node)
+
+    execute_graph(graph, func, jobs=4)
+
+    assert sorted(executed) == sorted(graph.nodes)
+    for pred, succ in graph.edges:
+        assert executed.index(pred) < executed.index(succ)
+
+
+def test_execute_graph_runs_independent_nodes_concurrently(graph):
+    # glance and placement only need keystone, they must be able to run at
+    # the same time.
+    barrier = threading.Barrier(2, timeout=5)
+
+    def func(node):
+        if node in ("glance", "placement"):
+            barrier.wait()
+
+    execute_graph(graph, func, jobs=2)
+
+
+def test_execute_graph_cancels_dependents(graph):
+    executed = []
+
+    def func(node):
+        if node == "keystone":
+            raise ValueError("boom")
+        executed.append(node)
+
+    with pytest.raises(GraphExecutionError) as exc_info:
+        execute_graph(graph, func, jobs=2)
+
+    assert set(exc_info.value.failed) == {"keystone"}
+    assert isinstance(exc_info.value.failed["keystone"], ValueError)
+    assert exc_info.value.cancelled == {"glance", "placement"}
+    assert sorted(executed) == ["mysql", "rabbitmq"]
+
+
+def test_execute_graph_circular_dependency():
+    graph = nx.DiGraph([("a", "b"), ("b", "a")])
+    with pytest.raises(RuntimeError, match="Circular dependency detected!"):
+        execute_graph(graph, lambda node: None)
@@ -0,0 +1,146 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+"""Compare filter_graph against the original fixed-point algorithm.
+
+Run as a module to benchmark both implementations on synthetic graphs:
+
+    python -m tests.core.test_filter_graph
+"""
+
+import random
+import time
+
+import networkx as nx
+import pytest
+
+from regress_stack.core.modules import filter_graph
+
+
+def reference_filter_graph(G: nx.DiGraph) -> nx.DiGraph:
+    """Original implementation, re-scanning the whole graph until stable."""
+    nodes_to_remove = {
+        n for n, data in G.nodes(data=True) if not data.get("installed", False)
+    }
+
+    def is_only_optional(n):
+        predecessors = list(G.predecessors(n))
+        if not predecessors:
+            return False
+
+        return all(
+            G.get_edge_data(pred, n).get("optional", False) for pred in predecessors
+        )
+
+    def is_missing_required(n, to_remove: set):
+        predecessors = set(G.predecessors(n))
+        if not predecessors:
+            return False
+
+        predecessors = {
+            pred
+            for pred in predecessors
+            if not G.get_edge_data(pred, n, {}).get("optional", False)
+        }
+        return bool(predecessors.intersection(to_remove))
+
+    changed = True
+    while changed:
+        changed = False
+        for node in G.nodes:
+            if node not in nodes_to_remove and (
+                is_only_optional(node) or is_missing_required(node, nodes_to_remove)
+            ):
+                nodes_to_remove.add(node)
+                changed = True
+
+    G.remove_nodes_from(nodes_to_remove)
+
+    return G
+
+
+def synthetic_graph(
+    size: int,
+    seed: int,
+    max_dependencies: int = 4,
+    optional_ratio: float = 0.3,
+    uninstalled_ratio: float = 0.05,
+) -> nx.DiGraph:
+    """Generate a random module DAG with mixed optional/required edges."""
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    # Shuffle the node labels so insertion order is not a topological order.
+    labels = list(range(size))
+    rng.shuffle(labels)
+    for i, label in enumerate(labels):
+        graph.add_node(label, installed=rng.random() >= uninstalled_ratio)
+        count = min(i, rng.randint(0, max_dependencies))
+        for dep in rng.sample(labels[:i], count):
+            graph.add_edge(dep, label, optional=rng.random() < optional_ratio)
+    return graph
+
+
+def chain_graph(size: int) -> nx.DiGraph:
+    """Generate a dependency chain whose root is not installed.
+
+    Nodes are inserted from the leaf up, the worst case for the fixed-point
+    algorithm which then needs one pass over the graph per removed node.
+    """
+    graph = nx.DiGraph()
+    graph.add_nodes_from(reversed(range(size)), installed=True)
+    graph.nodes[0]["installed"] = False
+    nx.add_path(graph, range(size), optional=False)
+    return graph
+
+
+@pytest.mark.parametrize("size", [10, 100, 500, 2000])
+@pytest.mark.parametrize("seed", range(5))
+def test_filter_graph_matches_reference(size, seed):
+    expected = reference_filter_graph(synthetic_graph(size, seed))
+    filtered = filter_graph(synthetic_graph(size, seed))
+
+    assert set(filtered.nodes) == set(expected.nodes)
+    assert set(filtered.edges) == set(expected.edges)
+
+
+def test_filter_graph_chain():
+    expected = reference_filter_graph(chain_graph(200))
+    assert set(filter_graph(chain_graph(200)).nodes) == set(expected.nodes)
+    assert len(filter_graph(chain_graph(5000)).nodes) == 0
+
+
+def test_filter_graph_matches_reference_with_cycle():
+    graph = nx.DiGraph()
+    graph.add_nodes_from(["a", "b", "c", "d"], installed=True)
+    graph.nodes["a"]["installed"] = False
+    graph.add_edge("a", "b", optional=False)
+    graph.add_edge("b", "c", optional=False)
+    graph.add_edge("c", "b", optional=False)
+    graph.add_edge("c", "d", optional=True)
+
+    expected = reference_filter_graph(graph.copy())
+    filtered = filter_graph(graph.copy())
+
+    assert set(filtered.nodes) == set(expected.nodes)
+
+
+def benchmark(sizes=(100, 500, 1000, 2000, 5000), seed=0):
+    for name, generate in (
+        ("random", lambda size: synthetic_graph(size, seed)),
+        ("chain", chain_graph),
+    ):
+        for size in sizes:
+            timings = []
+            for func in (reference_filter_graph, filter_graph):
+                graph = generate(size)
+                start = time.perf_counter()
+                func(graph)
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{name:>6} {size:>6} nodes: reference {timings[0] * 1000:10.2f}ms, "
+                f"filter_graph {timings[1] * 1000:8.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,153 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+from unittest import mock
+
+import networkx as nx
+import pytest
+
+import regress_stack.modules
+from regress_stack.core import apt as core_apt
+from regress_stack.core import fingerprint, modules, utils
+
+
+class FakeModule:
+    def __init__(self, name, path, packages):
+        self.name = name
+        self.path = path
+        self.metadata = mock.Mock(packages=packages)
+
+    def __lt__(self, other):
+        return self.name < other.name
+
+    def __repr__(self):
+        return self.name
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = {"pkg-a": "1.0", "pkg-b": "2.0"}
+    monkeypatch.setattr(fingerprint.core_apt, "get_pkg_version", versions.get)
+    monkeypatch.setattr(
+        fingerprint, "host_facts", lambda: {"my_ip": "10.0.0.1", "fqdn": "host"}
+    )
+    return versions
+
+
+@pytest.fixture
+def graph(tmp_path):
+    (tmp_path / "a.py").write_text("A = 1\n")
+    (tmp_path / "b.py").write_text("B = 1\n")
+    a = FakeModule("a", tmp_path / "a.py", ["pkg-a"])
+    b = FakeModule("b", tmp_path / "b.py", ["pkg-b"])
+    graph = nx.DiGraph()
+    graph.add_edge(a, b)
+    return graph
+
+
+def _by_name(fingerprints):
+    return {mod.name: value for mod, value in fingerprints.items()}
+
+
+def test_compute_real_graph(monkeypatch, versions):
+    monkeypatch.setattr(
+        modules.apt,
+        "package_states",
+        lambda pkgs, candidate=True: {
+            pkg: core_apt.PackageState(pkg, "1.0", "1.0") for pkg in pkgs
+        },
+    )
+    monkeypatch.setattr(modules, "plugin_modules", lambda: {})
+    graph = modules.get_execution_graph(regress_stack.modules, ["glance"])
+
+    fingerprints = _by_name(fingerprint.compute(graph))
+    assert "regress_stack.modules.glance" in fingerprints
+    assert all(isinstance(mod.path, str) for mod in graph)
+
+
+def test_compute_is_stable(graph, versions):
+    assert fingerprint.compute(graph) == fingerprint.compute(graph)
+
+
+def test_package_change_propagates_to_dependents(graph, versions):
+    before = _by_name(fingerprint.compute(graph))
+    versions["pkg-a"] = "1.1"
+    after = _by_name(fingerprint.compute(graph))
+    assert before["a"] != after["a"]
+    assert before["b"] != after["b"]
+
+
+def test_dependent_change_does_not_affect_dependency(graph, versions):
+    before = _by_name(fingerprint.compute(graph))
+    versions["pkg-b"] = "2.1"
+    after = _by_name(fingerprint.compute(graph))
+    assert before["a"] == after["a"]
+    assert before["b"] != after["b"]
+
+
+def test_recording_collects_config():
+    fingerprint.record_config("/etc/ignored.conf", ("s", "k", "v"))
+    with fingerprint.recording() as config:
+        fingerprint.record_config("/etc/a.conf", ("s", "k", "v"))
+        fingerprint.record_config("/etc/a.conf", ("s", "k2", "v2"))
+    assert config == {"/etc/a.conf": [("s", "k", "v"), ("s", "k2", "v2")]}
+
+
+def test_unchanged(tmp_path):
+    conf = tmp_path / "svc.conf"
+    conf.write_text("[DEFAULT]\ndebug = true\n\n[database]\nConnection = old\n")
+    config = {
+        str(conf): [
+            ("DEFAULT", "debug", "true"),
+            ("database", "Connection", "mysql://"),
+            ("database", "Connection", "old"),
+        ]
+    }
+    assert not fingerprint.unchanged("svc", "abc", {})
+    fingerprint.record("svc", "abc", config)
+    records = fingerprint.load()
+    assert not fingerprint.unchanged("svc", "abc", records)
+
+    utils.mark_setup("svc")
+    assert fingerprint.unchanged("svc", "abc", records)
+    assert not fingerprint.unchanged("svc", "def", records)
+
+    conf.write_text("[database]\nConnection = edited\n")
+    assert not fingerprint.unchanged("svc", "abc", records)
+    conf.unlink()
+    assert not fingerprint.unchanged("svc", "abc", records)
+
+
+def test_forget():
+    fingerprint.record("a", "abc", {})
+    fingerprint.record("b", "def", {})
+    fingerprint.forget("a")
+    fingerprint.forget("missing")
+    assert list(fingerprint.load()) == ["b"]
+
+
+def test_changed_packages(graph, versions):
+    a, b = sorted(graph)
+    fingerprint.record("a", "abc", {}, fingerprint.package_versions(a))
+    fingerprint.record("b", "def", {}, fingerprint.package_versions(b))
+    records = fingerprint.load()
+    assert fingerprint.changed_packages("a", {"pkg-a": "1.0"}, records) == {}
+    assert fingerprint.changed_packages("a", {"pkg-a": "1.1"}, records) == {
+        "pkg-a": ("1.0", "1.1")
+    }
+    assert fingerprint.changed_packages("missing", {"pkg-a": "1.1"}, records) == {}
+    assert fingerprint.upgraded(graph, records) == set()
+    assert fingerprint.unrecorded(graph, records) == set()
+    assert _names(fingerprint.unrecorded(graph, {"a": {"fingerprint": "abc"}})) == {
+        "a",
+        "b",
+    }
+
+    versions["pkg-b"] = "2.1"
+    assert _names(fingerprint.upgraded(graph, records)) == {"b"}
+    versions["pkg-a"] = "1.1"
+    assert _names(fingerprint.upgraded(graph, records)) == {"a", "b"}
+
+
+def _names(modules):
+    return {mod.name for mod in modules}
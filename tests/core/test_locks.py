@@ -0,0 +1,103 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import threading
+import time
+
+import pytest
+
+from regress_stack.core import locks
+
+
+@pytest.fixture(autouse=True)
+def reset_locks():
+    locks.reset()
+    yield
+    locks.reset()
+
+
+def test_exclusive_hold_serializes_and_reports():
+    holding = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with locks.owner("keystone"), locks.hold("service:apache2"):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    holding.wait(5)
+    threading.Timer(0.05, release.set).start()
+    with locks.owner("placement"), locks.hold("service:apache2"):
+        assert release.is_set()
+    thread.join()
+
+    stats = locks.contention()["service:apache2"]
+    assert stats.acquisitions == 2
+    assert stats.contended == 1
+    assert stats.waited > 0
+    assert list(stats.waits) == [("placement", "keystone")]
+    report = locks.report()
+    assert report[0].startswith("service:apache2: 2 acquisitions, 1 contended")
+    assert report[1].startswith("  placement waited ")
+    assert report[1].endswith(" on keystone")
+
+
+def test_shared_holds_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    @locks.holds("connection", shared=True)
+    def use():
+        barrier.wait()
+
+    threads = [threading.Thread(target=use) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+    assert locks.contention()["connection"].contended == 0
+    assert locks.report() == []
+
+
+def test_exclusive_waits_for_shared():
+    holding = threading.Event()
+    events = []
+
+    def reader():
+        with locks.hold("connection", shared=True):
+            holding.set()
+            time.sleep(0.05)
+            events.append("read")
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    holding.wait(5)
+    with locks.hold("connection"):
+        events.append("write")
+    thread.join()
+
+    assert events == ["read", "write"]
+
+
+def test_reentrant_holds():
+    with locks.hold("connection"):
+        with locks.hold("connection"):
+            with locks.hold("connection", shared=True):
+                pass
+    with locks.hold("connection", shared=True):
+        with locks.hold("connection", shared=True):
+            pass
+    assert locks.contention()["connection"].contended == 0
+
+
+def test_upgrade_is_refused():
+    with locks.hold("connection", shared=True):
+        with pytest.raises(RuntimeError, match="exclusively while holding it shared"):
+            with locks.hold("connection"):
+                pass
+    # The failed upgrade did not leave the resource held.
+    with locks.hold("connection"):
+        pass
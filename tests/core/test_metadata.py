@@ -0,0 +1,108 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pkgutil
+import textwrap
+
+import pytest
+
+import regress_stack.modules
+from regress_stack.core import metadata
+from regress_stack.core.modules import get_execution_graph, load_module
+
+MODULE_SOURCE = """
+import copy
+import logging
+
+from regress_stack.modules import keystone, mysql
+from regress_stack.modules import ceph as storage
+
+raise RuntimeError("module body must not be executed")
+
+DEPENDENCIES = {keystone, mysql}
+OPTIONAL_DEPENDENCIES = {storage}
+SERVICE = "demo-api"
+PACKAGES = [SERVICE, "demo-common"]
+LOGS = ["/var/log/demo/"]
+URL = f"http://{my_ip()}:1234"
+"""
+
+
+def write_module(tmp_path, source):
+    path = tmp_path / "demo.py"
+    path.write_text(textwrap.dedent(source))
+    return path
+
+
+def test_parse_metadata(tmp_path):
+    path = write_module(tmp_path, MODULE_SOURCE)
+
+    meta = metadata.parse_metadata("regress_stack.modules.demo", str(path))
+
+    assert meta.dependencies == {
+        "regress_stack.modules.keystone",
+        "regress_stack.modules.mysql",
+    }
+    assert meta.optional_dependencies == {"regress_stack.modules.ceph"}
+    assert meta.packages == ["demo-api", "demo-common"]
+    assert meta.logs == ["/var/log/demo/"]
+
+
+def test_parse_metadata_determine_packages(tmp_path):
+    path = write_module(
+        tmp_path,
+        MODULE_SOURCE
+        + """
+BASE_PACKAGES = ["demo-base"]
+
+
+def determine_packages(no_tempest: bool = False) -> list[str]:
+    packages = copy.deepcopy(BASE_PACKAGES)
+    if not no_tempest:
+        packages.append("demo-tempest-plugin")
+    return packages
+""",
+    )
+
+    meta = metadata.parse_metadata("regress_stack.modules.demo", str(path))
+
+    assert meta.packages == ["demo-base", "demo-tempest-plugin"]
+    assert meta.determine_packages(no_tempest=True) == ["demo-base"]
+
+
+def test_parse_metadata_invalid_dependencies(tmp_path):
+    path = write_module(tmp_path, 'DEPENDENCIES = {"keystone"}\n')
+
+    with pytest.raises(metadata.MetadataError):
+        metadata.parse_metadata("regress_stack.modules.demo", str(path))
+
+
+@pytest.mark.parametrize(
+    "name",
+    [module.name for module in pkgutil.iter_modules(regress_stack.modules.__path__)],
+)
+def test_metadata_matches_module(name):
+    canonical_name = "regress_stack.modules." + name
+    path = regress_stack.modules.__path__[0]
+    module = load_module(canonical_name, path)
+
+    meta = metadata.load_metadata(canonical_name, path)
+
+    assert meta.path == module.__file__
+    assert meta.dependencies == {
+        dep.__name__ for dep in getattr(module, "DEPENDENCIES", set())
+    }
+    assert meta.optional_dependencies == {
+        dep.__name__ for dep in getattr(module, "OPTIONAL_DEPENDENCIES", set())
+    }
+    if hasattr(module, "determine_packages"):
+        assert meta.packages == module.determine_packages()
+    else:
+        assert meta.packages == getattr(module, "PACKAGES", [])
+    assert meta.logs == getattr(module, "LOGS", [])
+
+
+def test_execution_graph_does_not_import_modules():
+    graph = get_execution_graph(regress_stack.modules, filter_missing=False)
+
+    assert all(mod._module is None for mod in graph.nodes)
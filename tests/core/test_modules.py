@@ -1,11 +1,17 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import importlib.metadata
+import sys
 from unittest.mock import MagicMock, patch
 
 import networkx as nx
 import pytest
 
+import regress_stack.modules
+from regress_stack.core import modules as modules_core
+from regress_stack.core.apt import PackageState
+from regress_stack.core.metadata import ModuleMetadata
 from regress_stack.core.modules import ModuleComp, build_dependency_graph, filter_graph
 
 
@@ -54,11 +60,36 @@ def mock_modules():
     return mock_modules_mod
 
 
+def fake_load_metadata(mock_modules):
+    def load_metadata(name, path):
+        mod = getattr(mock_modules, name.rsplit(".", 1)[1])
+        return ModuleMetadata(
+            mod.__name__,
+            mod.__file__,
+            {dep.__name__ for dep in mod.DEPENDENCIES},
+            {dep.__name__ for dep in mod.OPTIONAL_DEPENDENCIES},
+            mod.PACKAGES,
+            [],
+        )
+
+    return load_metadata
+
+
+def fake_package_states(installed=lambda pkg: True):
+    def package_states(pkgs, candidate=True):
+        return {
+            pkg: PackageState(pkg, "1.0" if installed(pkg) else None, "1.0")
+            for pkg in pkgs
+        }
+
+    return package_states
+
+
 @patch("regress_stack.core.modules.pkgutil.iter_modules")
-@patch("regress_stack.core.modules.load_module")
-@patch("regress_stack.core.modules.apt.pkgs_installed")
+@patch("regress_stack.core.modules.load_metadata")
+@patch("regress_stack.core.modules.apt.package_states")
 def test_build_dependency_graph(
-    mock_pkgs_installed, mock_load_module, mock_iter_modules, mock_modules
+    mock_package_states, mock_load_metadata, mock_iter_modules, mock_modules
 ):
     mock_iter_modules.return_value = [
         mock_modules.mod1,
@@ -66,10 +97,8 @@ def test_build_dependency_graph(
         mock_modules.mod3,
     ]
 
-    mock_load_module.side_effect = lambda name, path: getattr(
-        mock_modules, name.rsplit(".", 1)[1]
-    )
-    mock_pkgs_installed.return_value = True
+    mock_load_metadata.side_effect = fake_load_metadata(mock_modules)
+    mock_package_states.side_effect = fake_package_states()
 
     graph = build_dependency_graph(mock_modules)
 
@@ -98,10 +127,10 @@ def test_build_dependency_graph(
 
 
 @patch("regress_stack.core.modules.pkgutil.iter_modules")
-@patch("regress_stack.core.modules.load_module")
-@patch("regress_stack.core.modules.apt.pkgs_installed")
+@patch("regress_stack.core.modules.load_metadata")
+@patch("regress_stack.core.modules.apt.package_states")
 def test_build_dependency_graph_missing_packages(
-    mock_pkgs_installed, mock_load_module, mock_iter_modules, mock_modules
+    mock_package_states, mock_load_metadata, mock_iter_modules, mock_modules
 ):
     mock_iter_modules.return_value = [
         mock_modules.mod1,
@@ -109,10 +138,8 @@ def test_build_dependency_graph_missing_packages(
         mock_modules.mod3,
     ]
 
-    mock_load_module.side_effect = lambda name, path: getattr(
-        mock_modules, name.rsplit(".", 1)[1]
-    )
-    mock_pkgs_installed.side_effect = lambda pkgs: pkgs != ["pkg1"]
+    mock_load_metadata.side_effect = fake_load_metadata(mock_modules)
+    mock_package_states.side_effect = fake_package_states(lambda pkg: pkg != "pkg1")
 
     graph = build_dependency_graph(mock_modules)
 
@@ -307,3 +334,160 @@ def test_get_execution_order_invalid_target_without_filtering():
 
     with pytest.raises(RuntimeError, match="Target 'invalid' not found"):
         get_execution_order(regress_stack.modules, "invalid", filter_missing=False)
+
+
+def test_get_execution_graph_utils_is_root():
+    """Test that every module of the execution graph depends on utils."""
+    from regress_stack.core.modules import get_execution_graph
+    import regress_stack.modules
+
+    graph = get_execution_graph(regress_stack.modules, "keystone", filter_missing=False)
+    utils = next(mod for mod in graph.nodes if mod.name.endswith(".utils"))
+
+    assert [mod for mod in graph.nodes if graph.in_degree(mod) == 0] == [utils]
+    assert {mod.name.rsplit(".")[-1] for mod in graph.nodes} == {
+        "utils",
+        "mysql",
+        "keystone",
+    }
+
+
+def _names(graph):
+    return {mod.name.rsplit(".")[-1] for mod in graph.nodes}
+
+
+def test_get_execution_graph_multiple_targets():
+    """Test that the dependencies of all targets are planned once."""
+    from regress_stack.core.modules import get_execution_graph
+    import regress_stack.modules
+
+    graph = get_execution_graph(
+        regress_stack.modules, ["glance", "placement"], filter_missing=False
+    )
+
+    assert _names(graph) == {"utils", "mysql", "keystone", "glance", "placement"}
+
+
+def test_get_execution_graph_exclude():
+    """Test that excluding an optional dependency keeps the target."""
+    from regress_stack.core.modules import get_execution_graph
+    import regress_stack.modules
+
+    graph = get_execution_graph(
+        regress_stack.modules, "nova", filter_missing=False, exclude=["cinder"]
+    )
+
+    assert "nova" in _names(graph)
+    assert "cinder" not in _names(graph)
+
+
+def test_get_execution_graph_exclude_required_dependency():
+    """Test that excluding a required dependency of a target fails."""
+    from regress_stack.core.modules import get_execution_graph
+    import regress_stack.modules
+
+    graph = get_execution_graph(
+        regress_stack.modules, filter_missing=False, exclude=["neutron"]
+    )
+    assert not _names(graph) & {"neutron", "nova", "heat", "magnum"}
+
+    with pytest.raises(RuntimeError, match="Target 'heat' requires an excluded"):
+        get_execution_graph(
+            regress_stack.modules, "heat", filter_missing=False, exclude=["neutron"]
+        )
+
+
+def test_get_execution_graph_exclude_invalid():
+    from regress_stack.core.modules import get_execution_graph
+    import regress_stack.modules
+
+    with pytest.raises(RuntimeError, match="Excluded module 'invalid' not found"):
+        get_execution_graph(
+            regress_stack.modules, filter_missing=False, exclude=["invalid"]
+        )
+
+
+def test_get_reset_graph_includes_dependents():
+    """Test that modules requiring a target are reset before it."""
+    from regress_stack.core.modules import get_reset_graph
+    import regress_stack.modules
+
+    graph = get_reset_graph(regress_stack.modules, "glance", filter_missing=False)
+    assert _names(graph) == {"glance", "nova", "heat", "magnum"}
+    order = [mod.name.rsplit(".")[-1] for mod in nx.topological_sort(graph)]
+    assert order[0] == "magnum"
+    assert order[-1] == "glance"
+
+    graph = get_reset_graph(regress_stack.modules, filter_missing=False)
+    order = [mod.name.rsplit(".")[-1] for mod in nx.topological_sort(graph)]
+    assert order[-1] == "utils"
+    assert order.index("nova") < order.index("keystone") < order.index("mysql")
+
+    with pytest.raises(RuntimeError, match="Target 'invalid' not found"):
+        get_reset_graph(regress_stack.modules, "invalid", filter_missing=False)
+
+
+def _plugin_package(tmp_path, monkeypatch, entry_points):
+    package = tmp_path / "acme_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "demo.py").write_text(
+        "from regress_stack.modules import keystone\n"
+        "\n"
+        "DEPENDENCIES = {keystone}\n"
+        'PACKAGES = ["demo-api"]\n'
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(
+        modules_core,
+        "_entry_points",
+        lambda: [
+            importlib.metadata.EntryPoint(
+                name=name, value=value, group=modules_core.ENTRY_POINT_GROUP
+            )
+            for name, value in entry_points.items()
+        ],
+    )
+    return package
+
+
+def test_discover_modules_with_plugin(tmp_path, monkeypatch):
+    package = _plugin_package(tmp_path, monkeypatch, {"demo": "acme_plugins.demo"})
+    monkeypatch.setattr(modules_core.apt, "package_states", fake_package_states())
+
+    found = modules_core.discover_modules(regress_stack.modules)
+    assert found["acme_plugins.demo"] == str(package)
+    assert "regress_stack.modules.keystone" in found
+
+    graph = modules_core.load_dependency_graph(regress_stack.modules)
+    by_name = {mod.name: mod for mod in graph}
+    assert graph.has_edge(
+        by_name["regress_stack.modules.keystone"], by_name["acme_plugins.demo"]
+    )
+    # Planning does not import the plugin module.
+    assert "acme_plugins.demo" not in sys.modules
+    assert by_name["acme_plugins.demo"].module.PACKAGES == ["demo-api"]
+
+
+def test_discover_modules_duplicate_name(tmp_path, monkeypatch):
+    (tmp_path / "acme_dup").mkdir()
+    (tmp_path / "acme_dup" / "__init__.py").write_text("")
+    (tmp_path / "acme_dup" / "keystone.py").write_text("")
+    _plugin_package(tmp_path, monkeypatch, {"keystone": "acme_dup.keystone"})
+
+    with pytest.raises(RuntimeError, match="provided by both"):
+        modules_core.discover_modules(regress_stack.modules)
+
+
+def test_discover_modules_missing_plugin(tmp_path, monkeypatch):
+    _plugin_package(tmp_path, monkeypatch, {"missing": "acme_plugins.missing"})
+
+    with pytest.raises(RuntimeError, match="of plugin 'missing' not found"):
+        modules_core.discover_modules(regress_stack.modules)
+
+
+def test_discover_modules_mismatched_plugin_name(tmp_path, monkeypatch):
+    _plugin_package(tmp_path, monkeypatch, {"foo": "acme_plugins.demo"})
+
+    with pytest.raises(RuntimeError, match="must be named after its module"):
+        modules_core.discover_modules(regress_stack.modules)
@@ -0,0 +1,159 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import contextlib
+import types
+
+import networkx as nx
+import pytest
+
+from regress_stack.core import pipeline
+from regress_stack.core.executor import GraphExecutionError
+
+
+class FakeComp:
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+
+    def __lt__(self, other):
+        return self.name < other.name
+
+    def __repr__(self):
+        return self.name
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        pipeline.utils, "restart_service", lambda service: calls.append(service)
+    )
+    return calls
+
+
+def phased(name, calls, services=(), fail=None):
+    def phase(phase_name):
+        def func(*args):
+            if phase_name == fail:
+                raise RuntimeError(f"{name} {phase_name} failed")
+            calls.append(f"{name}.{phase_name}{args}")
+            return f"{name}-creds" if phase_name == "provision" else None
+
+        return func
+
+    module = types.SimpleNamespace(
+        provision=phase("provision"),
+        configure=phase("configure"),
+        migrate=phase("migrate"),
+        services=lambda: list(services),
+        post=phase("post"),
+    )
+    return FakeComp(name, module)
+
+
+def legacy(name, calls):
+    module = types.SimpleNamespace(setup=lambda: calls.append(f"{name}.setup"))
+    return FakeComp(name, module)
+
+
+def test_run_phases(calls):
+    mod = phased("a", calls, services=["apache2"])
+    assert pipeline.has_phases(mod.module)
+    pipeline.setup_func(mod.module)()
+    assert calls == [
+        "a.provision()",
+        "a.configure('a-creds',)",
+        "a.migrate('a-creds',)",
+        "apache2",
+        "a.post()",
+    ]
+
+
+def test_setup_func_falls_back_to_setup(calls):
+    mod = legacy("a", calls)
+    assert not pipeline.has_phases(mod.module)
+    pipeline.setup_func(mod.module)()
+    assert calls == ["a.setup"]
+    assert pipeline.setup_func(types.SimpleNamespace()) is None
+
+
+def test_execute_batches_phases_and_coalesces_restarts(calls):
+    root = legacy("root", calls)
+    a = phased("a", calls, services=["apache2", "a-api"])
+    b = phased("b", calls, services=["apache2"])
+    c = phased("c", calls, services=["apache2"])
+    graph = nx.DiGraph()
+    graph.add_edges_from([(root, a), (root, b), (a, c), (b, c)])
+    done = []
+
+    pipeline.execute(graph, on_done=done.append)
+
+    assert calls == [
+        "root.setup",
+        "a.provision()",
+        "b.provision()",
+        "a.configure('a-creds',)",
+        "b.configure('b-creds',)",
+        "a.migrate('a-creds',)",
+        "b.migrate('b-creds',)",
+        "apache2",
+        "a-api",
+        "a.post()",
+        "b.post()",
+        "c.provision()",
+        "c.configure('c-creds',)",
+        "c.migrate('c-creds',)",
+        "apache2",
+        "c.post()",
+    ]
+    assert done == [root, a, b, c]
+
+
+def test_execute_restarts_less_than_serial_setup(calls):
+    mods = [phased(name, calls, services=["apache2"]) for name in "abcde"]
+    graph = nx.DiGraph()
+    # a, b and c share a generation, d and e another.
+    graph.add_edges_from([(mods[0], mods[3]), (mods[1], mods[4])])
+    graph.add_node(mods[2])
+
+    for mod in nx.lexicographical_topological_sort(graph):
+        pipeline.run_phases(mod.module)
+    serial = calls.count("apache2")
+    calls.clear()
+    pipeline.execute(graph, jobs=2)
+
+    assert (serial, calls.count("apache2")) == (5, 2)
+
+
+def test_execute_context_and_skip(calls):
+    a = phased("a", calls)
+    b = phased("b", calls)
+    graph = nx.DiGraph()
+    graph.add_edge(a, b)
+    entered = []
+
+    @contextlib.contextmanager
+    def context(mod):
+        entered.append(mod.name)
+        yield
+
+    pipeline.execute(graph, jobs=2, skip={a}, context=context)
+
+    assert not any(call.startswith("a.") for call in calls)
+    assert entered == ["b", "b", "b", "b"]
+
+
+def test_execute_stops_on_failure(calls):
+    a = phased("a", calls, services=["apache2"], fail="configure")
+    b = phased("b", calls, services=["apache2"])
+    c = phased("c", calls)
+    graph = nx.DiGraph()
+    graph.add_edges_from([(a, c), (b, c)])
+
+    with pytest.raises(GraphExecutionError):
+        pipeline.execute(graph, jobs=2)
+
+    assert "b.configure('b-creds',)" in calls
+    assert "apache2" not in calls
+    assert not any(call.startswith(("b.migrate", "c.")) for call in calls)
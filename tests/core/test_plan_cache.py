@@ -0,0 +1,97 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import os
+
+import pytest
+
+import regress_stack.modules
+from regress_stack.core import metadata, modules, plan_cache
+
+
+@pytest.fixture
+def dpkg_status(tmp_path, monkeypatch):
+    status = tmp_path / "status"
+    status.write_text("Package: crudini\n")
+    monkeypatch.setattr(plan_cache, "DPKG_STATUS", status)
+    monkeypatch.setattr(plan_cache, "APT_LISTS", tmp_path / "lists")
+    yield status
+
+
+def test_cache_key_tracks_mtime(dpkg_status):
+    key = plan_cache.cache_key([dpkg_status])
+    assert plan_cache.cache_key([dpkg_status]) == key
+
+    stat = dpkg_status.stat()
+    os.utime(dpkg_status, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert plan_cache.cache_key([dpkg_status]) != key
+
+
+def test_load_dependency_graph_uses_cache(dpkg_status, monkeypatch):
+    graph = modules.load_dependency_graph(regress_stack.modules)
+    assert plan_cache.cache_path().exists()
+
+    def fail(_modules_mod):
+        raise AssertionError("graph should be read from the cache")
+
+    monkeypatch.setattr(modules, "build_dependency_graph", fail)
+    cached = modules.load_dependency_graph(regress_stack.modules)
+
+    assert set(cached.nodes) == set(graph.nodes)
+    assert set(cached.edges) == set(graph.edges)
+    for mod in graph.nodes:
+        assert cached.nodes[mod] == graph.nodes[mod]
+    for pred, succ in graph.edges:
+        assert cached.edges[pred, succ] == graph.edges[pred, succ]
+
+
+def test_load_dependency_graph_invalidated_by_dpkg_status(dpkg_status, monkeypatch):
+    modules.load_dependency_graph(regress_stack.modules)
+
+    builds = []
+    build_dependency_graph = modules.build_dependency_graph
+    monkeypatch.setattr(
+        modules,
+        "build_dependency_graph",
+        lambda modules_mod: builds.append(modules_mod)
+        or build_dependency_graph(modules_mod),
+    )
+    dpkg_status.write_text("Package: crudini\n\nPackage: keystone\n")
+    modules.load_dependency_graph(regress_stack.modules)
+
+    assert builds == [regress_stack.modules]
+
+
+def test_save_ignores_unwritable_cache(monkeypatch, tmp_path):
+    readonly = tmp_path / "readonly"
+    readonly.mkdir()
+    readonly.chmod(0o500)
+    monkeypatch.setattr(
+        "regress_stack.core.utils.REGRESS_STACK_DIR", readonly / "regress-stack"
+    )
+
+    plan_cache.save("key", {})
+
+
+def test_cached_packages_follow_no_tempest(dpkg_status, tmp_path, monkeypatch):
+    plugin_dir = tmp_path / "acme_tempest"
+    plugin_dir.mkdir()
+    (plugin_dir / "__init__.py").write_text("")
+    (plugin_dir / "demo.py").write_text(
+        "def determine_packages(no_tempest: bool = False) -> list[str]:\n"
+        '    return ["demo"] if no_tempest else ["demo", "demo-tempest-plugin"]\n'
+    )
+    monkeypatch.setattr(
+        modules, "plugin_modules", lambda: {"acme_tempest.demo": str(plugin_dir)}
+    )
+    monkeypatch.setattr(metadata, "_METADATA_REGISTRY", {})
+    modules.load_dependency_graph(regress_stack.modules)
+
+    # A later invocation only has the cached metadata.
+    monkeypatch.setattr(metadata, "_METADATA_REGISTRY", {})
+    monkeypatch.setattr(modules, "build_dependency_graph", None)
+    modules.load_dependency_graph(regress_stack.modules)
+
+    cached = metadata.metadata_registry()["acme_tempest.demo"]
+    assert cached.determine_packages(no_tempest=True) == ["demo"]
+    assert cached.determine_packages() == ["demo", "demo-tempest-plugin"]
@@ -0,0 +1,89 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pytest
+
+from regress_stack.core import profile
+from regress_stack.core.apt import PackageState
+
+
+@pytest.fixture
+def states(monkeypatch, tmp_path):
+    states = {
+        "python3-neutron": PackageState(
+            "python3-neutron", "2:25.0.0-0ubuntu1", "2:26.0.0-0ubuntu1"
+        ),
+        "python3-nova": PackageState("python3-nova", "3:32.0.0-0ubuntu1", None),
+        "magnum-conductor": PackageState("magnum-conductor", "15.0.0-0ubuntu1", None),
+    }
+    lookups = []
+
+    def package_states(pkgs, candidate=True):
+        pkgs = list(pkgs)
+        lookups.append((pkgs, candidate))
+        return {pkg: states.get(pkg, PackageState(pkg, None, None)) for pkg in pkgs}
+
+    monkeypatch.setattr(profile.core_apt, "package_states", package_states)
+    monkeypatch.setattr(profile.plan_cache, "DPKG_STATUS", tmp_path / "status")
+    monkeypatch.setattr(profile.plan_cache, "APT_LISTS", tmp_path / "lists")
+    monkeypatch.setattr(profile, "_PROFILES", {})
+    return lookups
+
+
+def test_evaluate(states):
+    assert profile.evaluate(candidates=True) == profile.Profile(
+        neutron_split_packages=True,
+        neutron_split_services=False,
+        nova_api_under_apache=True,
+        heat_api_under_apache=False,
+        glance_strict_image_format=False,
+        tempestconf_fixed=True,
+        magnum_coreos_35=True,
+        magnum_coreos_38=False,
+    )
+    # The apt cache is only queried for the gates on candidate versions.
+    assert states[1] == (["python3-neutron"], True)
+
+
+def test_evaluate_installed(states):
+    # Without candidates, gates on candidate versions use the installed one.
+    assert not profile.evaluate().neutron_split_packages
+    assert [candidate for _, candidate in states] == [False]
+
+
+def test_evaluate_without_python_apt(states, monkeypatch):
+    def package_states(pkgs, candidate=True):
+        if candidate:
+            raise ModuleNotFoundError("No module named 'apt'")
+        return {pkg: PackageState(pkg, "2:25.0.0-0ubuntu1", None) for pkg in pkgs}
+
+    monkeypatch.setattr(profile.core_apt, "package_states", package_states)
+    assert not profile.evaluate(candidates=True).neutron_split_packages
+
+
+def test_current_is_persisted_until_packages_change(states, monkeypatch, tmp_path):
+    with profile.candidates():
+        first = profile.current()
+        assert profile.current() is first
+        monkeypatch.setattr(profile, "_PROFILES", {})
+        assert profile.current() == first
+    assert len(states) == 2
+    assert profile.current() != first
+    assert len(states) == 3
+
+    (tmp_path / "status").write_text("changed")
+    with profile.candidates():
+        profile.current()
+    assert len(states) == 5
+
+
+def test_report(states):
+    with profile.candidates():
+        report = profile.report()
+    assert len(report) == len(profile.GATES)
+    assert report[0] == (
+        "neutron_split_packages: yes (candidate python3-neutron >= 26.0.0)"
+    )
+    assert profile.report()[0] == (
+        "neutron_split_packages: no (installed python3-neutron >= 26.0.0)"
+    )
@@ -0,0 +1,43 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import networkx as nx
+
+from regress_stack.core import timings
+
+
+def test_record_keeps_history(monkeypatch):
+    monkeypatch.setattr(timings, "HISTORY_SIZE", 3)
+    for duration in (1.0, 2.0, 3.0, 4.0):
+        timings.record("keystone", duration)
+    timings.record("mysql", 5.0)
+
+    history = timings.load()
+
+    assert history == {"keystone": [2.0, 3.0, 4.0], "mysql": [5.0]}
+    assert timings.estimate(history, "keystone") == 3.0
+    assert timings.estimate(history, "nova") is None
+
+
+def test_critical_path():
+    """Test the following graph:
+
+    mysql (1s) -> keystone (2s) -> glance (5s)
+    keystone -> placement (1s)
+    ovn (4s)
+    """
+    graph = nx.DiGraph()
+    graph.add_edges_from(
+        [("mysql", "keystone"), ("keystone", "glance"), ("keystone", "placement")]
+    )
+    graph.add_node("ovn")
+    durations = {"mysql": 1, "keystone": 2, "glance": 5, "placement": 1, "ovn": 4}
+
+    path, total = timings.critical_path(graph, durations)
+
+    assert path == ["mysql", "keystone", "glance"]
+    assert total == 8
+
+
+def test_critical_path_empty_graph():
+    assert timings.critical_path(nx.DiGraph(), {}) == ([], 0.0)
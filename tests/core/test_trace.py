@@ -0,0 +1,42 @@
+# Copyright 2025 - Canonical Ltd
+# SPDX-License-Identifier: GPL-3.0-only
+
+import json
+
+from regress_stack.core import trace, utils
+
+
+def test_span_disabled():
+    with trace.span("ignored") as args:
+        args["key"] = "value"
+    assert not trace.enabled()
+    assert trace.stop() == []
+
+
+def test_nested_spans(tmp_path):
+    trace.start()
+    try:
+        with utils.measure("setup mod", trace.MODULE):
+            with trace.span("cmd", trace.SUBPROCESS, argv="cmd --flag"):
+                pass
+    finally:
+        spans = trace.stop()
+
+    by_name = {s.name: s for s in spans}
+    assert set(by_name) == {"setup mod", "cmd"}
+    outer, inner = by_name["setup mod"], by_name["cmd"]
+    assert (outer.depth, inner.depth) == (0, 1)
+    assert outer.start <= inner.start
+    assert inner.start + inner.duration <= outer.start + outer.duration
+    assert inner.args == {"argv": "cmd --flag"}
+
+    path = tmp_path / "trace.json"
+    trace.export(spans, path)
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["setup mod", "cmd"]
+    assert {event["ph"] for event in events} == {"X"}
+    assert events[1]["cat"] == "subprocess"
+
+    summary = trace.summary(spans)
+    assert summary[0].startswith("Wall time:")
+    assert any("module: 1 span(s)" in line for line in summary)
@@ -1,5 +1,8 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
+import asyncio
+import subprocess
+import time
 import unittest.mock as mock
 
 import pytest
@@ -30,8 +33,9 @@ def test_concurrency_cb(mock_cpu_count):
     assert regress_stack.core.utils.concurrency_cb("auto") == 42
     assert type(regress_stack.core.utils.concurrency_cb("51")) is int
     assert regress_stack.core.utils.concurrency_cb("51") == 51
-    with pytest.raises(ValueError):
-        regress_stack.core.utils.concurrency_cb("NotInt")
+    for arg in ("NotInt", "0", "-2"):
+        with pytest.raises(ValueError):
+            regress_stack.core.utils.concurrency_cb(arg)
 
 
 def test_system(mock_os):
@@ -56,3 +60,189 @@ def test_system(mock_os):
         ]
     )
     mock_os.reset()
+
+
+def test_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(regress_stack.core.utils, "STREAM_CONTEXT_LINES", 2)
+    lines = []
+    tee = tmp_path / "logs" / "out.log"
+    context = regress_stack.core.utils.stream(
+        "sh", ["-c", "seq 5; echo err >&2"], on_line=lines.append, tee=tee
+    )
+    assert lines == ["1\n", "2\n", "3\n", "4\n", "5\n", "err\n"]
+    assert tee.read_text() == "1\n2\n3\n4\n5\nerr\n"
+    assert context == ["5\n", "err\n"]
+
+
+def test_stream_failure(monkeypatch):
+    monkeypatch.setattr(regress_stack.core.utils, "STREAM_CONTEXT_LINES", 1)
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        regress_stack.core.utils.stream("sh", ["-c", "echo a; echo b; exit 2"])
+    assert e.value.returncode == 2
+    assert e.value.output == "b\n"
+
+
+def test_run_concurrently():
+    async def both():
+        return await regress_stack.core.utils.arun(
+            "sh", ["-c", "echo out; echo err >&2"]
+        )
+
+    result, other = regress_stack.core.utils.run_concurrently(
+        both(), regress_stack.core.utils.arun("true"), limit=1
+    )
+    assert (result.argv, result.exit_code) == (
+        ["sh", "-c", "echo out; echo err >&2"],
+        0,
+    )
+    assert (result.stdout, result.stderr) == ("out\n", "err\n")
+    assert other.exit_code == 0
+
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        regress_stack.core.utils.run_concurrently(
+            regress_stack.core.utils.arun("sh", ["-c", "exit 4"]),
+            regress_stack.core.utils.arun("true"),
+        )
+    assert e.value.returncode == 4
+    unchecked = regress_stack.core.utils.run_concurrently(
+        regress_stack.core.utils.arun("false", check=False)
+    )
+    assert unchecked[0].exit_code == 1
+
+
+def test_run_concurrently_limit(monkeypatch):
+    running = []
+    peak = []
+
+    async def fake_exec(*args, **kwargs):
+        running.append(args)
+        peak.append(len(running))
+        process = mock.Mock(returncode=0)
+
+        async def read():
+            return b""
+
+        async def wait():
+            await asyncio.sleep(0.01)
+            if args in running:
+                running.remove(args)
+            return 0
+
+        process.stdout.read = process.stderr.read = read
+        process.wait = wait
+        return process
+
+    monkeypatch.setattr(
+        regress_stack.core.utils.asyncio, "create_subprocess_exec", fake_exec
+    )
+    regress_stack.core.utils.run_concurrently(
+        *(regress_stack.core.utils.arun("cmd", [str(i)]) for i in range(6)), limit=2
+    )
+    assert max(peak) == 2
+
+
+def test_command_timeout():
+    utils = regress_stack.core.utils
+    assert (
+        utils.command_timeout(["crudini", "--set"]) == utils.COMMAND_TIMEOUTS["crudini"]
+    )
+    assert (
+        utils.command_timeout(["sudo", "--user", "nova", "nova-manage"])
+        == (utils.COMMAND_TIMEOUTS["nova-manage"])
+    )
+    assert utils.command_timeout(["unknown"]) == utils.DEFAULT_TIMEOUT
+    with utils.command_timeouts({"crudini": 5.0, "unknown": None}):
+        assert utils.command_timeout(["crudini"]) == 5.0
+        assert utils.command_timeout(["unknown"]) is None
+    assert utils.command_timeout(["crudini"]) == utils.COMMAND_TIMEOUTS["crudini"]
+
+
+def test_run_timeout(monkeypatch):
+    utils = regress_stack.core.utils
+    monkeypatch.setattr(utils, "STREAM_CONTEXT_LINES", 1)
+    start = time.monotonic()
+    with pytest.raises(utils.CommandTimeout) as e:
+        # The background sleep shares the process group and is killed too.
+        utils.run("sh", ["-c", "echo a; echo b; sleep 30 & sleep 30"], timeout=0.5)
+    assert time.monotonic() - start < 10
+    assert e.value.output == "b\n"
+    assert "sleep 30" in e.value.snapshot
+    assert utils.run("echo", ["ok"], timeout=5) == "ok\n"
+
+
+PROC_NET_ROUTE = """\
+Iface	Destination	Gateway 	Flags	RefCnt	Use	Metric	Mask		MTU	Window	IRTT
+eth1	00000000	0102A8C0	0003	0	0	200	00000000	0	0	0
+eth0	00000000	0101A8C0	0003	0	0	100	00000000	0	0	0
+eth0	0001A8C0	00000000	0001	0	0	100	00FFFFFF	0	0	0
+"""
+
+
+def test_default_route_interface(tmp_path, monkeypatch):
+    utils = regress_stack.core.utils
+    route = tmp_path / "route"
+    route.write_text(PROC_NET_ROUTE)
+    monkeypatch.setattr(utils, "PROC_NET_ROUTE", route)
+    assert utils._default_route_interface() == "eth0"
+
+    route.write_text(PROC_NET_ROUTE.splitlines(True)[0])
+    with pytest.raises(RuntimeError):
+        utils._default_route_interface()
+
+
+def test_interface_address():
+    assert regress_stack.core.utils._interface_address("lo") == ("127.0.0.1", 8)
+
+
+def test_lazy_constants():
+    calls = []
+    getattr_ = regress_stack.core.utils.lazy_constants(
+        URL=lambda: calls.append(1) or "http://10.0.0.1/"
+    )
+    assert not calls
+    assert getattr_("URL") == "http://10.0.0.1/"
+    with pytest.raises(AttributeError):
+        getattr_("MISSING")
+
+
+def test_arun_timeout():
+    utils = regress_stack.core.utils
+    start = time.monotonic()
+    with pytest.raises(utils.CommandTimeout) as e:
+        utils.run_concurrently(
+            utils.arun("sh", ["-c", "echo a; sleep 30 & sleep 30"], timeout=0.5)
+        )
+    assert time.monotonic() - start < 10
+    assert e.value.output == "a\n"
+    assert "sleep 30" in e.value.snapshot
+
+
+def test_stream_timeout():
+    utils = regress_stack.core.utils
+    lines = []
+    start = time.monotonic()
+    with pytest.raises(utils.CommandTimeout) as e:
+        utils.stream(
+            "sh",
+            ["-c", "echo a; sleep 30 & sleep 30"],
+            on_line=lines.append,
+            timeout=0.5,
+        )
+    assert time.monotonic() - start < 10
+    assert lines == ["a\n"]
+    assert e.value.output == "a\n"
+    assert "sleep 30" in e.value.snapshot
+
+
+def test_run_kills_command_on_interrupt(monkeypatch):
+    utils = regress_stack.core.utils
+    killed = []
+    monkeypatch.setattr(utils, "_kill_group", killed.append)
+
+    def interrupt(self, timeout=None):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(utils.subprocess.Popen, "communicate", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        utils.run("true")
+    assert len(killed) == 1
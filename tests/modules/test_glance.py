@@ -1,6 +1,7 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+from regress_stack.core import profile
 from regress_stack.modules import glance
 
 
@@ -8,15 +9,10 @@ def test_disable_strict_image_format_validation(monkeypatch):
     cfg_calls = []
     warnings = []
 
-    class _Version:
-        def __ge__(self, other):
-            return other == glance.GLANCE_STRICT_IMAGE_FORMAT_VERSION
-
-        def __lt__(self, _other):
-            return False
-
     monkeypatch.setattr(
-        glance.core_apt, "PkgVersionCompare", lambda *args, **kwargs: _Version()
+        glance.profile,
+        "current",
+        lambda: profile.Profile(glance_strict_image_format=True),
     )
     monkeypatch.setattr(
         glance.module_utils,
@@ -44,12 +40,10 @@ def test_disable_strict_image_format_validation_noop(monkeypatch):
     cfg_calls = []
     warnings = []
 
-    class _Version:
-        def __lt__(self, other):
-            return other == glance.GLANCE_STRICT_IMAGE_FORMAT_VERSION
-
     monkeypatch.setattr(
-        glance.core_apt, "PkgVersionCompare", lambda *args, **kwargs: _Version()
+        glance.profile,
+        "current",
+        lambda: profile.Profile(glance_strict_image_format=False),
     )
     monkeypatch.setattr(
         glance.module_utils,
@@ -1,6 +1,9 @@
 # Copyright 2025 - Canonical Ltd
 # SPDX-License-Identifier: GPL-3.0-only
 
+import types
+
+from regress_stack.core import trace
 from regress_stack.modules import keystone
 
 
@@ -46,3 +49,18 @@ def test_ensure_wsgi_scripts_is_noop_when_present(tmp_path, monkeypatch):
     assert public.read_text() == "public"
     assert admin.read_text() == "admin"
     assert warnings == []
+
+
+def test_api_calls_are_traced(monkeypatch):
+    identity = types.SimpleNamespace(find_domain=lambda name, ignore_missing: name)
+    monkeypatch.setattr(
+        keystone, "o7k", lambda: types.SimpleNamespace(identity=identity)
+    )
+    trace.start()
+    try:
+        assert keystone.ensure_domain("service") == "service"
+    finally:
+        spans = trace.stop()
+    assert [(s.name, s.category) for s in spans] == [
+        ("keystone.ensure_domain", trace.API)
+    ]